@@ -0,0 +1,105 @@
+'''
+Splitting and cleaning of the affiliation strings from Google Scholar profiles.
+
+The same affiliations come up again and again among citing authors, so the cleaning of one affiliation string is memoized.
+The patterns are compiled once, and country names are matched in a hash index built from pycountry on first use,
+instead of going through `pycountry.countries.lookup` (which raises on every miss) for every comma-separated part.
+'''
+import pycountry
+import re
+
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+# Split an affiliation string by ';' or 'and'.
+AFFILIATION_SPLIT_PATTERN = re.compile(r'[;]|\band\b')
+# NOTE: The non-English comma is entered intentionally.
+COMMA_SPLIT_PATTERN = re.compile(r'[,，]')
+# Anything before 'at', or '@'.
+AT_PREFIX_PATTERN = re.compile(r'.*?\bat\b|.*?@', re.IGNORECASE)
+# The 'at' or '@' themselves. Removing `AT_PREFIX_PATTERN` keeps what follows the last of them.
+AT_PATTERN = re.compile(r'\bat\b|@', re.IGNORECASE)
+# Strings that represent a person's identity rather than affiliation.
+IDENTITY_PATTERN = re.compile(
+    r'\b(director|manager|chair|engineer|programmer|scientist|professor|lecturer|phd|ph\.d|postdoc|doctor|student|department of)\b',
+    re.IGNORECASE)
+
+# Every field `pycountry.countries.lookup` matches on.
+COUNTRY_FIELDS = ('alpha_2', 'alpha_3', 'numeric', 'name', 'official_name', 'common_name', 'flag')
+
+_country_index = None
+
+
+def country_index() -> FrozenSet[str]:
+    '''
+    Lowercased names, official names, common names and codes of all countries.
+    '''
+    global _country_index
+    if _country_index is None:
+        _country_index = frozenset(getattr(country, field).lower()
+                                   for country in pycountry.countries
+                                   for field in COUNTRY_FIELDS
+                                   if isinstance(getattr(country, field, None), str))
+    return _country_index
+
+def is_country(string: Optional[str]) -> bool:
+    '''
+    Same as checking whether `pycountry.countries.lookup(string)` succeeds.
+    '''
+    return isinstance(string, str) and string.lower() in country_index()
+
+def country_aware_comma_split(string_list: List[str]) -> List[str]:
+    comma_split_list = []
+
+    for part in string_list:
+        # Split the strings by comma.
+        sub_parts = [sub_part.strip() for sub_part in COMMA_SPLIT_PATTERN.split(part)]
+        sub_parts_iter = iter(sub_parts)
+
+        # Merge the split strings if the latter component is a country name.
+        for sub_part in sub_parts_iter:
+            if is_country(sub_part):
+                continue  # Skip country names if they appear as the first sub_part.
+            next_part = next(sub_parts_iter, None)
+            if is_country(next_part):
+                comma_split_list.append(f"{sub_part}, {next_part}")
+            else:
+                comma_split_list.append(sub_part)
+                if next_part:
+                    comma_split_list.append(next_part)
+    return comma_split_list
+
+def strip_at_prefix(string: str) -> str:
+    '''
+    Same as removing every match of `AT_PREFIX_PATTERN`, which retries the lazy prefix from every position,
+    in one pass over the string.
+    '''
+    if '\n' in string:
+        # '.' does not match line breaks, so the prefix is removed line by line.
+        return AT_PREFIX_PATTERN.sub('', string)
+    prefix_end = 0
+    for m in AT_PATTERN.finditer(string):
+        prefix_end = m.end()
+    return string[prefix_end:]
+
+@lru_cache(maxsize=1 << 16)
+def clean_affiliation(affiliation_string: str) -> Tuple[str, ...]:
+    '''
+    Split one affiliation string into the affiliations it names, dropping the parts that describe a person's identity.
+    '''
+    substring_list = [part.strip() for part in AFFILIATION_SPLIT_PATTERN.split(affiliation_string)]
+    # Further split the substrings by ',' if the latter component is not a country.
+    substring_list = country_aware_comma_split(substring_list)
+
+    cleaned_affiliations = []
+    for substring in substring_list:
+        cleaned_affiliation = strip_at_prefix(substring).strip()
+        if not IDENTITY_PATTERN.search(cleaned_affiliation):
+            cleaned_affiliations.append(cleaned_affiliation)
+    return tuple(cleaned_affiliations)
+
+def clean_affiliations(affiliation_strings: Iterable[str]) -> List[Tuple[str, ...]]:
+    '''
+    Batch version of `clean_affiliation`. Every distinct string is only cleaned once.
+    '''
+    return [clean_affiliation(affiliation_string) for affiliation_string in affiliation_strings]
@@ -0,0 +1,93 @@
+'''
+Per-string cost of cleaning affiliation strings: the previous per-call regex compilation and pycountry lookups
+versus the precompiled, memoized `affiliation_cleaning` engine.
+
+Usage: python benchmarks/bench_affiliation_cleaning.py [--num-strings N] [--num-institutions N]
+'''
+import argparse
+import os
+import pycountry
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import affiliation_cleaning
+from scholar_fixtures import affiliation_string
+
+
+def legacy_iscountry(string: str) -> bool:
+    try:
+        pycountry.countries.lookup(string)
+        return True
+    except LookupError:
+        return False
+
+def legacy_country_aware_comma_split(string_list):
+    comma_split_list = []
+    for part in string_list:
+        sub_parts_iter = iter([sub_part.strip() for sub_part in re.split(r'[,，]', part)])
+        for sub_part in sub_parts_iter:
+            if legacy_iscountry(sub_part):
+                continue
+            next_part = next(sub_parts_iter, None)
+            if legacy_iscountry(next_part):
+                comma_split_list.append(f"{sub_part}, {next_part}")
+            else:
+                comma_split_list.append(sub_part)
+                if next_part:
+                    comma_split_list.append(next_part)
+    return comma_split_list
+
+def legacy_clean_affiliation(affiliation_string: str):
+    substring_list = [part.strip() for part in re.split(r'[;]|\band\b', affiliation_string)]
+    cleaned_affiliations = []
+    for substring in legacy_country_aware_comma_split(substring_list):
+        cleaned_affiliation = re.sub(r'.*?\bat\b|.*?@', '', substring, flags=re.IGNORECASE).strip()
+        is_common_identity_string = re.search(
+            re.compile(
+                r'\b(director|manager|chair|engineer|programmer|scientist|professor|lecturer|phd|ph\.d|postdoc|doctor|student|department of)\b',
+                re.IGNORECASE),
+            cleaned_affiliation)
+        if not is_common_identity_string:
+            cleaned_affiliations.append(cleaned_affiliation)
+    return tuple(cleaned_affiliations)
+
+def measure(fn, strings):
+    start = time.perf_counter()
+    results = fn(strings)
+    seconds = time.perf_counter() - start
+    return results, seconds / len(strings) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-strings', type=int, default=100000)
+    parser.add_argument('--num-institutions', type=int, default=2000,
+                        help='Distinct institutions the strings are drawn from. Fewer means more repeated strings.')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    strings = [affiliation_string(rng, args.num_institutions) for _ in range(args.num_strings)]
+    print('%d affiliation strings, %d distinct.\n' % (len(strings), len(set(strings))))
+
+    legacy_results, legacy_us = measure(lambda batch: [legacy_clean_affiliation(s) for s in batch], strings)
+    affiliation_cleaning.clean_affiliation.cache_clear()
+    cold_results, cold_us = measure(affiliation_cleaning.clean_affiliations, strings)
+    warm_results, warm_us = measure(affiliation_cleaning.clean_affiliations, strings)
+    assert legacy_results == cold_results == warm_results, 'Cleaning results differ.'
+    # Without memoization: every string distinct.
+    affiliation_cleaning.clean_affiliation.cache_clear()
+    distinct_strings = list(dict.fromkeys(strings))
+    _, distinct_us = measure(affiliation_cleaning.clean_affiliations, distinct_strings)
+
+    print('%-40s %12s %9s' % ('', 'us/string', 'speedup'))
+    print('%-40s %12.2f %9s' % ('before', legacy_us, ''))
+    print('%-40s %12.2f %8.1fx' % ('after, distinct strings only', distinct_us, legacy_us / distinct_us))
+    print('%-40s %12.2f %8.1fx' % ('after, empty cache', cold_us, legacy_us / cold_us))
+    print('%-40s %12.2f %8.1fx' % ('after, warm cache', warm_us, legacy_us / warm_us))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+'''
+Stage artifacts on a synthetic run: disk size and save / load time of the pickled tuples and the csv table (with its index column)
+versus the typed Parquet artifacts, including a read of only the columns needed to draw the map.
+The artifacts are checked to load back the same data.
+
+Usage: python benchmarks/bench_artifacts.py [--num-rows N]
+'''
+import argparse
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from citation_artifacts import load_artifact_tuples, load_citation_table, save_artifact, save_citation_table
+from citation_table import CITATION_COLUMNS, MAP_COLUMNS, citation_frame
+from schoarly_support_new import NO_AUTHOR_FOUND_STR
+from scholar_fixtures import citation_rows
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def save_pickle(data, path):
+    with open(path, 'wb') as fd:
+        pickle.dump(data, fd)
+
+def load_pickle(path):
+    with open(path, 'rb') as fd:
+        return pickle.load(fd)
+
+def save_legacy_csv(rows, path):
+    pd.DataFrame(rows, columns=CITATION_COLUMNS).to_csv(path)
+
+def load_legacy_csv(path):
+    return list(pd.read_csv(path, index_col=0).itertuples(index=False, name=None))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rows = citation_rows(args.num_rows, NO_AUTHOR_FOUND_STR)
+    affiliation_rows = [(author_name, citing_paper, cited_paper, affiliation)
+                        for author_name, citing_paper, cited_paper, affiliation, *_ in rows]
+    folder = tempfile.mkdtemp()
+    try:
+        print('%d citation rows.\n' % len(rows))
+        print('%-40s %10s %10s %10s' % ('artifact', 'size', 'save', 'load'))
+
+        def report(name, path, save_time, load_time):
+            print('%-40s %8.1fMB %9.2fs %9.2fs' % (name, os.path.getsize(path) / 1e6, save_time, load_time))
+
+        path = os.path.join(folder, 'author_paper_affiliations.pkl')
+        _, save_time = timed(save_pickle, affiliation_rows, path)
+        _, load_time = timed(load_pickle, path)
+        report('step 3 tuples, pickle', path, save_time, load_time)
+        path = os.path.join(folder, 'author_paper_affiliations.parquet')
+        _, save_time = timed(save_artifact, affiliation_rows, path, 'author_paper_affiliations')
+        loaded, load_time = timed(load_artifact_tuples, path, 'author_paper_affiliations')
+        assert loaded == affiliation_rows
+        report('step 3 tuples, parquet', path, save_time, load_time)
+
+        path = os.path.join(folder, 'citation_info.csv')
+        _, save_time = timed(save_legacy_csv, rows, path)
+        _, load_time = timed(load_legacy_csv, path)
+        report('citation table, csv with index', path, save_time, load_time)
+        citation_df = citation_frame(rows)
+        path = os.path.join(folder, 'citation_info.parquet')
+        _, save_time = timed(save_citation_table, citation_df, path)
+        loaded_df, load_time = timed(load_citation_table, path)
+        pd.testing.assert_frame_equal(loaded_df, citation_df)
+        report('citation table, parquet', path, save_time, load_time)
+        map_df, load_time = timed(load_citation_table, path, columns=MAP_COLUMNS)
+        pd.testing.assert_frame_equal(map_df, citation_df[MAP_COLUMNS])
+        report('citation table, parquet, map columns', path, 0, load_time)
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
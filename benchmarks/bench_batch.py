@@ -0,0 +1,74 @@
+'''
+Batch mode on a synthetic lab: page requests and geocoder requests to map every member of a lab,
+with one run per scholar (each with its own caches, then sharing the profile and geocode caches, like runs
+under the same cache folder) versus one batch run. Co-authored papers and citing authors shared by several members
+are what the batch saves. Every scholar is checked to get the same citations in all three cases.
+
+Usage: python benchmarks/bench_batch.py [--num-scholars N] [--papers-per-scholar N]
+'''
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+import citation_map_webdriver
+import rate_control
+from browser_pool import BrowserPool
+from citation_cache import AuthorProfileStore, CitationSnapshotStore, GeocodeCache
+from scholar_fixtures import StubGeolocator, synthetic_lab
+
+
+def run(scholar_ids, site, batch: bool, shared_caches: bool = True):
+    '''
+    Map every scholar of the lab. Returns scholar ID -> set of citation rows, the requests by kind and the wall time.
+    '''
+    citation_map_webdriver.geolocator = StubGeolocator()
+    browser_pool = BrowserPool.from_drivers([site])
+    site.num_requests.clear()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if batch:
+            results = citation_map_webdriver.stream_batch_citation_pipeline(
+                scholar_ids, browser_pool, AuthorProfileStore(), geocode_cache=GeocodeCache(), snapshot_store=CitationSnapshotStore())
+        else:
+            caches = (AuthorProfileStore(), GeocodeCache(), CitationSnapshotStore())
+            results = {}
+            for scholar_id in scholar_ids:
+                profile_store, geocode_cache, snapshot_store = caches if shared_caches else \
+                    (AuthorProfileStore(), GeocodeCache(), CitationSnapshotStore())
+                results[scholar_id] = citation_map_webdriver.stream_citation_pipeline(
+                    scholar_id, browser_pool, profile_store, geocode_cache=geocode_cache, snapshot_store=snapshot_store)
+    elapsed = time.perf_counter() - start
+    num_requests = dict(site.num_requests, geocoder=citation_map_webdriver.geolocator.num_requests)
+    citation_map_webdriver.geolocator = None
+    return {scholar_id: set(coordinates_and_info) for scholar_id, (_, _, coordinates_and_info) in results.items()}, num_requests, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-scholars', type=int, default=20)
+    parser.add_argument('--papers-per-scholar', type=int, default=30)
+    args = parser.parse_args()
+
+    # No pacing: the fake site answers at once.
+    rate_control.default_rate_controller = rate_control.AdaptiveRateController(rate=1e9, max_rate=1e9, burst=1e9, jitter=0)
+    scholar_ids, site = synthetic_lab(args.num_scholars, args.papers_per_scholar)
+    print('%d scholars, %d unique papers (%d on profiles), %d citing authors.\n' % (
+        len(scholar_ids), len(site.citations), sum(len(publications) for publications in site.publications.values()),
+        len(site.profiles)))
+
+    runs = [run(scholar_ids, site, batch=False, shared_caches=False), run(scholar_ids, site, batch=False), run(scholar_ids, site, batch=True)]
+    assert all(rows == runs[-1][0] for rows, _, _ in runs), 'The batch run found different citations.'
+
+    print('%-20s %18s %18s %10s' % ('', 'one run per scholar', 'same, shared caches', 'batch'))
+    for kind in ['publication lists', 'citation pages', 'author profiles', 'geocoder']:
+        print('%-20s %18d %18d %10d' % (kind + ' requests', *(num_requests.get(kind, 0) for _, num_requests, _ in runs)))
+    print('%-20s %17.2fs %17.2fs %9.2fs' % ('time (no pacing)', *(elapsed for _, _, elapsed in runs)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+'''
+Post-geocoding stages on a synthetic citation table: the citation stats and the grouping of citations into map pins,
+looping over 10-tuples as before versus on the columnar table, plus the per country / institution / cited paper summaries.
+The columnar results are checked against the tuple loops.
+
+Usage: python benchmarks/bench_citation_table.py [--num-rows N]
+'''
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from citation_table import affiliation_pins, citation_frame, citation_stats, cited_paper_summary, country_summary, \
+    institution_summary
+from schoarly_support_new import NO_AUTHOR_FOUND_STR
+from scholar_fixtures import citation_rows
+
+
+def legacy_count_citation_stats(coordinates_and_info):
+    unique_author_list, unique_affiliation_list, unique_country_list = set(), set(), set()
+    for (author_name, _, _, affiliation_name, _, _, _, _, _, country) in coordinates_and_info:
+        if affiliation_name == NO_AUTHOR_FOUND_STR:
+            continue
+        unique_author_list.add(author_name)
+        unique_affiliation_list.add(affiliation_name)
+        unique_country_list.add(country)
+        num_authors, num_affiliations, num_countries = \
+            len(unique_author_list), len(unique_affiliation_list), len(unique_country_list)
+    return num_authors, num_affiliations, num_countries
+
+def legacy_affiliation_pins(coordinates_and_info):
+    affiliation_map = {}
+    for entry_idx, (_, _, _, affiliation_name, _, _, _, _, _, _) in enumerate(coordinates_and_info):
+        if affiliation_name == NO_AUTHOR_FOUND_STR:
+            continue
+        elif affiliation_name not in affiliation_map.keys():
+            affiliation_map[affiliation_name] = [entry_idx]
+        else:
+            affiliation_map[affiliation_name].append(entry_idx)
+
+    pins = []
+    for affiliation_name in affiliation_map:
+        corresponding_entries = affiliation_map[affiliation_name]
+        author_name_list = []
+        location_valid = True
+        for entry_idx in corresponding_entries:
+            author_name, _, _, _, lat, lon, _, _, _, _  = coordinates_and_info[entry_idx]
+            if pd.isna(lat) or pd.isna(lon) or lat == '' or lon == '':
+                location_valid = False
+            author_name_list.append(author_name)
+        if location_valid:
+            pins.append((affiliation_name, lat, lon, ' & '.join(author_name_list)))
+    return pins
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rows = citation_rows(args.num_rows, NO_AUTHOR_FOUND_STR)
+    citation_df, frame_time = timed(citation_frame, rows)
+    print('%d citation rows, converted to the columnar table in %.2fs (once per run).\n' % (len(citation_df), frame_time))
+
+    print('%-24s %12s %12s %9s' % ('stage', 'tuples', 'columnar', 'speedup'))
+    legacy_stats, legacy_stats_time = timed(legacy_count_citation_stats, rows)
+    stats, stats_time = timed(citation_stats, citation_df)
+    assert stats == legacy_stats, (stats, legacy_stats)
+    print('%-24s %11.2fs %11.3fs %8.0fx' % ('citation stats', legacy_stats_time, stats_time, legacy_stats_time / stats_time))
+
+    legacy_pins, legacy_pins_time = timed(legacy_affiliation_pins, rows)
+    pins, pins_time = timed(affiliation_pins, citation_df)
+    assert list(pins.itertuples(index=False, name=None)) == legacy_pins
+    print('%-24s %11.2fs %11.3fs %8.0fx' % ('map pins', legacy_pins_time, pins_time, legacy_pins_time / pins_time))
+
+    for name, summary in [('by country', country_summary), ('by institution', institution_summary),
+                          ('by cited paper', cited_paper_summary)]:
+        summary_df, summary_time = timed(summary, citation_df)
+        assert summary_df['citations'].sum() == len(rows) - len(range(0, len(rows), 100))
+        if summary is country_summary:
+            authors_per_country = {}
+            for author_name, _, _, affiliation_name, _, _, _, _, _, country in rows:
+                if affiliation_name != NO_AUTHOR_FOUND_STR:
+                    authors_per_country.setdefault(country, set()).add(author_name)
+            assert {country if isinstance(country, str) else None: num_authors for country, num_authors
+                    in zip(summary_df['country'], summary_df['citing authors'])} == \
+                {country: len(authors) for country, authors in authors_per_country.items()}
+        print('%-24s %12s %11.3fs %9s   (%d groups)' % ('summary ' + name, '-', summary_time, '-', len(summary_df)))
+
+
+if __name__ == '__main__':
+    main()
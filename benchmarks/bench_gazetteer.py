@@ -0,0 +1,93 @@
+'''
+Cost per affiliation of finding known institutions and invalid terms: the previous linear substring scans
+versus the `gazetteer` automaton, for growing synthetic gazetteers.
+
+Usage: python benchmarks/bench_gazetteer.py [--num-strings N] [--sizes N [N ...]]
+'''
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gazetteer import Gazetteer
+from schoarly_support_new import INVALID_AFFILIATION_TERMS, KNOWN_AFFILIATION_DICT
+from scholar_fixtures import affiliation_string, institution_gazetteer, institution_name
+
+
+def legacy_match(institutions, invalid_terms, affiliation_name):
+    invalid = False
+    for key in invalid_terms:
+        if key in affiliation_name.lower():
+            invalid = True
+            break
+    for key in institutions:
+        if key in affiliation_name.lower():
+            return invalid, institutions[key]
+    return invalid, None
+
+def check_edge_cases():
+    institutions = {'meta': ('a',) * 4 + (1.0, 1.0), 'metamaterials lab': ('b',) * 4 + (2.0, 2.0),
+                    'lab': ('c',) * 4 + (3.0, 3.0), 'ab': ('d',) * 4 + (4.0, 4.0), 'abab': ('e',) * 4 + (5.0, 5.0)}
+    invalid_terms = {'lab', 'school', 'schools of'}
+    gazetteer = Gazetteer(institutions, invalid_terms)
+    rng = random.Random(0)
+    strings = ['', 'Meta', 'METAMATERIALS LAB', 'the lab of meta', 'xababx', 'schools', 'School of Meta',
+               'Ümlaut Lab', 'abab', 'bab'] + [''.join(rng.choice('metalabschoolx ') for _ in range(rng.randint(0, 30)))
+                                                for _ in range(20000)]
+    for string in strings:
+        assert gazetteer.match(string) == legacy_match(institutions, invalid_terms, string), string
+
+    # Round trip through both file formats.
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, 'gazetteer.csv')
+        gazetteer.export_csv(csv_path)
+        loaded = Gazetteer.from_file(csv_path)
+        assert loaded.institutions == gazetteer.institutions and loaded.invalid_terms == gazetteer.invalid_terms
+        json_path = os.path.join(folder, 'gazetteer.json')
+        with open(json_path, 'w') as fd:
+            fd.write('{"institutions": {"Meta": ["a", "a", "a", "a", 1, 1]}, "invalid_terms": ["Lab"]}')
+        loaded = Gazetteer.from_file(json_path)
+        assert loaded.match('the Lab of META') == (True, ('a', 'a', 'a', 'a', 1.0, 1.0))
+
+def measure(fn, strings):
+    start = time.perf_counter()
+    results = [fn(string) for string in strings]
+    return results, (time.perf_counter() - start) / len(strings) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-strings', type=int, default=2000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='Numbers of synthetic institutions, on top of the built-in ones.')
+    args = parser.parse_args()
+
+    check_edge_cases()
+    rng = random.Random(0)
+    # Half of the affiliations name a synthetic institution, which may or may not be in the gazetteer.
+    strings = [affiliation_string(rng) if i % 2 else 'Professor, %s, USA' % institution_name(rng).title()
+               for i in range(args.num_strings)]
+
+    print('%-12s %10s %12s %14s %14s %9s' % ('institutions', 'nodes', 'build (s)', 'before us/str', 'after us/str', 'speedup'))
+    for size in [0] + args.sizes:
+        institutions = dict(KNOWN_AFFILIATION_DICT)
+        for name, location in institution_gazetteer(size).items():
+            institutions.setdefault(name, location)
+        start = time.perf_counter()
+        gazetteer = Gazetteer(institutions, INVALID_AFFILIATION_TERMS)
+        build_seconds = time.perf_counter() - start
+
+        # The linear scans get slow on large gazetteers, so they only run on a sample.
+        sample = strings[:max(100, len(strings) * 1000 // max(size, 1000))]
+        legacy_results, legacy_us = measure(lambda string: legacy_match(institutions, INVALID_AFFILIATION_TERMS, string), sample)
+        results, us = measure(gazetteer.match, strings)
+        assert results[:len(sample)] == legacy_results, 'Matches differ for %d institutions.' % size
+        print('%-12d %10d %12.2f %14.1f %14.1f %8.1fx' % (len(institutions), len(gazetteer._automaton), build_seconds,
+                                                         legacy_us, us, legacy_us / us))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+'''
+Instrumentation on a synthetic lab crawled from a fake Scholar site: the cost of a span and of a timed function call
+when instrumentation is disabled, and the wall time of the whole pipeline without instrumentation, with the metrics
+and with the metrics plus the trace. The metrics summary of the run is printed, and the trace is checked to hold
+one event per recorded span. All runs are checked to find the same citations.
+
+Usage: python benchmarks/bench_instrumentation.py [--num-scholars N] [--papers-per-scholar N]
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+import citation_map_webdriver
+import instrumentation
+import rate_control
+import scholar_parsers
+from browser_pool import BrowserPool
+from citation_cache import AuthorProfileStore, CitationSnapshotStore, GeocodeCache
+from scholar_fixtures import StubGeolocator, read_fixture, synthetic_lab
+
+
+def run(scholar_ids, site):
+    citation_map_webdriver.geolocator = StubGeolocator()
+    browser_pool = BrowserPool.from_drivers([site])
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = citation_map_webdriver.stream_batch_citation_pipeline(
+            scholar_ids, browser_pool, AuthorProfileStore(), geocode_cache=GeocodeCache(), snapshot_store=CitationSnapshotStore())
+    elapsed = time.perf_counter() - start
+    citation_map_webdriver.geolocator = None
+    return {scholar_id: set(coordinates_and_info) for scholar_id, (_, _, coordinates_and_info) in results.items()}, elapsed
+
+def per_call_seconds(statement, number: int = 200000) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number
+
+def empty_span():
+    with instrumentation.span('x'):
+        pass
+
+def empty_block():
+    pass
+
+timed_empty_block = instrumentation.timed('x')(empty_block)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-scholars', type=int, default=10)
+    parser.add_argument('--papers-per-scholar', type=int, default=30)
+    args = parser.parse_args()
+
+    instrumentation.disable()
+    empty_block_time = per_call_seconds(empty_block)
+    disabled_span_time = per_call_seconds(empty_span)
+    timed_call_time = per_call_seconds(timed_empty_block)
+    profile_page = read_fixture('author_profile.html')
+    parse_time = per_call_seconds(lambda: scholar_parsers.parse_author_profile(profile_page), number=2000)
+    print('Disabled instrumentation, compared to parsing one author profile page (%.0fus):' % (parse_time * 1e6))
+    print('    span:            %4.0fns per block' % ((disabled_span_time - empty_block_time) * 1e9))
+    print('    timed function:  %4.0fns per call' % ((timed_call_time - empty_block_time) * 1e9))
+
+    # No pacing: the fake site answers at once, so that the instrumentation is a larger share of the run.
+    rate_control.default_rate_controller = rate_control.AdaptiveRateController(rate=1e9, max_rate=1e9, burst=1e9, jitter=0)
+    scholar_ids, site = synthetic_lab(args.num_scholars, args.papers_per_scholar)
+    print('\n%d scholars, %d unique papers, %d citing authors.' % (len(scholar_ids), len(site.citations), len(site.profiles)))
+    run(scholar_ids, site)  # Warm up.
+
+    rows, disabled_time = run(scholar_ids, site)
+    instrumentation.enable()
+    metrics_rows, metrics_time = run(scholar_ids, site)
+    instrumentation.enable(record_trace=True)
+    site.num_requests.clear()
+    trace_rows, trace_time = run(scholar_ids, site)
+    instrumentation.disable()
+    assert rows == metrics_rows == trace_rows, 'Instrumentation changed the results.'
+
+    summary = instrumentation.metrics_summary()
+    with tempfile.TemporaryDirectory() as folder:
+        trace_path = os.path.join(folder, 'trace.json')
+        instrumentation.write_trace(trace_path)
+        with open(trace_path) as fd:
+            trace = json.load(fd)
+    num_span_events = sum(1 for trace_event in trace['traceEvents'] if trace_event['ph'] == 'X')
+    assert num_span_events == sum(stats['count'] for stats in summary['spans'].values())
+    assert summary['counters']['requests.citation page'] == site.num_requests['citation pages']
+
+    print('\n%-30s %9s' % ('pipeline run', 'time'))
+    print('%-30s %8.2fs' % ('instrumentation disabled', disabled_time))
+    print('%-30s %8.2fs' % ('metrics', metrics_time))
+    print('%-30s %8.2fs   (%d trace events)' % ('metrics and trace', trace_time, len(trace['traceEvents'])))
+    print()
+    instrumentation.print_metrics()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+Citation map rendering: HTML size and time to create and render the map of N synthetic affiliations,
+with one `folium.Marker` per pin versus one clustered data array. Both maps are checked to hold the same pins and popups.
+
+Usage: python benchmarks/bench_map_rendering.py [--sizes 1000 10000 100000] [--max-classic N]
+'''
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from citation_render import create_map
+from scholar_fixtures import institution_gazetteer
+
+DATA_PATTERN = re.compile(r'var data = (\[.*?\]);\n', re.DOTALL)
+
+
+def coordinates_and_info(num_affiliations: int, seed: int = 0):
+    '''
+    Rows of the citation table, with 1 - 3 citing authors per affiliation and a few affiliations without a location.
+    '''
+    rng = random.Random(seed)
+    rows = []
+    for affiliation_idx, (affiliation_name, (county, city, state, country, lat, lon)) in enumerate(
+            institution_gazetteer(num_affiliations, seed).items()):
+        if affiliation_idx % 50 == 0:
+            lat, lon = float('nan'), float('nan')
+        for author_idx in range(rng.randint(1, 3)):
+            rows.append(('Author <%d-%d>' % (affiliation_idx, author_idx), 'Citing paper', 'Cited paper',
+                         affiliation_name.title(), lat, lon, county, city, state, country))
+    return rows
+
+def render(rows, cluster_markers: bool):
+    random.seed(0)
+    start = time.perf_counter()
+    page = create_map(rows, pin_colorful=True, cluster_markers=cluster_markers).get_root().render()
+    return page, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--max-classic', type=int, default=10000, help='Largest size rendered with one marker per pin.')
+    args = parser.parse_args()
+
+    print('%-14s %8s %14s %14s %14s %14s' % ('affiliations', 'pins', 'marker size', 'marker time', 'cluster size', 'cluster time'))
+    for size in args.sizes:
+        rows = coordinates_and_info(size)
+        cluster_page, cluster_time = render(rows, cluster_markers=True)
+        data = json.loads(DATA_PATTERN.search(cluster_page).group(1))
+        assert len(data) == size - len(range(0, size, 50))
+
+        marker_columns = ['%14s' % '-', '%14s' % '-']
+        if size <= args.max_classic:
+            marker_page, marker_time = render(rows, cluster_markers=False)
+            assert marker_page.count('L.marker(') == len(data)
+            assert all(popup in marker_page for _, _, _, popup in data), 'The clustered popups differ from the marker popups.'
+            marker_columns = ['%12.1fMB' % (len(marker_page) / 1e6), '%13.2fs' % marker_time]
+        print('%-14d %8d %s %s %12.1fMB %13.2fs' % (size, len(data), *marker_columns, len(cluster_page) / 1e6, cluster_time))
+
+
+if __name__ == '__main__':
+    main()
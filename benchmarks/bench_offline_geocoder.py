@@ -0,0 +1,92 @@
+'''
+Lookups per second of the offline geocoder on a synthetic institution file, for exact, normalized, misspelled
+and unknown affiliation names, with the share of correct locations.
+
+Usage: python benchmarks/bench_offline_geocoder.py [--num-institutions N] [--num-queries N]
+'''
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from offline_geocoder import OFFLINE_GEOCODER_CSV_COLUMNS, OfflineGeocoder
+from scholar_fixtures import institution_gazetteer, institution_name
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    position = rng.randrange(len(name))
+    return name[:position] + rng.choice('aeiourstn') + name[position + 1:]
+
+def check_ror_formats(folder: str):
+    v1 = [{'name': 'Université Exemple', 'aliases': ['Example U'], 'labels': [{'label': 'Beispiel Universität'}], 'acronyms': ['UE'],
+           'addresses': [{'lat': 1.5, 'lng': 2.5, 'city': 'Exampleville', 'state': None,
+                          'geonames_city': {'geonames_admin2': {'name': 'Example County'}}}],
+           'country': {'country_name': 'France'}}]
+    v2 = [{'names': [{'value': 'Example Institute', 'types': ['ror_display']}, {'value': 'EI', 'types': ['acronym']}],
+           'locations': [{'geonames_details': {'lat': 3.0, 'lng': 4.0, 'name': 'Sampletown',
+                                               'country_subdivision_name': 'Samplestate', 'country_name': 'Germany'}}]}]
+    for records, query, expected in [(v1, 'universite exemple', (1.5, 2.5, 'Example County', 'Exampleville', None, 'France')),
+                                     (v1, 'Beispiel-Universität', (1.5, 2.5, 'Example County', 'Exampleville', None, 'France')),
+                                     (v2, 'The Example Institute', (3.0, 4.0, None, 'Sampletown', 'Samplestate', 'Germany'))]:
+        path = os.path.join(folder, 'ror.json')
+        with open(path, 'w', encoding='utf-8') as fd:
+            json.dump(records, fd)
+        geocoder = OfflineGeocoder.from_file(path)
+        assert geocoder.geocode(query) == expected, query
+        assert geocoder.geocode('UE') is None and geocoder.geocode('EI') is None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-institutions', type=int, default=100000)
+    parser.add_argument('--num-queries', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    institutions = institution_gazetteer(args.num_institutions)
+    with tempfile.TemporaryDirectory() as folder:
+        check_ror_formats(folder)
+        csv_path = os.path.join(folder, 'institutions.csv')
+        with open(csv_path, 'w', newline='', encoding='utf-8') as fd:
+            writer = csv.writer(fd)
+            writer.writerow(OFFLINE_GEOCODER_CSV_COLUMNS)
+            for name, (county, city, state, country, latitude, longitude) in institutions.items():
+                writer.writerow([name.title(), name.upper().replace(' OF ', ' '), latitude, longitude, county, city, state, country])
+        start = time.perf_counter()
+        geocoder = OfflineGeocoder.from_file(csv_path)
+        print('Built the index in %.2f s.\n' % (time.perf_counter() - start))
+
+    names = list(institutions)
+    sampled = [rng.choice(names) for _ in range(args.num_queries)]
+    query_sets = [
+        ('exact', [(name.title(), name) for name in sampled]),
+        ('normalized', [('The %s.' % name.upper().replace(' OF ', ' of ').replace('UNIVERSITY', 'University'), name) for name in sampled]),
+        ('misspelled', [(misspell(name.title(), rng), name) for name in sampled]),
+        ('unknown', [])
+    ]
+    while len(query_sets[-1][1]) < args.num_queries:
+        name = institution_name(rng)
+        if name not in institutions:
+            query_sets[-1][1].append((name.title(), None))
+
+    print('%-12s %14s %10s %10s' % ('queries', 'lookups/s', 'found', 'correct'))
+    for query_type, queries in query_sets:
+        start = time.perf_counter()
+        results = [geocoder.geocode(query) for query, _ in queries]
+        seconds = time.perf_counter() - start
+        found = [(result, name) for result, (_, name) in zip(results, queries) if result is not None]
+        correct = sum(1 for result, name in found
+                      if name is not None and result == (institutions[name][4], institutions[name][5]) + institutions[name][:4])
+        print('%-12s %14.0f %9.1f%% %9.1f%%' % (query_type, len(queries) / seconds, 100 * len(found) / len(queries),
+                                                100 * correct / max(len(found), 1)))
+        if query_type in ('exact', 'normalized'):
+            assert correct == len(queries), 'Not every %s query was located correctly.' % query_type
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+'''
+Parse throughput per Scholar page type: the previous full BeautifulSoup tree versus `scholar_parsers`.
+
+Usage: python benchmarks/bench_parsers.py [--repeat N] [--publication-rows N]
+'''
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scholar_parsers
+from scholar_fixtures import paper_title, publication_list_page, read_fixture
+
+
+def legacy_get_html_per_citation_page(soup):
+    '''
+    The citation results of a page as parsed before `scholar_parsers`, from its full BeautifulSoup tree.
+    '''
+    citing_authors_and_citing_papers = []
+
+    for result in soup.find_all('div', class_='gs_ri'):
+        title_tag = result.find('h3', class_='gs_rt')
+        if title_tag:
+            paper_parsed = False
+            author_links = result.find_all('a', href=True)
+            title_text = title_tag.get_text()
+            title = title_text.replace('[HTML]', '').replace('[PDF]', '')
+            for link in author_links:
+                if 'user=' in link['href']:
+                    author_id = link['href'].split('user=')[1].split('&')[0]
+                    citing_authors_and_citing_papers.append((author_id, title))
+                    paper_parsed = True
+            if not paper_parsed:
+                print("[WARNING!] Could not find author links for ", title)
+                citing_authors_and_citing_papers.append((scholar_parsers.NO_AUTHOR_FOUND_STR, title))
+        else:
+            continue
+    return citing_authors_and_citing_papers
+
+def legacy_parse_citation_page(page_source: str):
+    soup = BeautifulSoup(page_source, 'html.parser')
+    results = legacy_get_html_per_citation_page(soup)
+    next_page_hrefs = []
+    current_page_number = 1
+    for navigation in soup.find_all('a', class_='gs_nma'):
+        if navigation.text.isnumeric() and int(navigation.text) == current_page_number + 1:
+            current_page_number += 1
+            next_page_hrefs.append(navigation['href'])
+    return results, next_page_hrefs
+
+def legacy_parse_publication_rows(page_source: str):
+    soup = BeautifulSoup(page_source, 'html.parser')
+    results, seen_cites_ids = [], set()
+    for row in soup.select('tr.gsc_a_tr'):
+        title_el = row.select_one('a.gsc_a_at')
+        cites_el = row.select_one('a.gsc_a_ac')
+        if not title_el or not cites_el:
+            continue
+        m = re.search(r'cites=([^&]+)', cites_el.get('href', ''))
+        if not m or m.group(1) in seen_cites_ids:
+            continue
+        seen_cites_ids.add(m.group(1))
+        count_text = cites_el.get_text(strip=True)
+        results.append((m.group(1), title_el.get_text(strip=True), int(count_text) if count_text.isdigit() else 0))
+    return results
+
+def legacy_parse_author_profile(page_source: str):
+    soup = BeautifulSoup(page_source, 'html.parser')
+    name_el = soup.select_one('#gsc_prf_in')
+    aff_el = soup.select_one('.gsc_prf_il')
+    return (name_el.get_text(strip=True) if name_el else scholar_parsers.NO_AUTHOR_FOUND_STR,
+            aff_el.get_text(strip=True) if aff_el else '')
+
+def measure(parse_fn, page_source: str, repeat: int):
+    # Silence the warnings about results without author links.
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = parse_fn(page_source)
+        seconds = time.perf_counter() - start
+    return result, repeat / seconds, len(page_source) * repeat / seconds / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--publication-rows', type=int, default=1000,
+                        help='Rows of the synthetic expanded publication list, on top of the saved fixture pages.')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    large_publication_list = publication_list_page([(str(i), paper_title(rng), args.publication_rows - i)
+                                                    for i in range(args.publication_rows)])
+    cases = [
+        ('citation results', read_fixture('citation_results.html'), legacy_parse_citation_page, scholar_parsers.parse_citation_page),
+        ('author profile', read_fixture('author_profile.html'), legacy_parse_author_profile, scholar_parsers.parse_author_profile),
+        ('publication list', read_fixture('publication_list.html'), legacy_parse_publication_rows, scholar_parsers.parse_publication_rows),
+        ('publication list (%d rows)' % args.publication_rows, large_publication_list,
+         legacy_parse_publication_rows, scholar_parsers.parse_publication_rows),
+    ]
+
+    print('Backend: %s\n' % ('lxml' if scholar_parsers.HAS_LXML else 'BeautifulSoup with SoupStrainer'))
+    print('%-30s %10s %14s %14s %14s %14s %9s' % ('page type', 'size (KB)', 'before page/s', 'before MB/s',
+                                                 'after page/s', 'after MB/s', 'speedup'))
+    for name, page_source, legacy_fn, fast_fn in cases:
+        repeat = max(1, args.repeat // 10) if len(page_source) > 1e6 else args.repeat
+        legacy_result, legacy_pages, legacy_mb = measure(legacy_fn, page_source, repeat)
+        fast_result, fast_pages, fast_mb = measure(fast_fn, page_source, repeat)
+        assert legacy_result == fast_result, 'Parsers disagree on %s.' % name
+        print('%-30s %10.0f %14.1f %14.2f %14.1f %14.2f %8.1fx' % (
+            name, len(page_source) / 1e3, legacy_pages, legacy_mb, fast_pages, fast_mb, fast_pages / legacy_pages))
+
+
+if __name__ == '__main__':
+    main()
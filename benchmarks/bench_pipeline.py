@@ -0,0 +1,172 @@
+'''
+End-to-end and per-stage throughput of the crawler on synthetic Scholar profiles, fully offline.
+
+Every profile (from 10 to 10,000 papers by default) is served by a fake Chrome driver (`FakeScholarDriver`) with
+a configurable page load latency and CAPTCHA rate; injected CAPTCHAs are solved by a simulated user pressing Enter.
+With `--unattended`, nobody solves them: blocked pages are set aside and retried after a cooldown instead, and the
+units still blocked after the last attempt are reported as pending. Affiliations are geocoded by a stub geocoder with its own latency. Each profile is crawled twice with fresh caches:
+once step by step, to time every stage with the instrumentation, and once with the streaming pipeline.
+The crawled citations are checked against the synthetic profile, and both runs are checked to find the same citations
+(leaving out the citations of pending units in unattended runs).
+
+Usage: python benchmarks/bench_pipeline.py [--num-papers N [N ...]] [--latency SECONDS] [--captcha-rate P]
+                                           [--geocoder-latency SECONDS] [--num-browsers N]
+                                           [--unattended] [--blocked-cooldown SECONDS]
+'''
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+import citation_map_webdriver
+import citation_render
+import fetchers
+import instrumentation
+import rate_control
+from browser_pool import BrowserPool
+from citation_cache import AuthorProfileStore, CitationSnapshotStore, GeocodeCache
+from quarantine import CrawlQuarantine
+from scholar_fixtures import FakeScholarDriver, SimulatedUser, StubGeolocator, synthetic_profile
+
+# Stage spans of a step-by-step run, and what their throughput is counted in.
+STAGES = [('stage.citing authors', 'citing papers'),
+          ('stage.citing affiliations', 'citing authors'),
+          ('stage.clean affiliations', 'affiliations'),
+          ('stage.geocode', 'affiliations'),
+          ('stage.export csv', 'citations'),
+          ('render.create map', 'citations'),
+          ('render.save map', 'citations'),
+          ('stage.export summaries', 'citations')]
+
+
+@contextlib.contextmanager
+def fake_session(site, args):
+    '''
+    Browser pool of fake drivers on `site`, a stub geocoder, a simulated user (or none, with `--unattended`)
+    and the quarantine of blocked units, without any pacing.
+    '''
+    drivers = [FakeScholarDriver(site, latency=args.latency, captcha_rate=args.captcha_rate, seed=seed)
+               for seed in range(args.num_browsers)]
+    user = SimulatedUser(drivers)
+    citation_map_webdriver.geolocator = StubGeolocator(latency=args.geocoder_latency)
+    rate_control.default_rate_controller = rate_control.AdaptiveRateController(
+        rate=1e9, max_rate=1e9, min_rate=1e9, burst=1e9, jitter=0, cooldown_seconds=0)
+    quarantine = CrawlQuarantine(cooldown_seconds=args.blocked_cooldown)
+    fetchers.interactive_captcha = not args.unattended
+    stdin, sys.stdin = sys.stdin, user
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield BrowserPool.from_drivers(drivers), drivers, user, quarantine
+    finally:
+        sys.stdin = stdin
+        fetchers.interactive_captcha = True
+        citation_map_webdriver.geolocator = None
+
+def step_by_step_run(scholar_id, browser_pool, quarantine, output_folder):
+    '''
+    The steps of `generate_citation_map_selenium` with `streaming=False`, from the crawl to the map.
+    '''
+    profile_store, geocode_cache = AuthorProfileStore(), GeocodeCache()
+    citing_author_papers = citation_map_webdriver.find_all_citing_authors(
+        scholar_id, snapshot_store=CitationSnapshotStore(), browser_pool=browser_pool, quarantine=quarantine)
+    author_paper_affiliations = list(set(citation_map_webdriver.find_all_citing_affiliations_selenium(
+        citing_author_papers, None, profile_store=profile_store, browser_pool=browser_pool, quarantine=quarantine)))
+    author_paper_affiliations = list(set(
+        author_paper_affiliations + citation_map_webdriver.clean_affiliation_names(author_paper_affiliations)))
+    coordinates_and_info = sorted(set(citation_map_webdriver.affiliation_text_to_geocode(
+        author_paper_affiliations, geocode_cache=geocode_cache)))
+    draw(coordinates_and_info, output_folder)
+    return citing_author_papers, author_paper_affiliations, coordinates_and_info
+
+def streaming_run(scholar_id, browser_pool, quarantine, output_folder):
+    citing_author_papers, author_paper_affiliations, coordinates_and_info = citation_map_webdriver.stream_citation_pipeline(
+        scholar_id, browser_pool, AuthorProfileStore(), geocode_cache=GeocodeCache(), snapshot_store=CitationSnapshotStore(),
+        quarantine=quarantine)
+    coordinates_and_info = sorted(set(coordinates_and_info))
+    draw(coordinates_and_info, output_folder)
+    return citing_author_papers, author_paper_affiliations, coordinates_and_info
+
+def draw(coordinates_and_info, output_folder):
+    citation_render.export_dict_to_csv(coordinates_and_info, os.path.join(output_folder, 'citation_info.csv'))
+    with instrumentation.span('render.create map'):
+        citation_map = citation_render.create_map(coordinates_and_info)
+    with instrumentation.span('render.save map'):
+        citation_map.save(os.path.join(output_folder, 'citation_map.html'))
+    citation_render.export_citation_summaries(coordinates_and_info, output_folder)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-papers', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per page load.')
+    parser.add_argument('--captcha-rate', type=float, default=0.0, help='Share of page loads answered by a CAPTCHA.')
+    parser.add_argument('--geocoder-latency', type=float, default=0.0, help='Seconds per geocoder request.')
+    parser.add_argument('--num-browsers', type=int, default=1)
+    parser.add_argument('--unattended', action='store_true', help='Retry blocked pages instead of solving CAPTCHAs.')
+    parser.add_argument('--blocked-cooldown', type=float, default=0.05, help='Seconds before the first retry of a blocked page.')
+    args = parser.parse_args()
+
+    print('Page load latency %.3fs, CAPTCHA rate %.3f, geocoder latency %.3fs, %d browser(s)%s.' % (
+        args.latency, args.captcha_rate, args.geocoder_latency, args.num_browsers,
+        ', unattended with a %.2fs cooldown' % args.blocked_cooldown if args.unattended else ''))
+    for num_papers in args.num_papers:
+        scholar_id, site = synthetic_profile(num_papers)
+        expected_citing_author_papers = sorted(site.citing_author_papers(scholar_id))
+        with tempfile.TemporaryDirectory() as output_folder:
+            instrumentation.enable()
+            with fake_session(site, args) as (browser_pool, drivers, user, step_quarantine):
+                start = time.perf_counter()
+                step_results = step_by_step_run(scholar_id, browser_pool, step_quarantine, output_folder)
+                step_time = time.perf_counter() - start
+            instrumentation.disable()
+            summary = instrumentation.metrics_summary()
+            num_requests = sum(site.num_requests.values())
+            num_captchas = sum(driver.num_captchas for driver in drivers)
+            # The crawler keeps the space left by the '[PDF]' tag before the citing paper titles.
+            citing_author_papers = sorted((author_id, citing_paper_title.strip(), cited_paper_title)
+                                          for author_id, citing_paper_title, cited_paper_title in step_results[0])
+            if not any(unit['kind'] != 'author_profile' for unit in step_quarantine.pending()):
+                assert citing_author_papers == expected_citing_author_papers, 'The crawl missed or invented citations.'
+            assert set(citing_author_papers) <= set(expected_citing_author_papers), 'The crawl invented citations.'
+            if args.unattended:
+                assert user.num_solved == 0 and step_quarantine.num_deferred >= num_captchas > 0 or num_captchas == 0
+            else:
+                assert user.num_solved >= min(num_captchas, 1)
+
+            site.num_requests.clear()
+            with fake_session(site, args) as (browser_pool, _, _, stream_quarantine):
+                start = time.perf_counter()
+                stream_results = streaming_run(scholar_id, browser_pool, stream_quarantine, output_folder)
+                stream_time = time.perf_counter() - start
+            if not step_quarantine.pending() and not stream_quarantine.pending():
+                assert stream_results[2] == step_results[2], 'The streaming pipeline found different citations.'
+
+        citing_author_papers, author_paper_affiliations, coordinates_and_info = step_results
+        num_items = {'citing papers': len(citing_author_papers),
+                     'citing authors': len(set(author_id for author_id, _, _ in citing_author_papers)),
+                     'affiliations': len(set(affiliation for *_, affiliation in author_paper_affiliations)),
+                     'citations': len(coordinates_and_info)}
+        print('\n%d papers: %d citing papers, %d citing authors, %d page loads, %d CAPTCHAs, %d geocoder requests.' % (
+            num_papers, num_items['citing papers'], num_items['citing authors'], num_requests, num_captchas,
+            summary['spans'].get('geocode.forward', {}).get('count', 0)))
+        if args.unattended:
+            for name, quarantine in [('step by step', step_quarantine), ('streaming', stream_quarantine)]:
+                report = quarantine.report()
+                print('    %-28s %d blocked units deferred, %d recovered by a retry, %d still pending' % (
+                    'blocked pages, ' + name, report['deferred'], report['recovered'], len(report['pending'])))
+        print('    %-28s %9s %16s' % ('stage', 'time', 'throughput'))
+        for stage, unit in STAGES:
+            stage_time = summary['spans'].get(stage, {}).get('total_seconds', 0.0)
+            print('    %-28s %8.2fs %10.0f %s/s' % (stage, stage_time, num_items[unit] / max(stage_time, 1e-9), unit))
+        for name, run_time in [('end to end, step by step', step_time), ('end to end, streaming', stream_time)]:
+            print('    %-28s %8.2fs %10.0f papers/s, %.0f page loads/s' % (
+                name, run_time, num_papers / run_time, num_requests / run_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+'''
+Memory and time to hold the records of a group map, as lists of tuples versus interned record stores.
+
+A synthetic group of scholars gets 1M citations (some of them on papers co-authored by two scholars), which arrive
+by publications of 100 citations as from the crawler. Both versions collect, for every scholar and for the whole group,
+the (citing author, citing paper, cited paper) records, the affiliation entries and the geocoded citation rows,
+deduplicate them and sort the citation rows, and export every scholar and then the group:
+- tuples: the lists, owner sets and `list(set(...))` / `dict.fromkeys` passes of the pipeline before the record stores,
+  which keeps the lists of all scholars until the group is exported.
+- records: `RecordStore`s sharing one `InternTable`, with the records of every publication inserted in one batch and the
+  citation rows joined from the affiliation entries and the place of each affiliation. The group is the union of the
+  scholars, built while they are exported, and every scholar is released once exported.
+The rows are generated while tracing memory, so the strings kept alive by each version count towards its peak.
+Both versions are checked to export the same records, on a smaller group.
+
+Usage: python benchmarks/bench_records.py [--num-rows N] [--num-scholars N] [--check-rows N]
+'''
+import argparse
+import gc
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+
+from typing import Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from citation_records import AUTHOR_PAPER_AFFILIATION_FIELDS, CITING_AUTHOR_PAPER_FIELDS, InternTable, RecordStore
+from citation_table import CITATION_COLUMNS
+from schoarly_support_new import NO_AUTHOR_FOUND_STR
+from scholar_fixtures import iter_citation_rows
+
+# The crawler gets the citations of a publication at once. A group with 1M citations has thousands of publications.
+CITATIONS_PER_PUBLICATION = 100
+
+
+def group_rows(num_rows: int, num_scholars: int):
+    '''
+    (citation row, owners) pairs. Every 10th cited paper is co-authored by two scholars.
+    '''
+    for row in iter_citation_rows(num_rows, NO_AUTHOR_FOUND_STR):
+        paper_idx = int(row[2].rsplit(' ', 1)[1])
+        owners = [paper_idx % num_scholars]
+        if paper_idx % 10 == 0:
+            owners.append((paper_idx + 1) % num_scholars)
+        yield row, owners
+
+def tuple_lists(num_rows: int, num_scholars: int, export) -> None:
+    citing_lists = [[] for _ in range(num_scholars)]
+    entry_lists = [[] for _ in range(num_scholars)]
+    # Affiliation entry -> the scholars it belongs to, and the geocoded rows.
+    entry_owners, coordinates_and_info = {}, []
+    for row, owners in group_rows(num_rows, num_scholars):
+        entry = row[:4]
+        if entry not in entry_owners:
+            entry_owners[entry] = set()
+            coordinates_and_info.append(row)
+        for owner in owners:
+            citing_lists[owner].append(row[:3])
+            if owner not in entry_owners[entry]:
+                entry_owners[entry].add(owner)
+                entry_lists[owner].append(entry)
+    coordinates_lists = [[] for _ in range(num_scholars)]
+    for row in coordinates_and_info:
+        for owner in entry_owners[row[:4]]:
+            coordinates_lists[owner].append(row)
+    del coordinates_and_info, entry_owners
+
+    group = tuple(list(dict.fromkeys(record for records in lists for record in records))
+                  for lists in (citing_lists, entry_lists, coordinates_lists))
+    for citing, entries, coordinates in list(zip(citing_lists, entry_lists, coordinates_lists)) + [group]:
+        export(citing, entries, sorted(list(set(coordinates))))
+
+def record_stores(num_rows: int, num_scholars: int, export) -> None:
+    strings = InternTable()
+    citing_stores = [RecordStore(CITING_AUTHOR_PAPER_FIELDS, strings) for _ in range(num_scholars)]
+    entry_stores = [RecordStore(AUTHOR_PAPER_AFFILIATION_FIELDS, strings) for _ in range(num_scholars)]
+    # Affiliation -> its place, geocoded once.
+    geo_info_dict = {}
+    rows = group_rows(num_rows, num_scholars)
+    while True:
+        page = list(itertools.islice(rows, CITATIONS_PER_PUBLICATION))
+        if not page:
+            break
+        owner_rows = {}
+        for row, owners in page:
+            geo_info_dict.setdefault(row[3], row[4:])
+            for owner in owners:
+                owner_rows.setdefault(owner, []).append(row)
+        for owner, rows_of_owner in owner_rows.items():
+            citing_stores[owner].extend(row[:3] for row in rows_of_owner)
+            entry_stores[owner].extend(row[:4] for row in rows_of_owner)
+    results = [(citing_store, entry_store, entry_store.join('affiliation', geo_info_dict, CITATION_COLUMNS[4:]))
+               for citing_store, entry_store in zip(citing_stores, entry_stores)]
+    del citing_stores, entry_stores
+
+    group = [RecordStore(store.fields, strings) for store in results[0]]
+    while results:
+        stores = results.pop(0)
+        for group_store, store in zip(group, stores):
+            group_store.extend(store)
+        stores[2].sort()
+        export(*stores)
+        del stores
+    group[2].sort()
+    export(*group)
+
+def tuple_nbytes(records, seen: dict) -> int:
+    '''
+    Memory taken by a list of tuples, without the strings they refer to nor the tuples in `seen` (by id), which it adds to.
+    '''
+    nbytes = sys.getsizeof(records)
+    for record in records:
+        if id(record) not in seen:
+            seen[id(record)] = record
+            nbytes += sys.getsizeof(record)
+    return nbytes
+
+def measure(build, num_rows: int, num_scholars: int):
+    '''
+    Number of records exported, seconds, and the peak MB of memory allocated by `build`, with an export that only counts
+    the records. Memory is traced in a second run, as tracing slows down the allocations.
+    '''
+    num_records = [0]
+
+    def export(*results):
+        num_records[0] += sum(len(records) for records in results)
+
+    gc.collect()
+    start = time.perf_counter()
+    build(num_rows, num_scholars, export)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    build(num_rows, num_scholars, lambda *results: None)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return num_records[0], elapsed, peak / 1e6
+
+def check(num_rows: int, num_scholars: int) -> Tuple[float, float]:
+    '''
+    Check that both versions export the same records. Returns the bytes per record of both, without the strings.
+    '''
+    exports = {tuple_lists: [], record_stores: []}
+    nbytes = {tuple_lists: 0, record_stores: 0}
+    # Tuples shared by several lists are counted once. Keeping them keeps their ids.
+    seen_tuples = {}
+    for build in exports:
+        def export(*results, build=build):
+            if build is record_stores:
+                nbytes[build] += sum(records.nbytes() for records in results)
+                results = [list(records) for records in results]
+            else:
+                nbytes[build] += sum(tuple_nbytes(records, seen_tuples) for records in results)
+            exports[build].append(results)
+
+        build(num_rows, num_scholars, export)
+    for tuple_result, store_result in zip(exports[tuple_lists], exports[record_stores]):
+        # The citing author records were not deduplicated before.
+        assert list(dict.fromkeys(tuple_result[0])) == store_result[0] and tuple_result[1] == store_result[1]
+        assert tuple_result[2] == store_result[2], 'The record stores sort or deduplicate differently.'
+    num_records = sum(len(records) for results in exports[record_stores] for records in results)
+    return nbytes[tuple_lists] / num_records, nbytes[record_stores] / num_records
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-rows', type=int, default=1000000)
+    parser.add_argument('--num-scholars', type=int, default=10)
+    parser.add_argument('--check-rows', type=int, default=50000, help='Number of citations of the group checked.')
+    args = parser.parse_args()
+
+    tuple_record_bytes, store_record_bytes = check(args.check_rows, args.num_scholars)
+    num_records, tuple_time, tuple_peak = measure(tuple_lists, args.num_rows, args.num_scholars)
+    _, store_time, store_peak = measure(record_stores, args.num_rows, args.num_scholars)
+
+    print('%d citations of %d scholars: %d records exported for the scholars and the group.\n' % (
+        args.num_rows, args.num_scholars, num_records))
+    print('%-10s %10s %12s' % ('', 'time', 'peak memory'))
+    print('%-10s %9.2fs %10.0fMB' % ('tuples', tuple_time, tuple_peak))
+    print('%-10s %9.2fs %10.0fMB' % ('records', store_time, store_peak))
+    print('\nPeak memory %.1fx smaller, in %.2fx the time. Without the strings, a record takes %.0f bytes as a tuple '
+          'in lists and %.0f bytes as codes.' % (tuple_peak / store_peak, store_time / tuple_time, tuple_record_bytes,
+                                                 store_record_bytes))
+
+if __name__ == '__main__':
+    main()
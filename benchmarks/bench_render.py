@@ -0,0 +1,112 @@
+'''
+Cold start of re-rendering a map from the citation table of a previous run, in a fresh Python process each time:
+- crawler module: `import citation_map_webdriver` and `generate_citation_map_selenium(..., parse_csv=True)`.
+- render module: `import citation_render` and `render_citation_map(...)`.
+- stats only: `render_citation_map(..., output_path=None)`, which exports the summaries without drawing the map.
+The render module is checked not to import the crawler (Selenium, HTTP client, page parsers, fetchers, caches)
+nor the geocoders, all ways are checked to count the same stats, and a re-render after editing the csv file is checked
+to see the edit.
+
+Usage: python benchmarks/bench_render.py [--num-rows N] [--repeat N]
+'''
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+# Modules a render-only process must not load. folium loads requests itself, so it is only checked without a map.
+CRAWLER_MODULES = ['selenium', 'requests', 'bs4', 'lxml', 'geopy', 'pycountry', 'fetchers', 'browser_pool',
+                   'citation_cache', 'schoarly_support_new', 'scholar_parsers', 'citation_map_webdriver', 'offline_geocoder',
+                   'reverse_geocoder']
+FOLIUM_MODULES = ['folium', 'requests']
+SCHOLAR_ID = 'scholar'
+
+
+def child(mode: str, cache_folder: str) -> None:
+    '''
+    Run one way of rendering and print its timings, stats and loaded modules as JSON.
+    '''
+    start = time.perf_counter()
+    csv_path = os.path.join(cache_folder, SCHOLAR_ID, 'citation_info.csv')
+    if mode == 'crawler module':
+        import citation_map_webdriver
+        import_time = time.perf_counter() - start
+        citation_map_webdriver.generate_citation_map_selenium(SCHOLAR_ID, parse_csv=True, cache_folder=cache_folder,
+                                                              print_citing_affiliations=False)
+        from citation_render import count_citation_stats, read_csv_to_dict
+        stats = count_citation_stats(read_csv_to_dict(csv_path))
+    else:
+        import citation_render
+        import_time = time.perf_counter() - start
+        output_path = None if mode == 'stats only' else os.path.join(cache_folder, SCHOLAR_ID, 'citation_map.html')
+        stats = citation_render.render_citation_map(csv_path, output_path)
+    total_time = time.perf_counter() - start
+    loaded = [name for name in CRAWLER_MODULES + ['folium'] if name in sys.modules]
+    sys.stdout.write('\n' + json.dumps({'import': import_time, 'total': total_time, 'stats': [int(n) for n in stats],
+                                        'loaded': loaded}))
+
+def run_child(mode: str, cache_folder: str):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, cache_folder],
+                            check=True, capture_output=True, text=True, cwd=ROOT_FOLDER,
+                            env=dict(os.environ, TQDM_DISABLE='1')).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - start
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'CACHE_FOLDER'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        child(*args.child)
+        return
+
+    from citation_render import export_dict_to_csv
+    from schoarly_support_new import NO_AUTHOR_FOUND_STR
+    from scholar_fixtures import citation_rows
+
+    with tempfile.TemporaryDirectory() as cache_folder:
+        csv_path = os.path.join(cache_folder, SCHOLAR_ID, 'citation_info.csv')
+        os.makedirs(os.path.dirname(csv_path))
+        export_dict_to_csv(citation_rows(args.num_rows, NO_AUTHOR_FOUND_STR), csv_path)
+
+        print('Re-rendering a map of %d citations, best of %d fresh processes.\n' % (args.num_rows, args.repeat))
+        print('%-16s %10s %10s %10s   %s' % ('', 'imports', 'in process', 'process', 'crawler modules loaded'))
+        results = {}
+        for mode in ['crawler module', 'render module', 'stats only']:
+            runs = [run_child(mode, cache_folder) for _ in range(args.repeat)]
+            result = min(runs, key=lambda run: run['process'])
+            results[mode] = result
+            crawler_modules = [name for name in result['loaded']
+                               if name not in (FOLIUM_MODULES if 'folium' in result['loaded'] else ['folium'])]
+            print('%-16s %9.2fs %9.2fs %9.2fs   %s' % (mode, result['import'], result['total'], result['process'],
+                                                      ', '.join(crawler_modules) or '-'))
+            if mode != 'crawler module':
+                assert not crawler_modules, 'The render module imported %s.' % ', '.join(crawler_modules)
+            assert result['stats'] == results['crawler module']['stats'], 'The render module counts different stats.'
+        assert 'folium' not in results['stats only']['loaded'], 'Counting the stats imported folium.'
+
+        # Add a citation by a new author from a new place: the re-render must read the edited csv, not the stale Parquet table.
+        time.sleep(0.01)
+        with open(csv_path, 'a', newline='') as fd:
+            csv.writer(fd).writerow(['Edited Author', 'Edited paper', 'Cited paper 0', 'Edited Institute', 10.0, 20.0,
+                                     '', 'Edited City', '', 'Edited Country'])
+        edited = run_child('stats only', cache_folder)
+        assert edited['stats'] == [n + 1 for n in results['stats only']['stats']], 'The csv edit was not rendered.'
+        print('\n%.1fx faster cold start than through the crawler module. After editing the csv file: %s citing authors, '
+              '%s affiliations and %s countries.' % (results['crawler module']['process'] / results['render module']['process'],
+                                                    *edited['stats']))
+
+
+if __name__ == '__main__':
+    main()
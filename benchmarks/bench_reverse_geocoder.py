@@ -0,0 +1,81 @@
+'''
+Offline reverse geocoding: lookups per second of the grid index versus a scan of every place (with identical results),
+and the number of geocoder requests per located affiliation, counted with a stub geolocator.
+
+Usage: python benchmarks/bench_reverse_geocoder.py [--num-places N] [--num-queries N]
+'''
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import citation_map_webdriver
+from reverse_geocoder import OfflineReverseGeocoder, haversine_km
+from scholar_fixtures import StubGeolocator
+
+
+def brute_force_nearest(places, latitude, longitude, max_distance_km):
+    best_distance, best_place_idx = max_distance_km, None
+    for place_idx, (place_latitude, place_longitude) in enumerate(places):
+        distance = haversine_km(latitude, longitude, place_latitude, place_longitude)
+        if distance <= best_distance:
+            best_distance, best_place_idx = distance, place_idx
+    return best_place_idx
+
+def count_requests(num_affiliations: int):
+    '''
+    Geocoder requests for `num_affiliations` unknown affiliations, with and without address details in the response.
+    '''
+    reverse_geocoder = OfflineReverseGeocoder()
+    reverse_geocoder.add(10.1, 20.1, ('Offline County', 'Offline City', 'Offline State', 'Offlineland'))
+    counts = []
+    for with_address, offline_reverse in [(True, None), (False, None), (False, reverse_geocoder)]:
+        citation_map_webdriver.geolocator = StubGeolocator(with_address)
+        citation_map_webdriver.reverse_geocoder = offline_reverse
+        results = [citation_map_webdriver.geocode_affiliation('Stub Institute %d' % i) for i in range(num_affiliations)]
+        expected = ('Stub County', 'Stub City', 'Stub State', 'Stubland') if offline_reverse is None \
+            else ('Offline County', 'Offline City', 'Offline State', 'Offlineland')
+        assert all(result[2:] == expected for result in results)
+        counts.append(citation_map_webdriver.geolocator.num_requests / num_affiliations)
+    citation_map_webdriver.geolocator, citation_map_webdriver.reverse_geocoder = None, None
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-places', type=int, default=100000)
+    parser.add_argument('--num-queries', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    places = [(rng.uniform(-85, 85), rng.uniform(-180, 180)) for _ in range(args.num_places)]
+    queries = [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(args.num_queries)]
+
+    print('%-16s %14s %14s %14s %9s' % ('max distance', 'found', 'scan lookups/s', 'grid lookups/s', 'speedup'))
+    for max_distance_km in [50, 500]:
+        reverse_geocoder = OfflineReverseGeocoder(max_distance_km=max_distance_km)
+        for place_idx, (latitude, longitude) in enumerate(places):
+            reverse_geocoder.add(latitude, longitude, (None, 'City %d' % place_idx, None, None))
+        # Scanning every place is slow, so it only runs on a sample.
+        sample = queries[:max(100, len(queries) * 5000 // args.num_places)]
+        start = time.perf_counter()
+        expected = [brute_force_nearest(places, latitude, longitude, max_distance_km) for latitude, longitude in sample]
+        scan_rate = len(sample) / (time.perf_counter() - start)
+        start = time.perf_counter()
+        results = [reverse_geocoder.nearest(latitude, longitude) for latitude, longitude in queries]
+        grid_rate = len(queries) / (time.perf_counter() - start)
+        assert results[:len(sample)] == expected, 'The grid and the scan disagree within %d km.' % max_distance_km
+        print('%-16s %13.1f%% %14.0f %14.0f %8.0fx' % ('%d km' % max_distance_km, 100 * sum(r is not None for r in results) / len(results),
+                                                      scan_rate, grid_rate, grid_rate / scan_rate))
+
+    with_address, without_address, offline_reverse = count_requests(100)
+    print('\nGeocoder requests per located affiliation (previously 2: a forward lookup, then a reverse lookup):')
+    print('  address details in the response:           %.1f' % with_address)
+    print('  no address details, remote reverse lookup: %.1f' % without_address)
+    print('  no address details, offline reverse lookup: %.1f' % offline_reverse)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+'''
+Synthetic Google Scholar pages with the markup the crawler relies on, surrounded by page chrome of realistic size.
+Used to write the fixture pages in `benchmarks/fixtures/` and to build larger pages for the benchmarks.
+'''
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetchers import PageFetcher
+from selenium.common.exceptions import NoSuchElementException
+
+FIXTURE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Scholar pages carry a lot of inline style and script around the content.
+PAGE_CHROME_HEAD = ('<!doctype html><html><head><meta charset="utf-8"><title>Google Scholar</title>'
+                    '<style>' + ''.join('.gs_x%d{margin:%dpx;padding:%dpx;color:#%06x}' % (i, i % 9, i % 7, i * 997 % 0xffffff)
+                                        for i in range(600)) + '</style>'
+                    '<script>' + ''.join('var gs_v%d=function(a){return a*%d+"%s";};' % (i, i, 'x' * (i % 40))
+                                         for i in range(400)) + '</script></head><body>'
+                    '<div id="gs_hdr"><div id="gs_hdr_drw">' + ''.join('<a class="gs_btnP gs_in_ib" href="/scholar?x=%d"><span>Menu %d</span></a>' % (i, i)
+                                                                       for i in range(60)) + '</div></div>')
+PAGE_CHROME_TAIL = '<div id="gs_ftr">' + ''.join('<a href="/intl/en/scholar/%d.html">Footer link %d</a>' % (i, i) for i in range(40)) + '</div></body></html>'
+
+
+class StubLocation(object):
+    def __init__(self, latitude, longitude, raw):
+        self.latitude, self.longitude, self.raw = latitude, longitude, raw
+
+class StubGeolocator(object):
+    '''
+    Answers every affiliation without network, after `latency` seconds, and counts the requests.
+    '''
+
+    def __init__(self, with_address: bool = True, latency: float = 0.0):
+        self.with_address = with_address
+        self.latency = latency
+        self.num_requests = 0
+
+    def geocode(self, query, addressdetails=False, language=False):
+        self.num_requests += 1
+        time.sleep(self.latency)
+        raw = {}
+        if addressdetails and self.with_address:
+            raw['address'] = {'county': 'Stub County', 'city': 'Stub City', 'state': 'Stub State', 'country': 'Stubland'}
+        return StubLocation(10.0, 20.0, raw)
+
+    def reverse(self, query, language=False):
+        self.num_requests += 1
+        time.sleep(self.latency)
+        return StubLocation(10.0, 20.0, {'address': {'county': 'Stub County', 'city': 'Stub City', 'state': 'Stub State', 'country': 'Stubland'}})
+
+
+class FakeScholarSite(PageFetcher):
+    '''
+    Serves synthetic publication lists, citation results and author profiles, and counts the requests by kind.
+    '''
+
+    def __init__(self, publications, citations, profiles):
+        # scholar ID -> [(cites_id or None, title, num_citations)], cites_id -> [([citing author IDs], citing paper title)],
+        # author ID -> (name, affiliation).
+        self.publications, self.citations, self.profiles = publications, citations, profiles
+        self.num_requests = Counter()
+        self._lock = threading.Lock()
+        # Profile pages only differ by name and affiliation, so that serving them costs little next to parsing them.
+        self._profile_template = author_profile_page('\0name\0', '\0affiliation\0', num_publications=5)
+
+    def fetch(self, url, ready_selector=None):
+        kind, page_source = self.page(url)
+        with self._lock:
+            self.num_requests[kind] += 1
+        return page_source
+
+    def page(self, url):
+        '''
+        The kind and the HTML of the page at `url`.
+        '''
+        query = {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+        if 'cites' in query:
+            start, num = int(query.get('start', 0)), int(query.get('num', 10))
+            results = self.citations[query['cites']]
+            return 'citation pages', citation_results_page(results[start:start + num], cites_id=query['cites'],
+                                                           num_results=len(results))
+        elif query.get('view_op') == 'list_works':
+            cstart, pagesize = int(query['cstart']), int(query['pagesize'])
+            return 'publication lists', publication_list_page(self.publications[query['user']][cstart:cstart + pagesize])
+        name, affiliation = self.profiles[query['user']]
+        return 'author profiles', self._profile_template.replace('\0name\0', name).replace('\0affiliation\0', affiliation)
+
+    def citing_author_papers(self, scholar_id):
+        '''
+        The (citing author ID, citing paper title, cited paper title) tuples the crawler should find for `scholar_id`.
+        '''
+        return [(citing_author_id, citing_paper_title, cited_paper_title)
+                for cites_id, cited_paper_title, _ in self.publications[scholar_id] if cites_id is not None
+                for citing_author_ids, citing_paper_title in self.citations[cites_id]
+                for citing_author_id in citing_author_ids]
+
+
+class FakeElement(object):
+    pass
+
+class FakeScholarDriver(object):
+    '''
+    Stands in for a Selenium Chrome driver on a `FakeScholarSite`, with the surface the crawler uses:
+    `get`, `page_source`, `find_element(s)` with CSS selectors, `current_url` and `quit`.
+
+    Every page load takes `latency` seconds, and is answered by a CAPTCHA page with probability `captcha_rate`.
+    The CAPTCHA page stays until `solve_captcha` is called (e.g. by a `SimulatedUser`), or until the next page load.
+    '''
+
+    def __init__(self, site: FakeScholarSite, latency: float = 0.0, captcha_rate: float = 0.0, seed: int = 0):
+        self.site = site
+        self.latency = latency
+        self.captcha_rate = captcha_rate
+        self.current_url = None
+        self.num_captchas = 0
+        self._rng = random.Random(seed)
+        self._page_source = ''
+        self._captcha_pending = False
+
+    def get(self, url):
+        time.sleep(self.latency)
+        self.current_url = url
+        self._captcha_pending = self._rng.random() < self.captcha_rate
+        if self._captcha_pending:
+            self.num_captchas += 1
+        self._page_source = self.site.fetch(url)
+
+    @property
+    def page_source(self):
+        return captcha_page() if self._captcha_pending else self._page_source
+
+    def solve_captcha(self):
+        self._captcha_pending = False
+
+    def find_elements(self, by, selector):
+        # Only the CSS selectors the crawler waits for: '#id', 'tag', '.class' and 'tag.class'.
+        if selector.startswith('#'):
+            pattern = r'id="%s"' % re.escape(selector[1:])
+        else:
+            tag, _, class_name = selector.partition('.')
+            pattern = r'<%s[^>]*' % (re.escape(tag) or r'\w+')
+            if class_name:
+                pattern += r'class="[^"]*\b%s\b' % re.escape(class_name)
+        return [FakeElement() for _ in re.finditer(pattern, self.page_source)]
+
+    def find_element(self, by, selector):
+        elements = self.find_elements(by, selector)
+        if not elements:
+            raise NoSuchElementException('No element matches %s.' % selector)
+        return elements[0]
+
+    def quit(self):
+        return
+
+
+class SimulatedUser(object):
+    '''
+    Stands in for `sys.stdin` while CAPTCHAs are injected: when the crawler waits for Enter,
+    the user solves the CAPTCHAs shown by `drivers` and presses Enter.
+    '''
+
+    def __init__(self, drivers: List[FakeScholarDriver]):
+        self.drivers = drivers
+        self.num_solved = 0
+
+    def readline(self):
+        for driver in self.drivers:
+            driver.solve_captcha()
+        self.num_solved += 1
+        return '\n'
+
+
+def synthetic_lab(num_scholars: int, papers_per_scholar: int, seed: int = 0):
+    '''
+    Lab members co-author 1 - 3 of each other's papers, and their citing authors come from one shared community.
+    '''
+    rng = random.Random(seed)
+    scholar_ids = ['S%010dAAAJ' % i for i in range(num_scholars)]
+    num_papers = num_scholars * papers_per_scholar // 2
+    community = [author_id(i) for i in range(num_papers * 4)]
+    institutions = [institution_name(rng) for _ in range(max(1, len(community) // 8))]
+    profiles = {aid: ('Citing Author %s' % aid, 'Professor, %s' % rng.choice(institutions)) for aid in community}
+
+    publications = {scholar_id: [] for scholar_id in scholar_ids}
+    citations = {}
+    for paper_idx in range(num_papers):
+        cites_id = str(10 ** 6 + paper_idx)
+        # At most 20 citing papers, so that every paper has one result page.
+        citations[cites_id] = [(rng.sample(community, rng.randint(1, 3)), paper_title(rng)) for _ in range(rng.randint(3, 20))]
+        for scholar_id in rng.sample(scholar_ids, rng.randint(1, min(3, len(scholar_ids)))):
+            publications[scholar_id].append((cites_id, 'Lab paper %d' % paper_idx, len(citations[cites_id])))
+    for scholar_id in scholar_ids:
+        publications[scholar_id].sort(key=lambda publication: -publication[2])
+    return scholar_ids, FakeScholarSite(publications, citations, profiles)
+
+def synthetic_profile(num_papers: int, seed: int = 0):
+    '''
+    One scholar with `num_papers` papers, with a long tail of citation counts (a few papers with several result pages,
+    the last tenth uncited) and ~8 citations per citing author. Returns the scholar ID and the site.
+    '''
+    rng = random.Random(seed)
+    scholar_id = 'P%010dAAAJ' % num_papers
+    num_citations = [0 if paper_idx >= num_papers - num_papers // 10 else min(int(rng.paretovariate(1.2) * 4), 200)
+                     for paper_idx in range(num_papers)]
+    community = [author_id(i) for i in range(max(10, sum(num_citations) // 4))]
+    institutions = [institution_name(rng) for _ in range(max(1, len(community) // 8))]
+    profiles = {aid: ('Citing Author %s' % aid, 'Professor, %s' % rng.choice(institutions)) for aid in community}
+
+    publications, citations = [], {}
+    for paper_idx, paper_citations in enumerate(sorted(num_citations, reverse=True)):
+        cites_id = str(10 ** 6 + paper_idx) if paper_citations > 0 else None
+        publications.append((cites_id, 'Paper %d' % paper_idx, paper_citations))
+        if cites_id is not None:
+            citations[cites_id] = [(rng.sample(community, rng.randint(1, 3)), paper_title(rng)) for _ in range(paper_citations)]
+    return scholar_id, FakeScholarSite({scholar_id: publications}, citations, profiles)
+
+def author_id(author_idx: int) -> str:
+    return 'A%010dAAAJ' % author_idx
+
+def paper_title(rng: random.Random) -> str:
+    words = ['learning', 'neural', 'graph', 'robust', 'vision', 'language', 'model', 'efficient', 'scalable',
+             'citation', 'analysis', 'network', 'deep', 'sparse', 'adaptive', 'inference', 'survey', 'benchmark']
+    return ' '.join(rng.choice(words) for _ in range(rng.randint(5, 12))).capitalize()
+
+def affiliation_string(rng: random.Random, num_institutions: int = 2000) -> str:
+    '''
+    Affiliation tab of a profile, in the shapes seen on Google Scholar: roles, "at"/"@", ';' or 'and', countries.
+    '''
+    institution = rng.choice(['University of Synthetica %d', 'Synthetic Institute of Technology %d', 'Example Labs %d',
+                              'National Research Center %d', 'Fictional State University %d']) % rng.randrange(num_institutions)
+    country = rng.choice(['USA', 'Germany', 'China', 'United Kingdom', 'Korea, Republic of', 'India', 'Brazil'])
+    return rng.choice([
+        institution,
+        '%s, %s' % (institution, country),
+        'PhD Student, %s' % institution,
+        'Professor of Computer Science, %s, %s' % (institution, country),
+        'Research Scientist at %s' % institution,
+        'Postdoc @ %s; Visiting Researcher, %s' % (institution, country),
+        '%s and %s' % (institution, rng.choice(['Example Labs', 'Google', 'Microsoft Research'])),
+        'Department of Physics, %s，%s' % (institution, country),
+    ])
+
+def institution_name(rng: random.Random) -> str:
+    syllables = ['ka', 'lor', 'ben', 'tri', 'vo', 'san', 'mir', 'del', 'qua', 'zen', 'ro', 'phi', 'nus', 'gar', 'el', 'tor',
+                 'bu', 'cas', 'dri', 'fen', 'gol', 'hu', 'jas', 'kel', 'lum', 'mo', 'nar', 'pes', 'ril', 'sto', 'ul', 'wen']
+    place = ''.join(rng.choice(syllables) for _ in range(rng.randint(3, 4)))
+    return rng.choice(['university of %s', '%s institute of technology', '%s labs', 'national %s research center',
+                       '%s state university', 'hospital of %s']) % place
+
+def institution_gazetteer(num_institutions: int, seed: int = 0) -> dict:
+    '''
+    Lowercase institution name -> (county, city, state, country, latitude, longitude).
+    '''
+    rng = random.Random(seed)
+    institutions = {}
+    while len(institutions) < num_institutions:
+        institutions[institution_name(rng)] = (
+            'County %d' % rng.randrange(500), 'City %d' % rng.randrange(5000), 'State %d' % rng.randrange(50),
+            rng.choice(['USA', 'Germany', 'China', 'United Kingdom', 'India']),
+            round(rng.uniform(-60, 70), 6), round(rng.uniform(-180, 180), 6))
+    return institutions
+
+def citation_rows(num_rows: int, no_author_str: str, seed: int = 0) -> List[tuple]:
+    '''
+    Geocoded citation 10-tuples with ~10 citations per author, ~5 authors per affiliation, some unlocated affiliations
+    and some papers without any citing author (marked by `no_author_str`).
+    '''
+    return list(iter_citation_rows(num_rows, no_author_str, seed))
+
+def iter_citation_rows(num_rows: int, no_author_str: str, seed: int = 0) -> Iterator[tuple]:
+    '''
+    The rows of `citation_rows`, one after the other, e.g. to not keep them all alive.
+    '''
+    rng = random.Random(seed)
+    num_authors = max(1, num_rows // 10)
+    institutions = list(institution_gazetteer(max(1, num_authors // 5), seed).items())
+    author_affiliations = [rng.randrange(len(institutions)) for _ in range(num_authors)]
+    cited_papers = ['Cited paper %d' % i for i in range(200)]
+    for row_idx in range(num_rows):
+        if row_idx % 100 == 0:
+            yield (no_author_str, 'Citing paper %d' % row_idx, rng.choice(cited_papers), no_author_str,
+                   '', '', '', '', '', '')
+            continue
+        author_idx = rng.randrange(num_authors)
+        institution_idx = author_affiliations[author_idx]
+        affiliation, (county, city, state, country, lat, lon) = institutions[institution_idx]
+        if institution_idx % 20 == 0:
+            lat, lon, county, city, state, country = '', '', None, None, None, None
+        yield ('Author %s' % author_id(author_idx), 'Citing paper %d' % rng.randrange(num_rows // 3 + 1),
+               rng.choice(cited_papers), affiliation, lat, lon, county, city, state, country)
+
+def publication_list_page(publications: List[Tuple[Optional[str], str, int]]) -> str:
+    '''
+    Profile page with the publication table. `publications` are (cites_id or None, title, number of citations).
+    '''
+    rows = []
+    for cites_id, title, num_citations in publications:
+        cites_href = '/scholar?oi=bibs&hl=en&cites=%s' % cites_id if cites_id is not None else ''
+        rows.append('<tr class="gsc_a_tr"><td class="gsc_a_t"><a href="/citations?view_op=view_citation&amp;hl=en&amp;citation_for_view=X:%d" '
+                    'class="gsc_a_at">%s</a><div class="gs_gray">A Author, B Author, C Author</div>'
+                    '<div class="gs_gray">Journal of Synthetic Results %d<span class="gs_oph">, 2020</span></div></td>'
+                    '<td class="gsc_a_c"><a href="%s" class="gsc_a_ac gs_ibl">%s</a></td>'
+                    '<td class="gsc_a_y"><span class="gsc_a_h gsc_a_hc gs_ibl">2020</span></td></tr>' % (
+                        len(rows), title, len(rows), cites_href, num_citations if num_citations else ''))
+    return (PAGE_CHROME_HEAD +
+            '<div id="gsc_prf_i"><div id="gsc_prf_in">Profile Owner</div><div class="gsc_prf_il">Professor, Synthetic University</div>'
+            '<div id="gsc_prf_int"></div></div>'
+            '<table id="gsc_a_t"><thead><tr><th>Title</th><th>Cited by</th><th>Year</th></tr></thead>'
+            '<tbody id="gsc_a_b">' + ''.join(rows) + '</tbody></table>'
+            '<button id="gsc_bpf_more" class="gs_btnPD" disabled><span>Show more</span></button>' +
+            PAGE_CHROME_TAIL)
+
+def citation_results_page(results: List[Tuple[List[str], str]], num_pages: int = 1, cites_id: str = '1',
+                          num_results: Optional[int] = None) -> str:
+    '''
+    One page of citation results. `results` are (citing author IDs, citing paper title).
+    The navigation links to result pages 2 to `num_pages`. The header shows `num_results`, by default 10 per page.
+    '''
+    blocks = []
+    for author_ids, title in results:
+        authors = ', '.join('<a href="/citations?user=%s&amp;hl=en&amp;oi=sra">Author %s</a>' % (aid, aid[:4]) for aid in author_ids)
+        blocks.append('<div class="gs_r gs_or gs_scl"><div class="gs_ri"><h3 class="gs_rt"><span class="gs_ctg2">[PDF]</span> '
+                      '<a href="https://example.org/paper">%s</a></h3>'
+                      '<div class="gs_a">%s, X Other - Synthetic Venue, 2023 - example.org</div>'
+                      '<div class="gs_rs">%s</div>'
+                      '<div class="gs_fl"><a href="/scholar?cites=99&amp;hl=en">Cited by 3</a> <a href="/scholar?q=related">Related articles</a></div>'
+                      '</div></div>' % (title, authors, 'Abstract snippet. ' * 12))
+    navigation = ''.join('<a class="gs_nma" href="/scholar?start=%d&amp;hl=en&amp;cites=%s">%d</a>' % ((page - 1) * 10, cites_id, page)
+                         for page in range(2, num_pages + 1))
+    return (PAGE_CHROME_HEAD +
+            '<div id="gs_ab_md"><div class="gs_ab_mdw">About %d results</div></div>' % (
+                num_results if num_results is not None else num_pages * 10) +
+            '<div id="gs_res_ccl_mid">' + ''.join(blocks) + '</div>'
+            '<div id="gs_n"><center><table><tr><td>' + navigation + '</td></tr></table></center></div>' +
+            PAGE_CHROME_TAIL)
+
+def author_profile_page(name: str, affiliation: str, num_publications: int = 20, seed: int = 0) -> str:
+    '''
+    Author profile page, with the header holding the name and the affiliation.
+    '''
+    rng = random.Random(seed)
+    publications = [('%d' % (seed * 1000 + i), paper_title(rng), rng.randint(0, 50)) for i in range(num_publications)]
+    page_source = publication_list_page(publications)
+    return page_source.replace(
+        '<div id="gsc_prf_in">Profile Owner</div><div class="gsc_prf_il">Professor, Synthetic University</div>',
+        '<div id="gsc_prf_in">%s</div><div class="gsc_prf_il">%s</div>'
+        '<div class="gsc_prf_il" id="gsc_prf_ivh">Verified email at synthetic.edu</div>' % (name, affiliation))
+
+def captcha_page() -> str:
+    return (PAGE_CHROME_HEAD + '<div id="gs_captcha_ccl"><h1>Please show you\'re not a robot</h1>'
+            '<form id="gs_captcha_f"><div class="g-recaptcha"></div></form></div>' + PAGE_CHROME_TAIL)
+
+def write_fixtures(fixture_folder: str = FIXTURE_FOLDER, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    os.makedirs(fixture_folder, exist_ok=True)
+    publications = [(str(10 ** 15 + i) if i < 250 else None, paper_title(rng), max(0, 300 - i)) for i in range(300)]
+    results = [([author_id(rng.randint(0, 500)) for _ in range(rng.randint(0, 3))], paper_title(rng)) for _ in range(10)]
+    pages = {
+        'publication_list.html': publication_list_page(publications),
+        'citation_results.html': citation_results_page(results, num_pages=10),
+        'author_profile.html': author_profile_page('Ada Example', 'Associate Professor of Computer Science, <a href="/citations?view_op=view_org&amp;org=1" class="gsc_prf_ila">Example University</a>'),
+        'captcha.html': captcha_page(),
+    }
+    for file_name, page_source in pages.items():
+        with open(os.path.join(fixture_folder, file_name), 'w', encoding='utf-8') as fd:
+            fd.write(page_source)
+
+def read_fixture(file_name: str, fixture_folder: str = FIXTURE_FOLDER) -> str:
+    with open(os.path.join(fixture_folder, file_name), 'r', encoding='utf-8') as fd:
+        return fd.read()
+
+
+if __name__ == '__main__':
+    write_fixtures()
@@ -0,0 +1,127 @@
+import queue
+import threading
+
+from tqdm import tqdm
+from typing import Any, Callable, List, Optional
+
+from fetchers import BlockedPageError
+from quarantine import CrawlQuarantine
+
+
+class BrowserPool(object):
+    '''
+    Pool of independent browser sessions, each owned by one worker thread.
+
+    Jobs are pulled from a shared queue by the workers, so a slow page only holds up its own session.
+    Request pacing is not done here: every page load waits on the shared scheduler in `rate_control`.
+
+    Parameters
+    --------
+    num_browsers: Number of browser sessions.
+    driver_factory: Called as `driver_factory(worker_idx)` to create the session of a worker, the first time it is needed.
+        Each session should use its own browser profile directory.
+    '''
+
+    def __init__(self, num_browsers: int = 1, driver_factory: Optional[Callable[[int], Any]] = None):
+        if num_browsers < 1:
+            raise ValueError('`num_browsers` must be at least 1, got %d.' % num_browsers)
+        self.num_browsers = num_browsers
+        self.driver_factory = driver_factory
+        self._drivers = [None] * num_browsers
+        self._owns_drivers = True
+
+    @classmethod
+    def from_drivers(cls, drivers: List[Any]) -> 'BrowserPool':
+        '''
+        Wrap existing browser sessions. They are not quit by `BrowserPool.quit`.
+        '''
+        pool = cls(num_browsers=len(drivers))
+        pool._drivers = list(drivers)
+        pool._owns_drivers = False
+        return pool
+
+    def get_driver(self, worker_idx: int = 0) -> Any:
+        if self._drivers[worker_idx] is None:
+            self._drivers[worker_idx] = self.driver_factory(worker_idx)
+        return self._drivers[worker_idx]
+
+    def map(self, fn: Callable[[Any, Any], Any], items: List[Any], desc: Optional[str] = None,
+            quarantine: Optional[CrawlQuarantine] = None, unit_kind: str = 'item',
+            unit_key: Callable[[Any], str] = str) -> List[Any]:
+        '''
+        Run `fn(item, driver)` for every item on the pool and return the results in the order of `items`.
+        If any job raises, the remaining jobs are dropped and the exception is raised here.
+
+        With `quarantine`, a job raising `BlockedPageError` is set aside as the unit (`unit_kind`, `unit_key(item)`)
+        while the workers go on with the other jobs, and is retried after its cooldown. Given up jobs have None as result.
+        '''
+        items = list(items)
+        if not items:
+            return []
+        results = [None] * len(items)
+        job_queue = queue.Queue()
+        for job in enumerate(items):
+            job_queue.put(job)
+
+        errors = []
+        stop_event = threading.Event()
+        progress_bar = tqdm(desc=desc, total=len(items))
+
+        def worker(worker_idx: int) -> None:
+            try:
+                # Started on the first job, so that a worker left without jobs does not launch a browser.
+                driver = None
+                while not stop_event.is_set():
+                    try:
+                        item_idx, item = job_queue.get_nowait()
+                    except queue.Empty:
+                        if quarantine is None or quarantine.num_waiting([unit_kind]) == 0:
+                            return
+                        # Only blocked jobs are left. Wait for the first cooldown to be over.
+                        stop_event.wait(min(quarantine.seconds_until_ready([unit_kind]) or 0.0, 1.0))
+                        for _, _, job in quarantine.pop_ready([unit_kind]):
+                            job_queue.put(job)
+                        continue
+                    if driver is None:
+                        driver = self.get_driver(worker_idx)
+                    try:
+                        results[item_idx] = fn(item, driver)
+                    except BlockedPageError as e:
+                        if quarantine is None:
+                            raise
+                        if quarantine.defer(unit_kind, unit_key(item), (item_idx, item), url=e.url) is not None:
+                            continue
+                    else:
+                        if quarantine is not None:
+                            quarantine.record_success(unit_kind, unit_key(item))
+                    progress_bar.update(1)
+            except BaseException as e:
+                errors.append(e)
+                stop_event.set()
+
+        num_workers = max(1, min(self.num_browsers, len(items)))
+        threads = [threading.Thread(target=worker, args=(worker_idx,), daemon=True) for worker_idx in range(num_workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                # Join with a timeout, so that Ctrl-C still reaches the main thread.
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            stop_event.set()
+            raise
+        finally:
+            progress_bar.close()
+
+        if errors:
+            raise errors[0]
+        return results
+
+    def quit(self) -> None:
+        if not self._owns_drivers:
+            return
+        for driver in self._drivers:
+            if driver is not None:
+                driver.quit()
+        self._drivers = [None] * self.num_browsers
@@ -0,0 +1,95 @@
+'''
+Typed on-disk artifacts of the pipeline stages, stored as Parquet files.
+
+Every artifact has a fixed schema (`ARTIFACT_SCHEMAS`), with the text columns dictionary-encoded and zstd-compressed,
+and records its kind in the file metadata. Unlike pickles, loading an artifact never runs code from the file.
+Artifacts are read memory-mapped, and `columns` reads only the given columns, e.g. `citation_table.MAP_COLUMNS` to draw a map.
+'''
+import numpy as np
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from typing import List, Optional, Sequence, Tuple
+
+from citation_records import RecordStore
+from citation_table import CITATION_COLUMNS, CitationRows, citation_frame
+
+ARTIFACT_KIND_KEY = b'citeworld.artifact'
+ARTIFACT_COMPRESSION = 'zstd'
+_TEXT = pa.dictionary(pa.int32(), pa.string())
+
+ARTIFACT_SCHEMAS = {
+    # Step 1 & 2: (citing author ID, citing paper title, cited paper title).
+    'citing_author_papers': pa.schema([('citing author id', _TEXT), ('citing paper title', _TEXT), ('cited paper title', _TEXT)]),
+    # Step 3: (citing author name, citing paper title, cited paper title, affiliation).
+    'author_paper_affiliations': pa.schema([('citing author name', _TEXT), ('citing paper title', _TEXT),
+                                            ('cited paper title', _TEXT), ('affiliation', _TEXT)]),
+    # Step 4: the geocoded citation table, see `citation_table.CITATION_COLUMNS`.
+    'citations': pa.schema([(column, pa.float64() if column in ('latitude', 'longitude') else _TEXT)
+                            for column in CITATION_COLUMNS]),
+}
+
+
+def save_artifact(rows, path: str, kind: str) -> None:
+    '''
+    Save the tuples (or `RecordStore`, or DataFrame) of one stage to `path` with the schema of `kind`.
+    '''
+    schema = ARTIFACT_SCHEMAS[kind]
+    if kind == 'citations':
+        data_df = citation_frame(rows)
+    elif isinstance(rows, pd.DataFrame):
+        data_df = rows
+    elif isinstance(rows, RecordStore):
+        data_df = rows.to_frame().set_axis(schema.names, axis=1)
+    else:
+        data_df = pd.DataFrame(list(rows), columns=schema.names)
+    table = pa.Table.from_pandas(data_df[schema.names].astype({name: 'category' for name in schema.names
+                                                               if schema.field(name).type == _TEXT}),
+                                 schema=schema, preserve_index=False)
+    table = table.replace_schema_metadata({ARTIFACT_KIND_KEY: kind.encode()})
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    pq.write_table(table, path, compression=ARTIFACT_COMPRESSION)
+
+def load_artifact(path: str, kind: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    '''
+    Load an artifact saved by `save_artifact`. Text columns come back as categoricals.
+    Raises ValueError if the file is not an artifact of `kind`.
+    '''
+    return _read_artifact(path, kind, columns).to_pandas()
+
+def load_artifact_tuples(path: str, kind: str) -> List[Tuple]:
+    '''
+    Same as `load_artifact`, as the list of tuples the pipeline stages pass around.
+    '''
+    table = _read_artifact(path, kind).unify_dictionaries().combine_chunks()
+    columns = []
+    for column in table.columns:
+        array = column.chunk(0) if column.num_chunks > 0 else pa.array([], type=column.type)
+        if not pa.types.is_dictionary(array.type):
+            # E.g. latitude and longitude.
+            columns.append(array.to_pylist())
+            continue
+        # Decode the dictionary once, with None at the end for the nulls.
+        values = np.array(array.dictionary.to_pylist() + [None], dtype=object)
+        columns.append(values[array.indices.fill_null(len(values) - 1).to_numpy()])
+    return list(zip(*columns))
+
+def save_citation_table(coordinates_and_info: CitationRows, path: str) -> None:
+    save_artifact(coordinates_and_info, path, 'citations')
+
+def load_citation_table(path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    '''
+    The typed citation table, from a 'citations' artifact, or from the csv export (which can have a leading index column).
+    '''
+    if os.path.splitext(path)[1].lower() == '.csv':
+        citation_df = pd.read_csv(path, usecols=lambda column: column in (columns or CITATION_COLUMNS))
+        return citation_frame(citation_df)
+    return citation_frame(load_artifact(path, 'citations', columns=columns))
+
+def _read_artifact(path: str, kind: str, columns: Optional[Sequence[str]] = None) -> pa.Table:
+    metadata = pq.read_schema(path, memory_map=True).metadata or {}
+    if metadata.get(ARTIFACT_KIND_KEY) != kind.encode():
+        raise ValueError('%s is not an artifact of kind %s.' % (path, kind))
+    return pq.read_table(path, columns=list(columns) if columns is not None else None, memory_map=True)
@@ -0,0 +1,312 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from instrumentation import cache_lookup
+
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class AuthorProfileStore(object):
+    '''
+    Persistent store of Google Scholar author profiles, keyed by Scholar author ID.
+
+    Each citing author is fetched at most once per run, and the result is reused
+    across runs and across scholars until it is older than `ttl_days`.
+    Use `db_path=':memory:'` for a store that only dedupes within the current run.
+    '''
+
+    def __init__(self, db_path: str = ':memory:', ttl_days: Optional[float] = 30):
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.ttl_seconds = None if ttl_days is None else ttl_days * SECONDS_PER_DAY
+        self.num_hits, self.num_misses = 0, 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS author_profile ('
+                           'author_id TEXT PRIMARY KEY, '
+                           'name TEXT NOT NULL, '
+                           'affiliation TEXT NOT NULL, '
+                           'fetched_at REAL NOT NULL)')
+        self._conn.commit()
+
+    def get(self, author_id: str) -> Optional[Tuple[str, str]]:
+        '''
+        Return the cached (name, affiliation) of `author_id`, or None if absent or expired.
+        '''
+        with self._lock:
+            row = self._conn.execute('SELECT name, affiliation, fetched_at FROM author_profile WHERE author_id = ?',
+                                     (author_id,)).fetchone()
+            if row is None or self._expired(row[2]):
+                self.num_misses += 1
+                cache_lookup('author profiles', hit=False)
+                return None
+            self.num_hits += 1
+            cache_lookup('author profiles', hit=True)
+            return row[0], row[1]
+
+    def put(self, author_id: str, name: str, affiliation: str) -> None:
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO author_profile (author_id, name, affiliation, fetched_at) '
+                               'VALUES (?, ?, ?, ?)', (author_id, name, affiliation, time.time()))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            num_profiles = self._conn.execute('SELECT COUNT(*) FROM author_profile').fetchone()[0]
+        return {'hits': self.num_hits, 'misses': self.num_misses, 'profiles': num_profiles}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _expired(self, fetched_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - fetched_at > self.ttl_seconds
+
+
+def normalize_affiliation_key(affiliation_name: str) -> str:
+    '''
+    Normalize an affiliation string into a geocode cache key: case-folded, whitespace collapsed, edge punctuation removed.
+    '''
+    return ' '.join(affiliation_name.casefold().split()).strip(' .,;:-')
+
+
+class GeocodeCache(object):
+    '''
+    Persistent cache of geocoded affiliations, keyed by normalized affiliation text.
+
+    Both hits and confirmed misses (the geocoder answered, but found nothing) are stored.
+    Misses expire sooner than hits, so that they are retried once in a while.
+    Failed requests (network errors, timeouts) are never cached.
+    '''
+
+    COLUMNS = ['affiliation_key', 'affiliation', 'found', 'latitude', 'longitude',
+               'county', 'city', 'state', 'country', 'geocoded_at']
+
+    def __init__(self, db_path: str = ':memory:', hit_ttl_days: Optional[float] = 365, miss_ttl_days: Optional[float] = 30):
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.hit_ttl_seconds = None if hit_ttl_days is None else hit_ttl_days * SECONDS_PER_DAY
+        self.miss_ttl_seconds = None if miss_ttl_days is None else miss_ttl_days * SECONDS_PER_DAY
+        self.num_hits, self.num_misses = 0, 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS geocode ('
+                           'affiliation_key TEXT PRIMARY KEY, '
+                           'affiliation TEXT NOT NULL, '
+                           'found INTEGER NOT NULL, '
+                           'latitude REAL, longitude REAL, '
+                           'county TEXT, city TEXT, state TEXT, country TEXT, '
+                           'geocoded_at REAL NOT NULL)')
+        self._conn.commit()
+
+    def get(self, affiliation_name: str) -> Optional[Tuple[bool, Optional[Tuple]]]:
+        '''
+        Look up an affiliation.
+        Returns None if it is not cached (or expired), (False, None) for a cached miss,
+        and (True, (latitude, longitude, county, city, state, country)) for a cached hit.
+        '''
+        with self._lock:
+            row = self._conn.execute('SELECT found, latitude, longitude, county, city, state, country, geocoded_at '
+                                     'FROM geocode WHERE affiliation_key = ?',
+                                     (normalize_affiliation_key(affiliation_name),)).fetchone()
+            if row is None or self._expired(bool(row[0]), row[7]):
+                self.num_misses += 1
+                cache_lookup('geocode', hit=False)
+                return None
+            self.num_hits += 1
+            cache_lookup('geocode', hit=True)
+            if not row[0]:
+                return False, None
+            return True, tuple(row[1:7])
+
+    def put_hit(self, affiliation_name: str, latitude: float, longitude: float,
+                county: Optional[str], city: Optional[str], state: Optional[str], country: Optional[str]) -> None:
+        self._put(affiliation_name, True, (latitude, longitude, county, city, state, country))
+
+    def put_miss(self, affiliation_name: str) -> None:
+        self._put(affiliation_name, False, (None, None, None, None, None, None))
+
+    def delete(self, affiliation_name: str) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM geocode WHERE affiliation_key = ?', (normalize_affiliation_key(affiliation_name),))
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        '''
+        Remove expired entries. Returns the number of removed entries.
+        '''
+        expired_keys = [row[0] for row in self.items() if self._expired(bool(row[2]), row[9])]
+        with self._lock:
+            self._conn.executemany('DELETE FROM geocode WHERE affiliation_key = ?', [(key,) for key in expired_keys])
+            self._conn.commit()
+        return len(expired_keys)
+
+    def items(self) -> List[Tuple]:
+        '''
+        All cached entries, including expired ones, as tuples ordered like `GeocodeCache.COLUMNS`.
+        '''
+        with self._lock:
+            return self._conn.execute('SELECT %s FROM geocode ORDER BY affiliation_key' % ', '.join(self.COLUMNS)).fetchall()
+
+    def export_csv(self, csv_path: str) -> None:
+        '''
+        Export all cached entries to a csv file, e.g. to inspect or hand-correct them.
+        '''
+        os.makedirs(os.path.dirname(os.path.abspath(csv_path)), exist_ok=True)
+        with open(csv_path, 'w', newline='', encoding='utf-8') as fd:
+            writer = csv.writer(fd)
+            writer.writerow(self.COLUMNS)
+            writer.writerows(self.items())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            num_found, num_not_found = self._conn.execute(
+                'SELECT COALESCE(SUM(found), 0), COALESCE(SUM(1 - found), 0) FROM geocode').fetchone()
+        return {'hits': self.num_hits, 'misses': self.num_misses,
+                'cached_found': num_found, 'cached_not_found': num_not_found}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM geocode').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _put(self, affiliation_name: str, found: bool, geo_info: Tuple) -> None:
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO geocode (%s) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)' % ', '.join(self.COLUMNS),
+                               (normalize_affiliation_key(affiliation_name), affiliation_name, int(found)) + tuple(geo_info) + (time.time(),))
+            self._conn.commit()
+
+    def _expired(self, found: bool, geocoded_at: float) -> bool:
+        ttl_seconds = self.hit_ttl_seconds if found else self.miss_ttl_seconds
+        return ttl_seconds is not None and time.time() - geocoded_at > ttl_seconds
+
+
+class CitationSnapshotStore(object):
+    '''
+    Persistent snapshot of the last crawl of each cited publication, keyed by Google Scholar `cites_id`.
+
+    For every publication it keeps the "Cited by N" count seen at crawl time and the
+    (citing author ID, citing paper title) pairs found on its citation result pages.
+    A refresh run compares the current counts against the snapshot to decide what to crawl again.
+    '''
+
+    def __init__(self, db_path: str = ':memory:'):
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS publication ('
+                           'cites_id TEXT PRIMARY KEY, '
+                           'title TEXT NOT NULL, '
+                           'num_citations INTEGER NOT NULL, '
+                           'crawled_at REAL NOT NULL)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS citing ('
+                           'cites_id TEXT NOT NULL, '
+                           'citing_author_id TEXT NOT NULL, '
+                           'citing_paper_title TEXT NOT NULL, '
+                           'PRIMARY KEY (cites_id, citing_author_id, citing_paper_title))')
+        self._conn.commit()
+
+    def get_num_citations(self, cites_id: str) -> Optional[int]:
+        '''
+        The "Cited by N" count recorded at the last crawl, or None if the publication was never crawled.
+        '''
+        with self._lock:
+            row = self._conn.execute('SELECT num_citations FROM publication WHERE cites_id = ?', (cites_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def get_citing(self, cites_id: str) -> List[Tuple[str, str]]:
+        with self._lock:
+            return self._conn.execute('SELECT citing_author_id, citing_paper_title FROM citing WHERE cites_id = ? '
+                                      'ORDER BY citing_paper_title, citing_author_id', (cites_id,)).fetchall()
+
+    def put(self, cites_id: str, title: str, num_citations: int,
+            citing_authors_and_citing_papers: List[Tuple[str, str]], merge: bool = False) -> None:
+        '''
+        Record a crawl of `cites_id`.
+        With `merge=True`, the citing pairs are added to the existing snapshot instead of replacing it.
+        '''
+        with self._lock:
+            if not merge:
+                self._conn.execute('DELETE FROM citing WHERE cites_id = ?', (cites_id,))
+            self._conn.executemany('INSERT OR IGNORE INTO citing (cites_id, citing_author_id, citing_paper_title) VALUES (?, ?, ?)',
+                                   [(cites_id, author_id, paper_title) for author_id, paper_title in citing_authors_and_citing_papers])
+            self._conn.execute('INSERT OR REPLACE INTO publication (cites_id, title, num_citations, crawled_at) VALUES (?, ?, ?, ?)',
+                               (cites_id, title, num_citations, time.time()))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CrawlJournal(object):
+    '''
+    Append-only journal of completed crawl units, one JSON line per unit.
+
+    A unit is identified by its type ('publication_list', 'publication', 'citation_page' or 'author_profile')
+    and a key (Scholar ID, cites_id, page URL or author ID), and is recorded as soon as it finishes.
+    With `resume=True`, the units of the previous journal are loaded and can be skipped.
+    Otherwise, the journal starts empty.
+    '''
+
+    def __init__(self, journal_path: str, resume: bool = False):
+        os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+        self.journal_path = journal_path
+        self.num_resumed = 0
+        self._units = {}
+        self._lock = threading.Lock()
+        if resume and os.path.isfile(journal_path):
+            with open(journal_path, 'r', encoding='utf-8') as fd:
+                for line in fd:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # The last line may be incomplete if the previous run died while writing it.
+                        continue
+                    self._units[(entry['type'], entry['key'])] = entry['data']
+        self._fd = open(journal_path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self._fd.tell() > 0:
+            # Terminate an incomplete last line, so that it does not swallow the next entry.
+            with open(journal_path, 'rb') as fd:
+                fd.seek(-1, os.SEEK_END)
+                if fd.read(1) != b'\n':
+                    self._fd.write('\n')
+
+    def get(self, unit_type: str, key: str) -> Any:
+        '''
+        The data recorded for a completed unit, or None if the unit has not been completed.
+        '''
+        with self._lock:
+            data = self._units.get((unit_type, key))
+            if data is not None:
+                self.num_resumed += 1
+            cache_lookup('crawl journal', hit=data is not None)
+            return data
+
+    def record(self, unit_type: str, key: str, data: Any) -> None:
+        with self._lock:
+            self._units[(unit_type, key)] = data
+            self._fd.write(json.dumps({'type': unit_type, 'key': key, 'data': data}, ensure_ascii=False) + '\n')
+            self._fd.flush()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._units)
+
+    def close(self) -> None:
+        with self._lock:
+            self._fd.close()
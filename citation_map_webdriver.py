@@ -1,41 +1,88 @@
-import folium
+import fetchers
 import itertools
-import pandas as pd
+import math
 import os
-import pickle
-import pycountry
-import re
-import random
-import time
+import queue
+import schoarly_support_new
+import threading
 
+from geopy.exc import GeopyError
 from geopy.geocoders import Nominatim
-from multiprocessing import Pool
 # from scholarly import scholarly, ProxyGenerator
 from tqdm import tqdm
-from typing import Any, List, Tuple, Optional
-
-from schoarly_support_new import get_citing_author_ids_and_citing_papers, get_organization_name, NO_AUTHOR_FOUND_STR, KNOWN_AFFILIATION_DICT
-from bs4 import BeautifulSoup
-from selenium.webdriver.common.by import By
+from typing import Any, Dict, List, Tuple, Optional
+
+from schoarly_support_new import get_citing_author_ids_and_citing_papers, get_organization_name, NO_AUTHOR_FOUND_STR, KNOWN_AFFILIATION_DICT, \
+    INVALID_AFFILIATION_TERMS, CITATION_RESULTS_PER_PAGE
+from affiliation_cleaning import clean_affiliation
+from browser_pool import BrowserPool
+from citation_artifacts import load_artifact_tuples, save_artifact
+from citation_cache import AuthorProfileStore, CitationSnapshotStore, CrawlJournal, GeocodeCache
+from citation_records import AUTHOR_PAPER_AFFILIATION_FIELDS, CITING_AUTHOR_PAPER_FIELDS, InternTable, RecordStore
+from citation_render import create_map, draw_and_summarize, export_citation_summaries, export_dict_to_csv, render_citation_map
+from citation_table import CITATION_COLUMNS
+from fetchers import BlockedPageError, EscalatingFetcher, fetch_page
+from gazetteer import Gazetteer
+from instrumentation import count, disable as disable_instrumentation, enable as enable_instrumentation, event, print_metrics, \
+    span, timed, write_metrics, write_trace
+from offline_geocoder import OfflineGeocoder
+from quarantine import CrawlQuarantine
+from reverse_geocoder import OfflineReverseGeocoder
+from rate_control import print_rate_stats
+from scholar_parsers import parse_author_profile, parse_publication_table
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 driver = None
+geolocator = None
+gazetteer = None
+offline_geocoder = None
+reverse_geocoder = None
+
+# Largest page of the publication list served by Google Scholar.
+PUBLICATION_PAGE_SIZE = 100
+# Requests a lean browser session does not send: images, stylesheets and fonts.
+LEAN_BROWSER_BLOCKED_URLS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+                             '*.css', '*.woff', '*.woff2', '*.ttf', '*.otf']
 
 
 def create_driver(chromedriver):
     global driver
     if driver is None:
-        service = Service(chromedriver)
-        driver = webdriver.Chrome(service=service)
+        driver = new_driver(chromedriver)
+    return driver
+
+def new_driver(chromedriver, user_data_dir: Optional[str] = None, lean: bool = False, headless: bool = False):
+    '''
+    Launch a new Chrome session. Give every concurrent session its own `user_data_dir`.
+    A `lean` session does not download images, stylesheets or fonts, and hands pages over as soon as the HTML is parsed.
+    A `headless` session has no window, so CAPTCHAs cannot be solved in it.
+    '''
+    service = Service(chromedriver)
+    options = Options()
+    if user_data_dir is not None:
+        options.add_argument('--user-data-dir=%s' % os.path.abspath(user_data_dir))
+    if headless:
+        options.add_argument('--headless=new')
+    if lean:
+        options.page_load_strategy = 'eager'
+        options.add_argument('--disable-extensions')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    new_session = webdriver.Chrome(service=service, options=options)
+    if lean:
+        # Chrome has no preference for stylesheets and fonts, so they are blocked on the network level.
+        new_session.execute_cdp_cmd('Network.enable', {})
+        new_session.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BROWSER_BLOCKED_URLS})
+    if headless:
+        print("[INFO] Headless browser opened. CAPTCHAs cannot be solved in it.")
+    else:
         print("[INFO] Browser opened. You can solve CAPTCHAs (if prompted) in the browser window.")
         print("[INFO] KEEP THE POP-UP BROWSER OPEN until the CitationMap program is complete.")
-    return driver
+    return new_session
 
-def affiliations_from_authors_conservative_selenium(citing_author_paper_info, driver):
+def affiliations_from_authors_conservative_selenium(citing_author_paper_info, driver,
+                                                    profile_store: Optional[AuthorProfileStore] = None):
     """
     简化版 conservative：直接拿 profile 上的第一行 affiliation，
     然后再用你原来的 clean_affiliation_names 去做更严格清洗。
@@ -44,15 +91,15 @@ def affiliations_from_authors_conservative_selenium(citing_author_paper_info, dr
     if citing_author_id == NO_AUTHOR_FOUND_STR:
         return (NO_AUTHOR_FOUND_STR, citing_paper_title, cited_paper_title, NO_AUTHOR_FOUND_STR)
 
-    time.sleep(random.uniform(1, 5))
-    name, affiliation = get_author_name_and_affiliation_selenium(citing_author_id, driver)
+    name, affiliation = get_author_profile_cached(citing_author_id, driver, profile_store)
 
     if not affiliation:
         return None
     return (name, citing_paper_title, cited_paper_title, affiliation)
 
 
-def affiliations_from_authors_aggressive_selenium(citing_author_paper_info, driver):
+def affiliations_from_authors_aggressive_selenium(citing_author_paper_info, driver,
+                                                   profile_store: Optional[AuthorProfileStore] = None):
     """
     aggressive 其实也一样，从 profile 把整段 affiliation 字符串拿回来即可，
     后面你的 clean_affiliation_names 会做拆分 + 清洗。
@@ -61,117 +108,125 @@ def affiliations_from_authors_aggressive_selenium(citing_author_paper_info, driv
     if citing_author_id == NO_AUTHOR_FOUND_STR:
         return (NO_AUTHOR_FOUND_STR, citing_paper_title, cited_paper_title, NO_AUTHOR_FOUND_STR)
 
-    time.sleep(random.uniform(1, 5))
-    name, affiliation = get_author_name_and_affiliation_selenium(citing_author_id, driver)
+    name, affiliation = get_author_profile_cached(citing_author_id, driver, profile_store)
     if not affiliation:
         return None
     return (name, citing_paper_title, cited_paper_title, affiliation)
 
 
 
-def _expand_all_publications(driver, max_clicks: int = 50, wait_seconds: int = 5):
+def get_publications_with_citation_counts_selenium(scholar_id: str,
+                                                   driver,
+                                                   page_size: int = PUBLICATION_PAGE_SIZE,
+                                                   journal: Optional[CrawlJournal] = None,
+                                                   quarantine: Optional[CrawlQuarantine] = None):
     """
-    不停点击作者页面底部的 "Show more"，直到没有更多论文可展开。
+    从作者主页抓取 (cites_id, paper_title, num_citations) 列表：
+    1）按引用数排序，用 cstart/pagesize 参数一页一页地请求论文列表，每页到达后立即解析
+    2）遇到没有引用的论文（或最后一页）就停止，用 cites_id 去重
+    num_citations 来自 "Cited by N" 链接 (a.gsc_a_ac) 的文字。
+    如果给了 journal，解析结果会记录下来，resume 时直接复用。
+    如果给了 quarantine，被封锁的页面等冷却之后单独重试；放弃时返回 None。
     """
-    clicks = 0
-    while clicks < max_clicks:
-        try:
-            # 等待按钮出现并可点击
-            more_btn = WebDriverWait(driver, wait_seconds).until(
-                EC.element_to_be_clickable((By.ID, "gsc_bpf_more"))
-            )
-        except Exception:
-            # 找不到按钮，直接退出
-            break
-
-        # 检查是否已经 disabled
-        btn_class = more_btn.get_attribute("class") or ""
-        if "disabled" in btn_class:
-            break
-
-        try:
-            more_btn.click()
-            clicks += 1
-            time.sleep(2)  # 给页面一点加载时间
-        except Exception:
-            # 点击失败就退出，避免死循环
+    if journal is not None:
+        results = journal.get('publication_list', scholar_id)
+        if results is not None:
+            print(f"[INFO] Resumed {len(results)} publications with citations from the journal.")
+            return [tuple(result) for result in results]
+
+    results, seen_cites_ids = [], set()
+    num_rows, cstart = 0, 0
+    while True:
+        url = (f"{schoarly_support_new.SCHOLAR_BASE_URL}/citations?hl=en&user={scholar_id}&view_op=list_works&sortby=cited"
+               f"&cstart={cstart}&pagesize={page_size}")
+        if quarantine is None:
+            page_source = fetch_page(url, driver, ready_selector='#gsc_a_b')
+        else:
+            page_source = quarantine.run('publication_list', url, lambda: fetch_page(url, driver, ready_selector='#gsc_a_b'))
+            if page_source is None:
+                return None
+        rows = parse_publication_table(page_source)
+        num_rows += len(rows)
+        for cites_id, title, num_citations in rows:
+            if cites_id is not None and cites_id not in seen_cites_ids:
+                seen_cites_ids.add(cites_id)
+                results.append((cites_id, title, num_citations))
+        # 列表按引用数排序，出现没有引用的论文后，后面的论文也都没有引用
+        if len(rows) < page_size or any(cites_id is None for cites_id, _, _ in rows):
             break
+        cstart += page_size
 
-    print(f"[INFO] Finished clicking 'Show more'. Total clicks: {clicks}")
+    print(f"[INFO] Parsed {len(results)} publications with citations out of the first {num_rows} publications.")
+    if journal is not None:
+        journal.record('publication_list', scholar_id, results)
+    return results
 
 def get_publications_with_cites_ids_selenium(scholar_id: str,
                                              driver,
-                                             max_clicks: int = 50):
+                                             page_size: int = PUBLICATION_PAGE_SIZE):
     """
-    用 Selenium 从作者主页抓取 (cites_id, paper_title) 列表：
-    1）先点击所有 'Show more' 展开全部论文
-    2）再统一解析一次页面，去重
+    从作者主页抓取 (cites_id, paper_title) 列表。
     """
-    url = f"https://scholar.google.com/citations?hl=en&user={scholar_id}&view_op=list_works&sortby=pubdate"
-    driver.get(url)
-    time.sleep(2)
-
-    # 先把所有论文展开
-    _expand_all_publications(driver, max_clicks=max_clicks)
-
-    # 一次性解析全部 HTML
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-    rows = soup.select("tr.gsc_a_tr")
-
-    results = []
-    seen_cites_ids = set()
-    print(f"Total{len(rows)} publications")
-    for row in rows:
-        title_el = row.select_one("a.gsc_a_at")
-        if not title_el:
-            continue
-        title = title_el.get_text(strip=True)
-
-        cites_el = row.select_one("a.gsc_a_ac")
-
-        if not cites_el:
-            continue
-
-        href = cites_el.get("href", "")
-        m = re.search(r"cites=([^&]+)", href)
-
-        if not m:
-            # 没有 cites= 的，说明这篇还没被引用（Cited by 0），按你之前逻辑可以直接跳过
-            continue
-
-        cites_id = m.group(1)
-
-        # 用 cites_id 去重，保证每篇论文只记录一次
-        if cites_id in seen_cites_ids:
-            continue
-        seen_cites_ids.add(cites_id)
-
-        results.append((cites_id, title))
-
-    print(f"[INFO] Parsed {len(results)} publications with citations.")
-    return results
-
-
-def find_all_citing_authors(scholar_id: str, num_processes: int = 16) -> List[Tuple[str]]:
+    return [(cites_id, title) for cites_id, title, _ in
+            get_publications_with_citation_counts_selenium(scholar_id, driver, page_size=page_size)]
+
+
+@timed('stage.citing authors')
+def find_all_citing_authors(scholar_id: str,
+                            num_processes: int = 16,
+                            snapshot_store: Optional[CitationSnapshotStore] = None,
+                            refresh: bool = False,
+                            journal: Optional[CrawlJournal] = None,
+                            browser_pool: Optional[BrowserPool] = None,
+                            quarantine: Optional[CrawlQuarantine] = None) -> List[Tuple[str]]:
     '''
     Step 1. Find all publications of the given Google Scholar ID.
     Step 2. Find all citing authors.
+
+    The publications are crawled concurrently on the sessions of `browser_pool`.
+    Without a pool, they are crawled one by one on the browser from `create_driver`.
+
+    With `refresh=True`, publications whose "Cited by N" count did not go up since the snapshot in
+    `snapshot_store` are not crawled again, and the ones that did only have their newest result pages crawled.
+    With `journal`, every finished publication and result page is recorded, and the ones already recorded are skipped.
+    Blocked publications are retried after a cooldown by `quarantine`, while the others are crawled meanwhile.
     '''
     # Find Google Scholar Profile using Scholar ID.
     # author = scholarly.search_author_id(scholar_id)
     # author = scholarly.fill(author, sections=['publications'])
-    all_publication_info = get_publications_with_cites_ids_selenium(scholar_id, driver)
+    if browser_pool is None:
+        browser_pool = BrowserPool.from_drivers([driver])
+    if quarantine is None:
+        quarantine = CrawlQuarantine()
+
+    all_publication_info = get_publications_with_citation_counts_selenium(
+        scholar_id, browser_pool.get_driver(0), journal=journal, quarantine=quarantine) or []
     all_publication_info = list(set(all_publication_info))
     print('Author profile found, with %d publications.\n' % len(all_publication_info))
 
     print(all_publication_info)
 
+    crawl_mode_counts = {'resumed': 0, 'unchanged': 0, 'updated': 0, 'full': 0}
     all_citing_author_paper_tuple_list = []
-    for pub in tqdm(all_publication_info,
-                    desc='Finding citing authors and papers on your %d publications' % len(all_publication_info),
-                    total=len(all_publication_info)):
-        all_citing_author_paper_tuple_list.extend(__citing_authors_and_papers_from_publication(pub))
-
+    publication_results = browser_pool.map(
+        lambda pub, pub_driver: __citing_authors_and_papers_from_publication(
+            pub, pub_driver, snapshot_store=snapshot_store, refresh=refresh, journal=journal),
+        all_publication_info,
+        desc='Finding citing authors and papers on your %d publications' % len(all_publication_info),
+        quarantine=quarantine, unit_kind='publication', unit_key=lambda pub: pub[0])
+    for publication_result in publication_results:
+        if publication_result is None:
+            # Still blocked. Listed as pending in the report of `quarantine`.
+            continue
+        citing_author_paper_info, crawl_mode = publication_result
+        all_citing_author_paper_tuple_list.extend(citing_author_paper_info)
+        crawl_mode_counts[crawl_mode] += 1
+
+    if crawl_mode_counts['resumed'] > 0:
+        print('[INFO] Resumed %d publications from the journal.' % crawl_mode_counts['resumed'])
+    if refresh:
+        print('[INFO] Refresh: %d publications unchanged, %d updated with new pages, %d crawled in full.' % (
+            crawl_mode_counts['unchanged'], crawl_mode_counts['updated'], crawl_mode_counts['full']))
     return all_citing_author_paper_tuple_list
 
 
@@ -180,71 +235,125 @@ def get_author_name_and_affiliation_selenium(author_id: str, driver):
     访问作者 profile 页，解析名字和 affiliation 文本。
     conservative/aggressive 的差别后面可以靠正则清洗。
     """
-    url = f"https://scholar.google.com/citations?hl=en&user={author_id}"
-    driver.get(url)
-    time.sleep(2)
-
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-
+    url = f"{schoarly_support_new.SCHOLAR_BASE_URL}/citations?hl=en&user={author_id}"
     # 名字一般在 <div id="gsc_prf_in"> 里
-    name_el = soup.select_one("#gsc_prf_in")
-    name = name_el.get_text(strip=True) if name_el else NO_AUTHOR_FOUND_STR
-
     # Affiliation 在第一个 class="gsc_prf_il" 中，后面可能还有 email、interests 等
-    aff_el = soup.select_one(".gsc_prf_il")
-    affiliation = aff_el.get_text(strip=True) if aff_el else ""
+    name, affiliation = parse_author_profile(fetch_page(url, driver, ready_selector='#gsc_prf_in'))
 
     return name, affiliation
 
+def get_author_profile_cached(author_id: str, driver,
+                              profile_store: Optional[AuthorProfileStore] = None,
+                              journal: Optional[CrawlJournal] = None) -> Tuple[str, str]:
+    '''
+    Get (name, affiliation) of an author, loading the profile page only if neither `journal` nor `profile_store` has it.
+    '''
+    if journal is not None:
+        journal_profile = journal.get('author_profile', author_id)
+        if journal_profile is not None:
+            return tuple(journal_profile)
+    if profile_store is not None:
+        cached_profile = profile_store.get(author_id)
+        if cached_profile is not None:
+            return cached_profile
+
+    name, affiliation = get_author_name_and_affiliation_selenium(author_id, driver)
+    # A missing name usually means a blocked or broken page. Do not cache it.
+    if profile_store is not None and name != NO_AUTHOR_FOUND_STR:
+        profile_store.put(author_id, name, affiliation)
+    if journal is not None:
+        journal.record('author_profile', author_id, [name, affiliation])
+    return name, affiliation
+
+@timed('stage.citing affiliations')
 def find_all_citing_affiliations_selenium(all_citing_author_paper_tuple_list,
                                             driver,
-                                            affiliation_conservative: bool = False):
-    if affiliation_conservative:
-        fn = lambda item: affiliations_from_authors_conservative_selenium(item, driver)
-    else:
-        fn = lambda item: affiliations_from_authors_aggressive_selenium(item, driver)
-
+                                            affiliation_conservative: bool = False,
+                                            profile_store: Optional[AuthorProfileStore] = None,
+                                            journal: Optional[CrawlJournal] = None,
+                                            browser_pool: Optional[BrowserPool] = None,
+                                            quarantine: Optional[CrawlQuarantine] = None):
+    '''
+    Step 3. Find the affiliations of all citing authors.
+    Each unique citing author is looked up once. Profiles already in `journal` or `profile_store` are not fetched again.
+    The profiles are fetched concurrently on the sessions of `browser_pool`, or one by one on `driver` without a pool.
+    Blocked profiles are retried after a cooldown by `quarantine`. The entries of authors still blocked are left out.
+    '''
+    if profile_store is None:
+        # In-memory store, which still dedupes the authors within this run.
+        profile_store = AuthorProfileStore(':memory:', ttl_days=None)
+
+    unique_author_ids = sorted(set(author_id for author_id, _, _ in all_citing_author_paper_tuple_list
+                                   if author_id != NO_AUTHOR_FOUND_STR))
+    if browser_pool is None:
+        browser_pool = BrowserPool.from_drivers([driver])
+    author_profiles = browser_pool.map(
+        lambda author_id, author_driver: get_author_profile_cached(author_id, author_driver, profile_store, journal=journal),
+        unique_author_ids,
+        desc='Finding citing affiliations from %d unique citing authors in %d entries' % (
+            len(unique_author_ids), len(all_citing_author_paper_tuple_list)),
+        quarantine=quarantine if quarantine is not None else CrawlQuarantine(), unit_kind='author_profile')
+    author_profile_dict = dict(zip(unique_author_ids, author_profiles))
+
+    store_stats = profile_store.stats()
+    print('[INFO] Author profile store: %d hits, %d misses, %d profiles stored.' % (
+        store_stats['hits'], store_stats['misses'], store_stats['profiles']))
+
+    # Every unique author has been looked up, so fanning out to the entries does not load any page.
+    # NOTE: The conservative and aggressive approaches read the same profile field. They only differ in cleaning.
     author_paper_affiliation_tuple_list = []
-    for author_and_paper in tqdm(all_citing_author_paper_tuple_list,
-                                 desc='Finding citing affiliations from %d citing authors' % len(all_citing_author_paper_tuple_list),
-                                 total=len(all_citing_author_paper_tuple_list)):
-        res = fn(author_and_paper)
-        if res:
-            author_paper_affiliation_tuple_list.append(res)
+    for citing_author_id, citing_paper_title, cited_paper_title in all_citing_author_paper_tuple_list:
+        if citing_author_id == NO_AUTHOR_FOUND_STR:
+            author_paper_affiliation_tuple_list.append(
+                (NO_AUTHOR_FOUND_STR, citing_paper_title, cited_paper_title, NO_AUTHOR_FOUND_STR))
+            continue
+        if author_profile_dict[citing_author_id] is None:
+            continue
+        name, affiliation = author_profile_dict[citing_author_id]
+        if affiliation:
+            author_paper_affiliation_tuple_list.append((name, citing_paper_title, cited_paper_title, affiliation))
 
     return author_paper_affiliation_tuple_list
 
 
+@timed('stage.clean affiliations')
 def clean_affiliation_names(author_paper_affiliation_tuple_list: List[Tuple[str]]) -> List[Tuple[str]]:
     '''
     Optional Step. Clean up the names of affiliations from the authors' affiliation tab on their Google Scholar profiles.
     NOTE: This logic is very naive. Please send an issue or pull request if you have any idea how to improve it.
     Currently we will not consider any paid service or tools that pose extra burden on the users, such as GPT API.
+    Each distinct affiliation string is only cleaned once, see `affiliation_cleaning`.
     '''
     cleaned_author_paper_affiliation_tuple_list = []
     for author_name, citing_paper_title, cited_paper_title, affiliation_string in author_paper_affiliation_tuple_list:
         if author_name == NO_AUTHOR_FOUND_STR:
             cleaned_author_paper_affiliation_tuple_list.append((NO_AUTHOR_FOUND_STR, citing_paper_title, cited_paper_title, NO_AUTHOR_FOUND_STR))
         else:
-            # Use a regular expression to split the string by ';' or 'and'.
-            substring_list = [part.strip() for part in re.split(r'[;]|\band\b', affiliation_string)]
-            # Further split the substrings by ',' if the latter component is not a country.
-            substring_list = __country_aware_comma_split(substring_list)
-
-            for substring in substring_list:
-                # Use a regular expression to remove anything before 'at', or '@'.
-                cleaned_affiliation = re.sub(r'.*?\bat\b|.*?@', '', substring, flags=re.IGNORECASE).strip()
-                # Use a regular expression to filter out strings that represent
-                # a person's identity rather than affiliation.
-                is_common_identity_string = re.search(
-                    re.compile(
-                        r'\b(director|manager|chair|engineer|programmer|scientist|professor|lecturer|phd|ph\.d|postdoc|doctor|student|department of)\b',
-                        re.IGNORECASE),
-                    cleaned_affiliation)
-                if not is_common_identity_string:
-                    cleaned_author_paper_affiliation_tuple_list.append((author_name, citing_paper_title, cited_paper_title, cleaned_affiliation))
+            for cleaned_affiliation in clean_affiliation(affiliation_string):
+                cleaned_author_paper_affiliation_tuple_list.append((author_name, citing_paper_title, cited_paper_title, cleaned_affiliation))
     return cleaned_author_paper_affiliation_tuple_list
 
+def get_gazetteer() -> Gazetteer:
+    '''
+    Return the gazetteer of known and invalid affiliations. Defaults to `KNOWN_AFFILIATION_DICT` and `INVALID_AFFILIATION_TERMS`.
+    '''
+    global gazetteer
+    if gazetteer is None:
+        gazetteer = Gazetteer(KNOWN_AFFILIATION_DICT, INVALID_AFFILIATION_TERMS)
+    return gazetteer
+
+def load_gazetteer(gazetteer_path: str) -> Gazetteer:
+    '''
+    Add the institutions and invalid terms of a local .csv or .json gazetteer (see `Gazetteer.from_file`)
+    to the gazetteer used by `fill_known_affiliations` and `affiliation_invalid`.
+    The built-in entries keep priority.
+    '''
+    global gazetteer
+    gazetteer = get_gazetteer().extend(Gazetteer.from_file(gazetteer_path))
+    print('[INFO] Loaded the gazetteer %s: %d known institutions and %d invalid terms in total.' % (
+        gazetteer_path, len(gazetteer.institutions), len(gazetteer.invalid_terms)))
+    return gazetteer
+
 def fill_known_affiliations(affiliation_name: str) -> Optional[str]:
     '''
     If the affiliation is known, return its geolocation.
@@ -253,10 +362,7 @@ def fill_known_affiliations(affiliation_name: str) -> Optional[str]:
     such as putting the company Amazon in Amazon rain forest.
     NOTE: This is a temporal fix. Can be replaced by smarter natural language parsers.
     '''
-    for key in KNOWN_AFFILIATION_DICT:
-        if key in affiliation_name.lower():
-            return KNOWN_AFFILIATION_DICT[key]
-    return None
+    return get_gazetteer().lookup(affiliation_name)
 
 def affiliation_invalid(affiliation_name: str) -> bool:
     '''
@@ -265,25 +371,139 @@ def affiliation_invalid(affiliation_name: str) -> bool:
     Invalid affiliations will waste time in geolocator.geocode(affiliation_name).
     NOTE: This is a temporal fix. Can be replaced by smarter natural language parsers.
     '''
-    invalid_affiliation_set = {
-        NO_AUTHOR_FOUND_STR.lower(),
-        'computer', 'computer science', 'electrical', 'engineering', 'researcher',
-        'scholar', 'inc.', 'school', 'department', 'student', 'candidate', 'professor', 'faculty', 'associate'
-    }
-    for key in invalid_affiliation_set:
-        if key in affiliation_name.lower():
-            return True
-    return False
+    return get_gazetteer().is_invalid(affiliation_name)
+
+def get_geolocator():
+    '''
+    Return the Nominatim geolocator shared by all geocoding calls in this process.
+    '''
+    global geolocator
+    if geolocator is None:
+        geolocator = Nominatim(user_agent='citation_mapper')
+    return geolocator
+
+def load_offline_geocoder(offline_geocoder_path: str) -> OfflineGeocoder:
+    '''
+    Geocode affiliations from a local institution file first (see `OfflineGeocoder.from_file`),
+    and only send the affiliations it does not know to the geocoder.
+    '''
+    global offline_geocoder
+    offline_geocoder = OfflineGeocoder.from_file(offline_geocoder_path)
+    return offline_geocoder
+
+def load_reverse_geocoder(reverse_geocoder_path: str) -> OfflineReverseGeocoder:
+    '''
+    Fill in county, city, state and country from a local places file (see `OfflineReverseGeocoder.from_file`)
+    instead of asking the geocoder.
+    '''
+    global reverse_geocoder
+    reverse_geocoder = OfflineReverseGeocoder.from_file(reverse_geocoder_path)
+    return reverse_geocoder
+
+def fill_admin_fields(geo_info: Tuple) -> Tuple:
+    '''
+    Fill the missing county, city, state and country of (latitude, longitude, county, city, state, country)
+    from the offline reverse geocoder, if it is loaded. Fields that are already known are kept.
+    '''
+    if reverse_geocoder is None or geo_info[0] == '' or all(geo_info[2:]):
+        return geo_info
+    admin_fields = reverse_geocoder.reverse(float(geo_info[0]), float(geo_info[1]))
+    if admin_fields is None:
+        return geo_info
+    return tuple(geo_info[:2]) + tuple(field or admin_field for field, admin_field in zip(geo_info[2:], admin_fields))
+
+def geocode_affiliation(affiliation_name: str,
+                        geocode_cache: Optional[GeocodeCache] = None,
+                        max_attempts: int = 3) -> Optional[Tuple]:
+    '''
+    Geocode one affiliation string into (latitude, longitude, county, city, state, country).
+    Returns None if the geocoder confirmed that it cannot locate the affiliation, or if every attempt failed.
+    Confirmed results (hits and misses) are recorded in `geocode_cache`; failed requests are not.
+    One request per affiliation: the address comes with the forward lookup. It is only reverse geocoded
+    (offline if possible) when the response has no address.
+    '''
+    if geocode_cache is not None:
+        cached = geocode_cache.get(affiliation_name)
+        if cached is not None:
+            found, geo_info = cached
+            return geo_info if found else None
+
+    geolocator = get_geolocator()
+    for _ in range(max_attempts):
+        try:
+            # The address details (county, city, state, country, etc.) come with the same response.
+            with span('geocode.forward'):
+                geo_location = geolocator.geocode(affiliation_name, addressdetails=True, language='en')
+            if geo_location is None:
+                # The geocoder answered but found nothing. Retrying will not help.
+                if geocode_cache is not None:
+                    geocode_cache.put_miss(affiliation_name)
+                return None
+            address = geo_location.raw.get('address')
+            if address is None:
+                admin_fields = None if reverse_geocoder is None else reverse_geocoder.reverse(geo_location.latitude, geo_location.longitude)
+                if admin_fields is not None:
+                    county, city, state, country = admin_fields
+                    address = {'county': county, 'city': city, 'state': state, 'country': country}
+                else:
+                    with span('geocode.reverse'):
+                        location_metadata = geolocator.reverse(str(geo_location.latitude) + ',' + str(geo_location.longitude), language='en')
+                    address = None if location_metadata is None else location_metadata.raw.get('address')
+            if address is None:
+                # No address for these coordinates: keep them without county, city, state and country.
+                # Not cached, so that a later run asks again.
+                return (geo_location.latitude, geo_location.longitude, None, None, None, None)
+            geo_info = (geo_location.latitude, geo_location.longitude,
+                        address.get('county'), address.get('city'), address.get('state'), address.get('country'))
+            if geocode_cache is not None:
+                geocode_cache.put_hit(affiliation_name, *geo_info)
+            return geo_info
+        except GeopyError as e:
+            print('[WARNING!] Geocoding %s failed: %s' % (affiliation_name, e))
+            event('geocode failed')
+            continue
+    return None
 
-def affiliation_text_to_geocode(author_paper_affiliation_tuple_list: List[Tuple[str]], max_attempts: int = 3) -> List[Tuple[str]]:
+def locate_affiliation(affiliation_name: str,
+                       geocode_cache: Optional[GeocodeCache] = None,
+                       max_attempts: int = 3) -> Optional[Tuple]:
+    '''
+    Find (latitude, longitude, county, city, state, country) of one affiliation.
+    Invalid affiliations get empty fields without running the geolocator, so that they are still recorded in the csv.
+    Known affiliations and, if loaded, the ones in the offline geocoder are located without any request.
+    Returns None if the affiliation cannot be located.
+    '''
+    # Invalid and known affiliations are both found in one pass over the name.
+    invalid, geo_location = get_gazetteer().match(affiliation_name)
+    if invalid:
+        count('locate.invalid')
+        return ('', '', '', '', '', '')
+    # Directly enter information if the affiliation is known.
+    if geo_location is not None:
+        count('locate.known')
+        county, city, state, country, latitude, longitude = geo_location
+        return fill_admin_fields((latitude, longitude, county, city, state, country))
+    if offline_geocoder is not None:
+        geo_info = offline_geocoder.geocode(affiliation_name)
+        if geo_info is not None:
+            count('locate.offline geocoder')
+            return fill_admin_fields(geo_info)
+    count('locate.geocoder')
+    geo_info = geocode_affiliation(affiliation_name, geocode_cache=geocode_cache, max_attempts=max_attempts)
+    return None if geo_info is None else fill_admin_fields(geo_info)
+
+@timed('stage.geocode')
+def affiliation_text_to_geocode(author_paper_affiliation_tuple_list: List[Tuple[str]],
+                                max_attempts: int = 3,
+                                geocode_cache: Optional[GeocodeCache] = None) -> List[Tuple[str]]:
     '''
     Step 4: Convert affiliations in plain text to Geocode.
+    Affiliations found in `geocode_cache` (as hits or as confirmed misses) are not sent to the geocoder again.
     '''
     coordinates_and_info = []
     # NOTE: According to the Nominatim Usage Policy (https://operations.osmfoundation.org/policies/nominatim/),
     # we are explicitly asked not to submit bulk requests on multiple threads.
     # Therefore, we will keep it to a loop instead of multiprocessing.
-    geolocator = Nominatim(user_agent='citation_mapper')
 
     # Find unique affiliations and record their corresponding entries.
     affiliation_map = {}
@@ -299,210 +519,394 @@ def affiliation_text_to_geocode(author_paper_affiliation_tuple_list: List[Tuple[
                                  desc='Finding geographic coordinates from %d unique citing affiliations in %d entries' % (
                                      len(affiliation_map), len(author_paper_affiliation_tuple_list)),
                                  total=len(affiliation_map)):
-        if affiliation_invalid(affiliation_name):
-            # If an affiliation is invalid, we will not run geolocator on it.
-            # However, we still record it in the csv, so that the user can choose to manually correct it.
-            corresponding_entries = affiliation_map[affiliation_name]
-            for entry_idx in corresponding_entries:
-                author_name, citing_paper_title, cited_paper_title, affiliation_name = author_paper_affiliation_tuple_list[entry_idx]
-                coordinates_and_info.append((author_name, citing_paper_title, cited_paper_title, affiliation_name,
-                                            '', '', '', '', '', ''))
-        else:
-            # Directly enter information if the affiliation is known.
-            geo_location = fill_known_affiliations(affiliation_name)
-            if geo_location is not None:
-                county, city, state, country, latitude, longitude = geo_location
-                corresponding_entries = affiliation_map[affiliation_name]
-                for entry_idx in corresponding_entries:
-                    author_name, citing_paper_title, cited_paper_title, affiliation_name = author_paper_affiliation_tuple_list[entry_idx]
-                    coordinates_and_info.append((author_name, citing_paper_title, cited_paper_title, affiliation_name,
-                                                latitude, longitude, county, city, state, country))
-                # This location is successfully recorded.
-                num_located_affiliations += 1
-            else:
-                for _ in range(max_attempts):
-                    try:
-                        geo_location = geolocator.geocode(affiliation_name)
-                        if geo_location is not None:
-                            # Get the full location metadata that includes county, city, state, country, etc.
-                            location_metadata = geolocator.reverse(str(geo_location.latitude) + ',' + str(geo_location.longitude), language='en')
-                            address = location_metadata.raw['address']
-                            county, city, state, country = None, None, None, None
-                            if 'county' in address:
-                                county = address['county']
-                            if 'city' in address:
-                                city = address['city']
-                            if 'state' in address:
-                                state = address['state']
-                            if 'country' in address:
-                                country = address['country']
-
-                            corresponding_entries = affiliation_map[affiliation_name]
-                            for entry_idx in corresponding_entries:
-                                author_name, citing_paper_title, cited_paper_title, affiliation_name = author_paper_affiliation_tuple_list[entry_idx]
-                                coordinates_and_info.append((author_name, citing_paper_title, cited_paper_title, affiliation_name,
-                                                            geo_location.latitude, geo_location.longitude,
-                                                            county, city, state, country))
-                            # This location is successfully recorded.
-                            num_located_affiliations += 1
-                            break
-                    except:
-                        continue
+        geo_info = locate_affiliation(affiliation_name, geocode_cache=geocode_cache, max_attempts=max_attempts)
+        if geo_info is None:
+            continue
+        corresponding_entries = affiliation_map[affiliation_name]
+        for entry_idx in corresponding_entries:
+            coordinates_and_info.append(author_paper_affiliation_tuple_list[entry_idx] + tuple(geo_info))
+        if geo_info[0] != '':
+            # This location is successfully recorded.
+            num_located_affiliations += 1
     print('\nConverted %d/%d affiliations to Geocodes.' % (num_located_affiliations, num_total_affiliations))
+    __print_offline_geocoder_stats()
+    if geocode_cache is not None:
+        cache_stats = geocode_cache.stats()
+        print('[INFO] Geocode cache: %d hits, %d misses, %d located and %d unlocatable affiliations stored.' % (
+            cache_stats['hits'], cache_stats['misses'], cache_stats['cached_found'], cache_stats['cached_not_found']))
     coordinates_and_info = [item for item in coordinates_and_info if item is not None]  # Filter out empty entries.
     return coordinates_and_info
 
-def export_dict_to_csv(coordinates_and_info: List[Tuple[str]], csv_output_path: str) -> None:
-    '''
-    Step 5.1: Export csv file recording citation information.
-    '''
 
-    citation_df = pd.DataFrame(coordinates_and_info,
-                               columns=['citing author name', 'citing paper title', 'cited paper title',
-                                        'affiliation', 'latitude', 'longitude',
-                                        'county', 'city', 'state', 'country'])
-
-    citation_df.to_csv(csv_output_path)
-    return
-
-def read_csv_to_dict(csv_path: str) -> None:
+def __citing_authors_and_papers_from_publication(cites_id_and_cited_paper: Tuple[str, str, int],
+                                                 driver,
+                                                 snapshot_store: Optional[CitationSnapshotStore] = None,
+                                                 refresh: bool = False,
+                                                 journal: Optional[CrawlJournal] = None):
     '''
-    Step 5.1: Read csv file recording citation information.
-    Only relevant if `read_from_csv` is True.
-    '''
-
-    citation_df = pd.read_csv(csv_path, index_col=0)
-    coordinates_and_info = list(citation_df.itertuples(index=False, name=None))
-    return coordinates_and_info
-
-def create_map(coordinates_and_info: List[Tuple[str]], pin_colorful: bool = True):
+    Find the (citing author ID, citing paper title, cited paper title) tuples of one publication.
+    Returns the tuples and how the publication was crawled: 'resumed', 'unchanged', 'updated' or 'full'.
     '''
-    Step 5.2: Create the Citation World Map.
+    cites_id, cited_paper_title, num_citations = cites_id_and_cited_paper
+    if journal is not None:
+        citing_author_paper_info = journal.get('publication', cites_id)
+        if citing_author_paper_info is not None:
+            return [tuple(info) for info in citing_author_paper_info], 'resumed'
 
-    For authors under the same affiliations, they will be displayed in the same pin.
-    '''
-    citation_map = folium.Map(location=[20, 0], zoom_start=2)
+    citing_paper_search_url = schoarly_support_new.SCHOLAR_BASE_URL + '/scholar?hl=en&cites=' + cites_id
+    # print(citing_paper_search_url)
 
-    # Find unique affiliations and record their corresponding entries.
-    affiliation_map = {}
-    for entry_idx, (_, _, _, affiliation_name, _, _, _, _, _, _) in enumerate(coordinates_and_info):
-        if affiliation_name == NO_AUTHOR_FOUND_STR:
-            continue
-        elif affiliation_name not in affiliation_map.keys():
-            affiliation_map[affiliation_name] = [entry_idx]
+    previous_num_citations = None
+    if refresh and snapshot_store is not None:
+        previous_num_citations = snapshot_store.get_num_citations(cites_id)
+
+    if previous_num_citations is not None and num_citations <= previous_num_citations:
+        # Nothing new since the last crawl. Reuse the snapshot.
+        citing_authors_and_citing_papers = snapshot_store.get_citing(cites_id)
+        crawl_mode = 'unchanged'
+    elif previous_num_citations is not None:
+        # Only crawl the newest result pages, by sorting the citing papers by date.
+        num_new_citations = num_citations - previous_num_citations
+        previous_citing = snapshot_store.get_citing(cites_id)
+        new_citing = get_citing_author_ids_and_citing_papers(
+            citing_paper_search_url + '&scisbd=1', driver,
+            max_pages=math.ceil(num_new_citations / CITATION_RESULTS_PER_PAGE), journal=journal)
+        num_new_papers = len(set(title for _, title in new_citing) - set(title for _, title in previous_citing))
+        if num_new_papers >= num_new_citations:
+            snapshot_store.put(cites_id, cited_paper_title, num_citations, new_citing, merge=True)
+            citing_authors_and_citing_papers = snapshot_store.get_citing(cites_id)
+            crawl_mode = 'updated'
         else:
-            affiliation_map[affiliation_name].append(entry_idx)
-
-    if pin_colorful:
-        colors = ['red', 'blue', 'green', 'purple', 'orange', 'darkred',
-                  'lightred', 'beige', 'darkblue', 'darkgreen', 'cadetblue',
-                  'darkpurple', 'pink', 'lightblue', 'lightgreen',
-                  'gray', 'black', 'lightgray']
-        for affiliation_name in affiliation_map:
-            color = random.choice(colors)
-            corresponding_entries = affiliation_map[affiliation_name]
-            author_name_list = []
-            location_valid = True
-            for entry_idx in corresponding_entries:
-                author_name, _, _, _, lat, lon, _, _, _, _  = coordinates_and_info[entry_idx]
-                if pd.isna(lat) or pd.isna(lon) or lat == '' or lon == '':
-                    location_valid = False
-                author_name_list.append(author_name)
-            if location_valid:
-                folium.Marker([lat, lon], popup='%s (%s)' % (affiliation_name, ' & '.join(author_name_list)),
-                            icon=folium.Icon(color=color)).add_to(citation_map)
+            # The newest pages do not account for all new citations. Fall back to a full crawl.
+            citing_authors_and_citing_papers = None
     else:
-        for affiliation_name in affiliation_map:
-            corresponding_entries = affiliation_map[affiliation_name]
-            author_name_list = []
-            location_valid = True
-            for entry_idx in corresponding_entries:
-                author_name, _, _, _, lat, lon, _, _, _, _  = coordinates_and_info[entry_idx]
-                if pd.isna(lat) or pd.isna(lon) or lat == '' or lon == '':
-                    location_valid = False
-                author_name_list.append(author_name)
-            if location_valid:
-                folium.Marker([lat, lon], popup='%s (%s)' % (affiliation_name, ' & '.join(author_name_list))).add_to(citation_map)
-    return citation_map
-
-def count_citation_stats(coordinates_and_info: List[Tuple[str]]) -> List[int]:
-    '''
-    Count the number of citing authors, affiliations and countries.
-    '''
-    unique_author_list, unique_affiliation_list, unique_country_list = set(), set(), set()
-    for (author_name, _, _, affiliation_name, _, _, _, _, _, country) in coordinates_and_info:
-        if affiliation_name == NO_AUTHOR_FOUND_STR:
-            continue
-        unique_author_list.add(author_name)
-        unique_affiliation_list.add(affiliation_name)
-        unique_country_list.add(country)
-        num_authors, num_affiliations, num_countries = \
-            len(unique_author_list), len(unique_affiliation_list), len(unique_country_list)
-    return num_authors, num_affiliations, num_countries
+        citing_authors_and_citing_papers = None
 
+    if citing_authors_and_citing_papers is None:
+        citing_authors_and_citing_papers = get_citing_author_ids_and_citing_papers(citing_paper_search_url, driver,
+                                                                                   journal=journal)
+        if snapshot_store is not None:
+            snapshot_store.put(cites_id, cited_paper_title, num_citations, citing_authors_and_citing_papers)
+        crawl_mode = 'full'
 
-def __citing_authors_and_papers_from_publication(cites_id_and_cited_paper: Tuple[str, str]):
-    cites_id, cited_paper_title = cites_id_and_cited_paper
-    citing_paper_search_url = 'https://scholar.google.com/scholar?hl=en&cites=' + cites_id
-    # print(citing_paper_search_url)
-    citing_authors_and_citing_papers = get_citing_author_ids_and_citing_papers(citing_paper_search_url, driver)
     citing_author_paper_info = []
     for citing_author_id, citing_paper_title in citing_authors_and_citing_papers:
         citing_author_paper_info.append((citing_author_id, citing_paper_title, cited_paper_title))
-    return citing_author_paper_info
-
-def __country_aware_comma_split(string_list: List[str]) -> List[str]:
-    comma_split_list = []
-
-    for part in string_list:
-        # Split the strings by comma.
-        # NOTE: The non-English comma is entered intentionally.
-        sub_parts = [sub_part.strip() for sub_part in re.split(r'[,，]', part)]
-        sub_parts_iter = iter(sub_parts)
-
-        # Merge the split strings if the latter component is a country name.
-        for sub_part in sub_parts_iter:
-            if __iscountry(sub_part):
-                continue  # Skip country names if they appear as the first sub_part.
-            next_part = next(sub_parts_iter, None)
-            if __iscountry(next_part):
-                comma_split_list.append(f"{sub_part}, {next_part}")
-            else:
-                comma_split_list.append(sub_part)
-                if next_part:
-                    comma_split_list.append(next_part)
-    return comma_split_list
+    if journal is not None:
+        journal.record('publication', cites_id, citing_author_paper_info)
+    return citing_author_paper_info, crawl_mode
 
-def __iscountry(string: str) -> bool:
-    try:
-        pycountry.countries.lookup(string)
-        return True
-    except LookupError:
-        return False
+def __print_offline_geocoder_stats() -> None:
+    if offline_geocoder is not None:
+        offline_stats = offline_geocoder.stats()
+        print('[INFO] Offline geocoder: %d exact and %d fuzzy matches, %d affiliations left to the geocoder.' % (
+            offline_stats['exact'], offline_stats['fuzzy'], offline_stats['misses']))
 
 def __print_author_and_affiliation(author_paper_affiliation_tuple_list: List[Tuple[str]]) -> None:
-    __author_affiliation_tuple_list = []
-    for author_name, _, _, affiliation_name in sorted(author_paper_affiliation_tuple_list):
-        if author_name == NO_AUTHOR_FOUND_STR:
-            continue
-        __author_affiliation_tuple_list.append((author_name, affiliation_name))
-
     # Take unique tuples.
-    __author_affiliation_tuple_list = list(set(__author_affiliation_tuple_list))
-    for author_name, affiliation_name in sorted(__author_affiliation_tuple_list):
+    __author_affiliation_tuple_set = set((author_name, affiliation_name)
+                                         for author_name, _, _, affiliation_name in author_paper_affiliation_tuple_list
+                                         if author_name != NO_AUTHOR_FOUND_STR)
+    for author_name, affiliation_name in sorted(__author_affiliation_tuple_set):
         print('Author: %s. Affiliation: %s.' % (author_name, affiliation_name))
     print('')
     return
 
 
-def save_cache(data: Any, fpath: str) -> None:
-    os.makedirs(os.path.dirname(fpath), exist_ok=True)
-    with open(fpath, "wb") as fd:
-        pickle.dump(data, fd)
+def stream_citation_pipeline(scholar_id: str,
+                             browser_pool: BrowserPool,
+                             profile_store: AuthorProfileStore,
+                             geocode_cache: Optional[GeocodeCache] = None,
+                             snapshot_store: Optional[CitationSnapshotStore] = None,
+                             journal: Optional[CrawlJournal] = None,
+                             refresh: bool = False,
+                             affiliation_conservative: bool = False,
+                             queue_size: int = 256,
+                             quarantine: Optional[CrawlQuarantine] = None):
+    '''
+    Step 1 - 4 as a streaming pipeline, instead of one stage after the other.
+
+    The browser sessions take publication jobs and author-profile jobs from one shared queue.
+    Profile jobs go first, so a citing author is looked up as soon as a citation page names them.
+    Affiliations are cleaned as soon as their profile arrives, and are then passed to a single geocoding thread
+    (one thread, following the Nominatim Usage Policy).
+    The queues between the stages are bounded by `queue_size`, so a slow stage holds back the stages feeding it.
+    Blocked jobs are set aside by `quarantine` and queued again after their cooldown, while the sessions go on with the others.
+
+    Returns (all_citing_author_paper_tuple_list, author_paper_affiliation_tuple_list, coordinates_and_info),
+    with the same contents as the sequential steps.
+    '''
+    return stream_batch_citation_pipeline([scholar_id], browser_pool, profile_store,
+                                          geocode_cache=geocode_cache,
+                                          snapshot_store=snapshot_store,
+                                          journal=journal,
+                                          refresh=refresh,
+                                          affiliation_conservative=affiliation_conservative,
+                                          queue_size=queue_size,
+                                          quarantine=quarantine)[scholar_id]
+
+@timed('stage.streaming pipeline')
+def stream_batch_citation_pipeline(scholar_ids: List[str],
+                                   browser_pool: BrowserPool,
+                                   profile_store: AuthorProfileStore,
+                                   geocode_cache: Optional[GeocodeCache] = None,
+                                   snapshot_store: Optional[CitationSnapshotStore] = None,
+                                   journal: Optional[CrawlJournal] = None,
+                                   refresh: bool = False,
+                                   affiliation_conservative: bool = False,
+                                   queue_size: int = 256,
+                                   quarantine: Optional[CrawlQuarantine] = None) -> Dict[str, Tuple[List[Tuple], List[Tuple], List[Tuple]]]:
+    '''
+    `stream_citation_pipeline` for several scholars at once.
+
+    Every unique publication (by cites_id, e.g. a paper co-authored by several scholars), citing author profile
+    and affiliation is only crawled or geocoded once, and its results are handed to every scholar it belongs to.
+    Returns scholar_id -> (all_citing_author_paper_tuple_list, author_paper_affiliation_tuple_list, coordinates_and_info),
+    as deduplicated `RecordStore`s sharing one `InternTable`.
+    '''
+    if quarantine is None:
+        quarantine = CrawlQuarantine()
+    # cites_id -> (cites_id, title, num_citations), and cites_id -> the scholars it belongs to.
+    publication_dict, publication_owners = {}, {}
+    for scholar_id in scholar_ids:
+        publication_info = set(get_publications_with_citation_counts_selenium(
+            scholar_id, browser_pool.get_driver(0), journal=journal, quarantine=quarantine) or [])
+        print('Author profile %s found, with %d publications.\n' % (scholar_id, len(publication_info)))
+        for pub in publication_info:
+            publication_dict.setdefault(pub[0], pub)
+            publication_owners.setdefault(pub[0], []).append(scholar_id)
+    all_publication_info = list(publication_dict.values())
+    if len(scholar_ids) > 1:
+        print('[INFO] %d unique publications out of %d publications of %d scholars.' % (
+            len(all_publication_info), sum(len(owners) for owners in publication_owners.values()), len(scholar_ids)))
+
+    # Jobs are small and only the dispatcher adds them, so this queue is not bounded. Lower priority values go first.
+    job_queue = queue.PriorityQueue()
+    result_queue = queue.Queue(maxsize=queue_size)
+    geocode_queue = queue.Queue(maxsize=queue_size)
+    job_order = itertools.count()
+    errors = []
+    # Set when the dispatcher fails or is interrupted: the workers stop before their next job, without draining the queues.
+    stop_event = threading.Event()
+
+    def put_job(priority: int, kind: str, payload: Any) -> None:
+        job_queue.put((priority, next(job_order), kind, payload))
+
+    def put_result(result: Tuple[str, Any]) -> None:
+        # Nobody reads the results any more once stopped, so do not wait for room in the queue then.
+        while not stop_event.is_set():
+            try:
+                result_queue.put(result, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def session_worker(worker_idx: int) -> None:
+        try:
+            session = None
+            while True:
+                _, _, kind, payload = job_queue.get()
+                if kind == 'stop' or stop_event.is_set():
+                    return
+                if session is None:
+                    session = browser_pool.get_driver(worker_idx)
+                try:
+                    if kind == 'publication':
+                        put_result((kind, (payload[0], __citing_authors_and_papers_from_publication(
+                            payload, session, snapshot_store=snapshot_store, refresh=refresh, journal=journal))))
+                    else:
+                        put_result((kind, (payload, get_author_profile_cached(payload, session, profile_store, journal=journal))))
+                except BlockedPageError as e:
+                    put_result(('blocked', (kind, payload, e.url)))
+        except BaseException as e:
+            put_result(('error', e))
+
+    # Affiliation -> (latitude, longitude, county, city, state, country), or None if it cannot be located.
+    geo_info_dict = {}
+    geocode_counts = {'total': 0, 'located': 0}
+
+    def geocode_worker() -> None:
+        try:
+            while True:
+                affiliation_name = geocode_queue.get()
+                if affiliation_name is None or stop_event.is_set():
+                    return
+                geo_info_dict[affiliation_name] = locate_affiliation(affiliation_name, geocode_cache=geocode_cache)
+                geocode_counts['total'] += 1
+                if geo_info_dict[affiliation_name] is not None and geo_info_dict[affiliation_name][0] != '':
+                    geocode_counts['located'] += 1
+        except BaseException as e:
+            # Raised by the dispatcher, which stops waiting for room in `geocode_queue` once this thread is gone.
+            errors.append(e)
+
+    def put_affiliation(affiliation_name: Optional[str]) -> None:
+        # Nobody takes the affiliations any more once the geocode worker failed or the dispatcher stopped.
+        while geocode_thread.is_alive() and not stop_event.is_set():
+            try:
+                geocode_queue.put(affiliation_name, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    # The records of every scholar, deduplicated on insert, with the strings of all scholars interned once.
+    strings = InternTable()
+    all_citing_author_paper_tuple_lists = {scholar_id: RecordStore(CITING_AUTHOR_PAPER_FIELDS, strings) for scholar_id in scholar_ids}
+    author_paper_affiliation_tuple_lists = {scholar_id: RecordStore(AUTHOR_PAPER_AFFILIATION_FIELDS, strings)
+                                            for scholar_id in scholar_ids}
+    # Every affiliation is geocoded once.
+    queued_affiliations = set()
+
+    def emit_affiliation_entries(entries: List[Tuple[str]], owners: List[str]) -> None:
+        if not entries:
+            return
+        entry_list = []
+        for entry in entries:
+            entry_list.append(entry)
+            if not affiliation_conservative:
+                # Use the merged set to maximize coverage.
+                entry_list += clean_affiliation_names([entry])
+        for affiliation_entry in entry_list:
+            if affiliation_entry[3] not in queued_affiliations:
+                queued_affiliations.add(affiliation_entry[3])
+                put_affiliation(affiliation_entry[3])
+                if errors:
+                    raise errors[0]
+        for owner in owners:
+            author_paper_affiliation_tuple_lists[owner].extend(entry_list)
+
+    session_threads = [threading.Thread(target=session_worker, args=(worker_idx,), daemon=True)
+                       for worker_idx in range(browser_pool.num_browsers)]
+    geocode_thread = threading.Thread(target=geocode_worker, daemon=True)
+    for thread in session_threads + [geocode_thread]:
+        thread.start()
+
+    for pub in all_publication_info:
+        put_job(1, 'publication', pub)
+    num_pending_jobs = len(all_publication_info)
+    crawl_mode_counts = {'resumed': 0, 'unchanged': 0, 'updated': 0, 'full': 0}
+    author_profile_dict = {}
+    # Citing entries waiting for the profile of their author: author_id -> [(citing paper title, cited paper title, owners)].
+    waiting_entry_dict = {}
+    progress_bar = tqdm(desc='Crawling %d publications and their citing authors' % len(all_publication_info),
+                        total=num_pending_jobs)
+    try:
+        while num_pending_jobs > 0:
+            if errors:
+                # The geocode worker failed.
+                raise errors[0]
+            for unit_kind, _, payload in quarantine.pop_ready(['publication', 'author_profile']):
+                put_job(0 if unit_kind == 'author_profile' else 1, unit_kind, payload)
+            try:
+                # Wake up for the next cooldown to be over, if any job is set aside.
+                kind, result = result_queue.get(timeout=quarantine.seconds_until_ready(['publication', 'author_profile']))
+            except queue.Empty:
+                continue
+            if kind == 'error':
+                raise result
+            if kind == 'blocked':
+                unit_kind, payload, url = result
+                unit_key = payload[0] if unit_kind == 'publication' else payload
+                if quarantine.defer(unit_kind, unit_key, payload, url=url) is not None:
+                    continue
+                if unit_kind == 'author_profile':
+                    # Given up. The entries of this author are left out, and the profile is not queued again.
+                    author_profile_dict[unit_key] = None
+                    waiting_entry_dict.pop(unit_key, None)
+                num_pending_jobs -= 1
+                progress_bar.update(1)
+                continue
+            num_pending_jobs -= 1
+            progress_bar.update(1)
+            quarantine.record_success(kind, result[0])
+
+            if kind == 'publication':
+                cites_id, (citing_author_paper_info, crawl_mode) = result
+                owners = publication_owners[cites_id]
+                crawl_mode_counts[crawl_mode] += 1
+                # The records of a publication are inserted as one batch.
+                for owner in owners:
+                    all_citing_author_paper_tuple_lists[owner].extend(citing_author_paper_info)
+                affiliation_entries = []
+                for citing_author_id, citing_paper_title, cited_paper_title in citing_author_paper_info:
+                    if citing_author_id == NO_AUTHOR_FOUND_STR:
+                        affiliation_entries.append((NO_AUTHOR_FOUND_STR, citing_paper_title, cited_paper_title, NO_AUTHOR_FOUND_STR))
+                    elif citing_author_id in author_profile_dict:
+                        if author_profile_dict[citing_author_id] is None:
+                            continue
+                        name, affiliation = author_profile_dict[citing_author_id]
+                        if affiliation:
+                            affiliation_entries.append((name, citing_paper_title, cited_paper_title, affiliation))
+                    else:
+                        if citing_author_id not in waiting_entry_dict:
+                            waiting_entry_dict[citing_author_id] = []
+                            put_job(0, 'author_profile', citing_author_id)
+                            num_pending_jobs += 1
+                            progress_bar.total += 1
+                            progress_bar.refresh()
+                        waiting_entry_dict[citing_author_id].append((citing_paper_title, cited_paper_title, owners))
+                emit_affiliation_entries(affiliation_entries, owners)
+            else:
+                citing_author_id, (name, affiliation) = result
+                author_profile_dict[citing_author_id] = (name, affiliation)
+                # The entries of the author, in one batch per set of owners.
+                owner_entries = {}
+                for citing_paper_title, cited_paper_title, owners in waiting_entry_dict.pop(citing_author_id):
+                    if affiliation:
+                        owner_entries.setdefault(tuple(owners), []).append((name, citing_paper_title, cited_paper_title, affiliation))
+                for owners, affiliation_entries in owner_entries.items():
+                    emit_affiliation_entries(affiliation_entries, list(owners))
+    except BaseException:
+        stop_event.set()
+        raise
+    finally:
+        progress_bar.close()
+        # Ahead of any job still queued.
+        for _ in session_threads:
+            put_job(-1, 'stop', None)
+        if stop_event.is_set():
+            try:
+                geocode_queue.put_nowait(None)
+            except queue.Full:
+                # The geocode worker returns before its next affiliation.
+                pass
+        else:
+            put_affiliation(None)
+
+    geocode_thread.join()
+    if errors:
+        raise errors[0]
+
+    if crawl_mode_counts['resumed'] > 0:
+        print('[INFO] Resumed %d publications from the journal.' % crawl_mode_counts['resumed'])
+    if refresh:
+        print('[INFO] Refresh: %d publications unchanged, %d updated with new pages, %d crawled in full.' % (
+            crawl_mode_counts['unchanged'], crawl_mode_counts['updated'], crawl_mode_counts['full']))
+    store_stats = profile_store.stats()
+    print('[INFO] Author profile store: %d hits, %d misses, %d profiles stored.' % (
+        store_stats['hits'], store_stats['misses'], store_stats['profiles']))
+    print('\nConverted %d/%d affiliations to Geocodes.' % (geocode_counts['located'], geocode_counts['total']))
+    __print_offline_geocoder_stats()
+
+    # The citations of every scholar are its affiliation entries with the place of their affiliation.
+    coordinates_and_info_lists = {}
+    for scholar_id in scholar_ids:
+        all_citing_author_paper_tuple_lists[scholar_id].compact()
+        author_paper_affiliation_tuple_lists[scholar_id].compact()
+        coordinates_and_info_lists[scholar_id] = author_paper_affiliation_tuple_lists[scholar_id].join(
+            'affiliation', geo_info_dict, CITATION_COLUMNS[4:])
+    return {scholar_id: (all_citing_author_paper_tuple_lists[scholar_id],
+                         author_paper_affiliation_tuple_lists[scholar_id],
+                         coordinates_and_info_lists[scholar_id]) for scholar_id in scholar_ids}
+
+
+def save_cache(data: List[Tuple[str]], fpath: str, kind: str) -> None:
+    '''
+    Save the tuples of one stage as a typed artifact, see `citation_artifacts.ARTIFACT_SCHEMAS` for the kinds.
+    '''
+    save_artifact(data, fpath, kind)
 
-def load_cache(fpath: str) -> Any:
-    with open(fpath, "rb") as fd:
-        return pickle.load(fd)
+def load_cache(fpath: str, kind: str) -> List[Tuple[str]]:
+    return load_artifact_tuples(fpath, kind)
 
 def generate_citation_map_selenium(scholar_id: str,
                                    output_path: str = 'citation_map.html',
@@ -512,89 +916,407 @@ def generate_citation_map_selenium(scholar_id: str,
                                    affiliation_conservative: bool = False,
                                    pin_colorful: bool = True,
                                    print_citing_affiliations: bool = True,
-                                   chromedriver: str = "chromedriver-mac-arm64/chromedriver"):
-    driver = create_driver(chromedriver)
-
-    if cache_folder is not None:
-        cache_path = os.path.join(cache_folder, scholar_id, 'all_citing_author_paper_tuple_list.pkl')
-        csv_output_path = os.path.join(cache_folder, scholar_id, csv_output_path)
-        output_path = os.path.join(cache_folder, scholar_id, output_path)
-    else:
-        cache_path = None
-
+                                   chromedriver: str = "chromedriver-mac-arm64/chromedriver",
+                                   profile_store_path: Optional[str] = None,
+                                   profile_ttl_days: Optional[float] = 30,
+                                   geocode_cache_path: Optional[str] = None,
+                                   gazetteer_path: Optional[str] = None,
+                                   offline_geocoder_path: Optional[str] = None,
+                                   reverse_geocoder_path: Optional[str] = None,
+                                   refresh: bool = False,
+                                   resume: bool = False,
+                                   num_browsers: int = 1,
+                                   fetch_backend: str = 'http',
+                                   streaming: bool = True,
+                                   lean_browser: bool = False,
+                                   headless_browser: bool = False,
+                                   cluster_markers: Optional[bool] = None,
+                                   metrics_path: Optional[str] = None,
+                                   trace_path: Optional[str] = None,
+                                   interactive_captcha: bool = True,
+                                   blocked_cooldown_seconds: float = 120):
+    '''
+    `profile_store_path`: SQLite file of fetched author profiles. It defaults to `{cache_folder}/author_profiles.sqlite3`,
+        which is shared by all scholars under the same cache folder.
+    `profile_ttl_days`: Author profiles older than this are fetched again. None means they never expire.
+    `geocode_cache_path`: SQLite file of geocoded affiliations. It defaults to `{cache_folder}/geocode_cache.sqlite3`,
+        which is shared by all scholars under the same cache folder.
+    `gazetteer_path`: Local .csv or .json file of known institutions (with their locations) and invalid affiliation terms,
+        used on top of `KNOWN_AFFILIATION_DICT`. See `gazetteer.Gazetteer.from_file` for the format.
+    `offline_geocoder_path`: Local .csv or ROR .json file of institutions and their locations.
+        Affiliations found in it (exactly or fuzzily) are not sent to Nominatim. See `offline_geocoder.OfflineGeocoder.from_file`.
+    `reverse_geocoder_path`: Local .csv or GeoNames cities .txt file of places, used to fill in missing county, city, state
+        and country from coordinates without a request. See `reverse_geocoder.OfflineReverseGeocoder.from_file`.
+    `refresh`: Only crawl the publications whose "Cited by N" count went up since the last run,
+        and merge their new citations into the snapshot at `{cache_folder}/citation_snapshots.sqlite3`.
+    `resume`: Continue the previous run from `{cache_folder}/{scholar_id}/crawl_journal.jsonl`,
+        skipping every publication, citation page and author profile it has completed.
+    `num_browsers`: Number of concurrent browser sessions. Requests from all sessions share one rate limit.
+    `fetch_backend`: 'http' loads pages with a keep-alive HTTP client, and only uses the browser for CAPTCHA or block pages.
+        'selenium' loads every page in the browser.
+    `streaming`: Run Step 1 - 4 as a streaming pipeline, so that profile lookups and geocoding start
+        as soon as the first citing authors are found. Otherwise, run them one after the other.
+    `lean_browser`: Do not load images, stylesheets and fonts in the browser, and parse pages as soon as their HTML is ready.
+    `headless_browser`: Run the browser without a window. CAPTCHAs cannot be solved then, so only use it with a warm profile.
+    `cluster_markers`: Cluster the pins of the map, see `create_map`. None means only for large maps.
+    `metrics_path`: Write a JSON summary of where the run spent its time (page loads, pacing, CAPTCHA pauses, parsing,
+        geocoding, rendering), of the requests, bytes, CAPTCHA / block pages and of the cache hit ratios. See `instrumentation`.
+    `trace_path`: Write the timeline of the run as a Chrome trace, to open in chrome://tracing or https://ui.perfetto.dev.
+    `interactive_captcha`: Wait for the user to solve a CAPTCHA in the browser. With False, the run is unattended:
+        a page still blocked is set aside while the crawl goes on with the other publications and profiles.
+    `blocked_cooldown_seconds`: Cooldown before a blocked page is retried, doubled after every blocked attempt.
+        Units still blocked after 4 attempts are listed in `{cache_folder}/{scholar_id}/crawl_report.json`,
+        and a run with `resume=True` only crawls them.
+    '''
+    __start_instrumentation(metrics_path, trace_path)
     try:
-        if not parse_csv:
-            # Step 1 & 2: citing authors
-            all_citing_author_paper_tuple_list = find_all_citing_authors(scholar_id, driver)
-            print('A total of %d citing authors recorded.\n' % len(all_citing_author_paper_tuple_list))
+        if cache_folder is not None:
+            cache_path = os.path.join(cache_folder, scholar_id, 'citing_author_papers.parquet')
+            csv_output_path = os.path.join(cache_folder, scholar_id, csv_output_path)
+            output_path = os.path.join(cache_folder, scholar_id, output_path)
+        else:
+            cache_path = None
+
+        if parse_csv:
+            # 直接用 csv: 不启动浏览器, 也不打开缓存.
+            render_citation_map(csv_output_path, output_path, pin_colorful=pin_colorful, cluster_markers=cluster_markers)
+            return
+
+        __load_local_geodata(gazetteer_path, offline_geocoder_path, reverse_geocoder_path)
+        browser_pool = __new_browser_pool(chromedriver, num_browsers, fetch_backend, cache_folder,
+                                          lean_browser=lean_browser, headless_browser=headless_browser)
+        profile_store, geocode_cache, snapshot_store = __open_stores(cache_folder, profile_store_path, profile_ttl_days,
+                                                                     geocode_cache_path)
+        if cache_folder is not None:
+            journal = CrawlJournal(os.path.join(cache_folder, scholar_id, 'crawl_journal.jsonl'), resume=resume)
+            if resume:
+                print('[INFO] Resuming from %s with %d completed units.' % (journal.journal_path, len(journal)))
+        else:
+            journal = None
 
-            if cache_path is not None and len(all_citing_author_paper_tuple_list) > 0:
-                save_cache(all_citing_author_paper_tuple_list, cache_path)
-            print('Saved to cache: %s.\n' % cache_path)
+        quarantine = __start_quarantine(interactive_captcha, blocked_cooldown_seconds)
 
-            if cache_folder is not None:
-                cache_path = os.path.join(cache_folder, scholar_id, 'author_paper_affiliation_tuple_list.pkl')
-            else:
-                cache_path = None
-
-            # Step 3: citing affiliations
-            author_paper_affiliation_tuple_list = find_all_citing_affiliations_selenium(
-                all_citing_author_paper_tuple_list,
-                driver,
-                affiliation_conservative=affiliation_conservative
-            )
-
-            print('\nA total of %d citing affiliations recorded.\n' % len(author_paper_affiliation_tuple_list))
-            # Take unique tuples.
-            author_paper_affiliation_tuple_list = list(set(author_paper_affiliation_tuple_list))
-
-            # NOTE: Step 3. Clean the affiliation strings (optional, only used if taking the aggressive approach).
-            if print_citing_affiliations:
-                if affiliation_conservative:
-                    print('Taking the conservative approach. Will not need to clean the affiliation names.')
-                    print('List of all citing authors and affiliations:\n')
-                else:
-                    print('Taking the aggressive approach. Cleaning the affiliation names.')
-                    print('List of all citing authors and affiliations before cleaning:\n')
-                __print_author_and_affiliation(author_paper_affiliation_tuple_list)
-            if not affiliation_conservative:
-                cleaned_author_paper_affiliation_tuple_list = clean_affiliation_names(
-                    author_paper_affiliation_tuple_list)
+        try:
+            if streaming:
+                # Step 1 - 4 at the same time.
+                all_citing_author_paper_tuple_list, author_paper_affiliation_tuple_list, coordinates_and_info = \
+                    stream_citation_pipeline(scholar_id, browser_pool, profile_store,
+                                             geocode_cache=geocode_cache,
+                                             snapshot_store=snapshot_store,
+                                             journal=journal,
+                                             refresh=refresh,
+                                             affiliation_conservative=affiliation_conservative,
+                                             quarantine=quarantine)
+                print('A total of %d citing authors recorded.\n' % len(all_citing_author_paper_tuple_list))
+                print('A total of %d citing affiliations recorded.\n' % len(author_paper_affiliation_tuple_list))
+                if cache_folder is not None:
+                    __save_stage_caches(os.path.join(cache_folder, scholar_id),
+                                        all_citing_author_paper_tuple_list, author_paper_affiliation_tuple_list)
                 if print_citing_affiliations:
-                    print('List of all citing authors and affiliations after cleaning:\n')
-                    __print_author_and_affiliation(cleaned_author_paper_affiliation_tuple_list)
-                # Use the merged set to maximize coverage.
-                author_paper_affiliation_tuple_list += cleaned_author_paper_affiliation_tuple_list
-                # Take unique tuples.
-                author_paper_affiliation_tuple_list = list(set(author_paper_affiliation_tuple_list))
-
-            if cache_path is not None and len(author_paper_affiliation_tuple_list) > 0:
-                save_cache(author_paper_affiliation_tuple_list, cache_path)
-            print('Saved to cache: %s.\n' % cache_path)
+                    print('List of all citing authors and affiliations:\n')
+                    __print_author_and_affiliation(author_paper_affiliation_tuple_list)
 
-            # NOTE: Step 4. Convert affiliations in plain text to Geocode.
-            coordinates_and_info = affiliation_text_to_geocode(author_paper_affiliation_tuple_list)
-            # Take unique tuples.
-            coordinates_and_info = sorted(list(set(coordinates_and_info)))
+                # The records are unique already.
+                coordinates_and_info.sort()
 
-            # NOTE: Step 5.1. Export csv file recording citation information.
-            export_dict_to_csv(coordinates_and_info, csv_output_path)
-            print('\nCitation information exported to %s.' % csv_output_path)
+                # NOTE: Step 5.1. Export csv file recording citation information.
+                export_dict_to_csv(coordinates_and_info, csv_output_path)
+                print('\nCitation information exported to %s.' % csv_output_path)
 
-        else:
-            # 直接用 csv
-            coordinates_and_info = read_csv_to_dict(csv_output_path)
+            else:
+                # Step 1 & 2: citing authors
+                all_citing_author_paper_tuple_list = find_all_citing_authors(scholar_id,
+                                                                             snapshot_store=snapshot_store,
+                                                                             refresh=refresh,
+                                                                             journal=journal,
+                                                                             browser_pool=browser_pool,
+                                                                             quarantine=quarantine)
+                print('A total of %d citing authors recorded.\n' % len(all_citing_author_paper_tuple_list))
+
+                if cache_path is not None and len(all_citing_author_paper_tuple_list) > 0:
+                    save_cache(all_citing_author_paper_tuple_list, cache_path, 'citing_author_papers')
+                print('Saved to cache: %s.\n' % cache_path)
+
+                if cache_folder is not None:
+                    cache_path = os.path.join(cache_folder, scholar_id, 'author_paper_affiliations.parquet')
+                else:
+                    cache_path = None
+
+                # Step 3: citing affiliations
+                author_paper_affiliation_tuple_list = find_all_citing_affiliations_selenium(
+                    all_citing_author_paper_tuple_list,
+                    None,
+                    affiliation_conservative=affiliation_conservative,
+                    profile_store=profile_store,
+                    journal=journal,
+                    browser_pool=browser_pool,
+                    quarantine=quarantine
+                )
+
+                print('\nA total of %d citing affiliations recorded.\n' % len(author_paper_affiliation_tuple_list))
+                # Take unique tuples, with the strings of all stages interned once.
+                strings = InternTable()
+                author_paper_affiliation_tuple_list = RecordStore(AUTHOR_PAPER_AFFILIATION_FIELDS, strings,
+                                                                  records=author_paper_affiliation_tuple_list)
+
+                # NOTE: Step 3. Clean the affiliation strings (optional, only used if taking the aggressive approach).
+                if print_citing_affiliations:
+                    if affiliation_conservative:
+                        print('Taking the conservative approach. Will not need to clean the affiliation names.')
+                        print('List of all citing authors and affiliations:\n')
+                    else:
+                        print('Taking the aggressive approach. Cleaning the affiliation names.')
+                        print('List of all citing authors and affiliations before cleaning:\n')
+                    __print_author_and_affiliation(author_paper_affiliation_tuple_list)
+                if not affiliation_conservative:
+                    cleaned_author_paper_affiliation_tuple_list = clean_affiliation_names(
+                        author_paper_affiliation_tuple_list)
+                    if print_citing_affiliations:
+                        print('List of all citing authors and affiliations after cleaning:\n')
+                        __print_author_and_affiliation(cleaned_author_paper_affiliation_tuple_list)
+                    # Use the merged set to maximize coverage. Only new tuples are added.
+                    author_paper_affiliation_tuple_list.extend(cleaned_author_paper_affiliation_tuple_list)
+
+                if cache_path is not None and len(author_paper_affiliation_tuple_list) > 0:
+                    save_cache(author_paper_affiliation_tuple_list, cache_path, 'author_paper_affiliations')
+                print('Saved to cache: %s.\n' % cache_path)
+
+                # NOTE: Step 4. Convert affiliations in plain text to Geocode.
+                coordinates_and_info = RecordStore(CITATION_COLUMNS, strings, records=affiliation_text_to_geocode(
+                    author_paper_affiliation_tuple_list, geocode_cache=geocode_cache))
+                coordinates_and_info.sort()
+
+                # NOTE: Step 5.1. Export csv file recording citation information.
+                export_dict_to_csv(coordinates_and_info, csv_output_path)
+                print('\nCitation information exported to %s.' % csv_output_path)
+        except KeyboardInterrupt:
+            if journal is not None:
+                print('\n[INFO] Interrupted. Run again with resume=True to continue from %s.' % journal.journal_path)
+            raise
+        finally:
+            print_rate_stats()
+            browser_pool.quit()
+            profile_store.close()
+            geocode_cache.close()
+            snapshot_store.close()
+            if journal is not None:
+                journal.close()
+            __finish_quarantine(quarantine, None if cache_folder is None else os.path.join(cache_folder, scholar_id, 'crawl_report.json'))
+
+
+        draw_and_summarize(coordinates_and_info, output_path, csv_output_path,
+                             pin_colorful=pin_colorful, cluster_markers=cluster_markers)
     finally:
-        driver.quit()
+        # Also after an error or an interrupt, so that the metrics are written and the recording stops.
+        __write_instrumentation(metrics_path, trace_path)
+
+def generate_citation_maps_selenium(scholar_ids: List[str],
+                                    group_name: str = 'group',
+                                    output_path: str = 'citation_map.html',
+                                    csv_output_path: str = 'citation_info.csv',
+                                    cache_folder: str = 'cache',
+                                    affiliation_conservative: bool = False,
+                                    pin_colorful: bool = True,
+                                    print_citing_affiliations: bool = True,
+                                    chromedriver: str = "chromedriver-mac-arm64/chromedriver",
+                                    profile_store_path: Optional[str] = None,
+                                    profile_ttl_days: Optional[float] = 30,
+                                    geocode_cache_path: Optional[str] = None,
+                                    gazetteer_path: Optional[str] = None,
+                                    offline_geocoder_path: Optional[str] = None,
+                                    reverse_geocoder_path: Optional[str] = None,
+                                    refresh: bool = False,
+                                    resume: bool = False,
+                                    num_browsers: int = 1,
+                                    fetch_backend: str = 'http',
+                                    lean_browser: bool = False,
+                                    headless_browser: bool = False,
+                                    cluster_markers: Optional[bool] = None,
+                                    metrics_path: Optional[str] = None,
+                                    trace_path: Optional[str] = None,
+                                    interactive_captcha: bool = True,
+                                    blocked_cooldown_seconds: float = 120):
+    '''
+    Citation maps of several scholars (e.g. all members of a lab) in one run: one map per scholar in
+    `{cache_folder}/{scholar_id}/`, and one combined map of the whole group in `{cache_folder}/{group_name}/`.
+
+    All scholars share one browser pool and the same caches. A publication co-authored by several scholars is crawled once,
+    and every citing author profile and affiliation is fetched or geocoded once, however many scholars it is shared by.
+    Crawling uses the streaming pipeline. With `resume`, the run continues from `{cache_folder}/{group_name}/crawl_journal.jsonl`,
+    and the units still blocked at the end are listed in `{cache_folder}/{group_name}/crawl_report.json`.
+    See `generate_citation_map_selenium` for the other arguments.
+    '''
+    scholar_ids = list(dict.fromkeys(scholar_ids))
+    if not scholar_ids:
+        raise ValueError('`scholar_ids` must name at least one scholar.')
+    if group_name in scholar_ids:
+        raise ValueError('`group_name` %s must differ from the scholar IDs.' % group_name)
+    __start_instrumentation(metrics_path, trace_path)
+    try:
+        __load_local_geodata(gazetteer_path, offline_geocoder_path, reverse_geocoder_path)
+        browser_pool = __new_browser_pool(chromedriver, num_browsers, fetch_backend, cache_folder,
+                                          lean_browser=lean_browser, headless_browser=headless_browser)
+        profile_store, geocode_cache, snapshot_store = __open_stores(cache_folder, profile_store_path, profile_ttl_days,
+                                                                     geocode_cache_path)
+        if cache_folder is not None:
+            journal = CrawlJournal(os.path.join(cache_folder, group_name, 'crawl_journal.jsonl'), resume=resume)
+            if resume:
+                print('[INFO] Resuming from %s with %d completed units.' % (journal.journal_path, len(journal)))
+        else:
+            journal = None
+        quarantine = __start_quarantine(interactive_captcha, blocked_cooldown_seconds)
 
+        try:
+            # Step 1 - 4 at the same time, for all scholars.
+            scholar_results = stream_batch_citation_pipeline(scholar_ids, browser_pool, profile_store,
+                                                             geocode_cache=geocode_cache,
+                                                             snapshot_store=snapshot_store,
+                                                             journal=journal,
+                                                             refresh=refresh,
+                                                             affiliation_conservative=affiliation_conservative,
+                                                             quarantine=quarantine)
+        except KeyboardInterrupt:
+            if journal is not None:
+                print('\n[INFO] Interrupted. Run again with resume=True to continue from %s.' % journal.journal_path)
+            raise
+        finally:
+            print_rate_stats()
+            browser_pool.quit()
+            profile_store.close()
+            geocode_cache.close()
+            snapshot_store.close()
+            if journal is not None:
+                journal.close()
+            __finish_quarantine(quarantine, None if cache_folder is None else os.path.join(cache_folder, group_name, 'crawl_report.json'))
+
+        # Citations of papers shared by several scholars only count once in the group, as the records are deduplicated on insert.
+        group_results = [RecordStore(results.fields, results.strings) for results in scholar_results[scholar_ids[0]]]
+        for scholar_id in scholar_ids + [group_name]:
+            if scholar_id == group_name:
+                all_citing_author_paper_tuple_list, author_paper_affiliation_tuple_list, coordinates_and_info = group_results
+            else:
+                # The group is the union of the scholars, built while they are exported, so that each scholar is
+                # released once it is exported instead of the group keeping a copy of all of them.
+                all_citing_author_paper_tuple_list, author_paper_affiliation_tuple_list, coordinates_and_info = \
+                    scholar_results.pop(scholar_id)
+                for group_result, result in zip(group_results, (all_citing_author_paper_tuple_list,
+                                                                author_paper_affiliation_tuple_list, coordinates_and_info)):
+                    group_result.extend(result)
+            print('\n%s: %d citing authors and %d citing affiliations recorded.' % (
+                scholar_id, len(all_citing_author_paper_tuple_list), len(author_paper_affiliation_tuple_list)))
+            scholar_folder = os.path.join(cache_folder if cache_folder is not None else '.', scholar_id)
+            os.makedirs(scholar_folder, exist_ok=True)
+            if cache_folder is not None:
+                __save_stage_caches(scholar_folder, all_citing_author_paper_tuple_list, author_paper_affiliation_tuple_list)
+            scholar_output_path = os.path.join(scholar_folder, output_path)
+            scholar_csv_output_path = os.path.join(scholar_folder, csv_output_path)
+            if print_citing_affiliations and scholar_id == group_name:
+                print('List of all citing authors and affiliations of the group:\n')
+                __print_author_and_affiliation(author_paper_affiliation_tuple_list)
 
-    # NOTE: Step 5.2. Create the citation world map.
-    citation_map = create_map(coordinates_and_info, pin_colorful=pin_colorful)
-    citation_map.save(output_path)
-    print('\nHTML map created and saved at %s.\n' % output_path)
+            coordinates_and_info.sort()
+            export_dict_to_csv(coordinates_and_info, scholar_csv_output_path)
+            print('Citation information exported to %s.' % scholar_csv_output_path)
+            draw_and_summarize(coordinates_and_info, scholar_output_path, scholar_csv_output_path,
+                                 pin_colorful=pin_colorful, cluster_markers=cluster_markers)
+    finally:
+        # Also after an error or an interrupt, so that the metrics are written and the recording stops.
+        __write_instrumentation(metrics_path, trace_path)
 
-    num_authors, num_affiliations, num_countries = count_citation_stats(coordinates_and_info)
-    print('\nYou have been cited by %s researchers from %s affiliations and %s countries.\n' % (
-        num_authors, num_affiliations, num_countries))
-    return
+def __start_quarantine(interactive_captcha: bool, blocked_cooldown_seconds: float) -> CrawlQuarantine:
+    fetchers.interactive_captcha = interactive_captcha
+    if not interactive_captcha:
+        print('[INFO] Unattended run: blocked pages are retried after a cooldown instead of waiting for CAPTCHAs to be solved.')
+    return CrawlQuarantine(cooldown_seconds=blocked_cooldown_seconds)
 
+def __finish_quarantine(quarantine: CrawlQuarantine, report_path: Optional[str]) -> None:
+    '''
+    Print the completion report of the blocked units, and write it to `report_path`.
+    '''
+    fetchers.interactive_captcha = True
+    quarantine.print_report()
+    if report_path is not None:
+        quarantine.write_report(report_path)
+        if quarantine.pending():
+            print('[INFO] Pending units written to %s.' % report_path)
+
+def __start_instrumentation(metrics_path: Optional[str], trace_path: Optional[str]) -> None:
+    if metrics_path is not None or trace_path is not None:
+        enable_instrumentation(record_trace=trace_path is not None)
+
+def __write_instrumentation(metrics_path: Optional[str], trace_path: Optional[str]) -> None:
+    if metrics_path is None and trace_path is None:
+        return
+    try:
+        print_metrics()
+        if metrics_path is not None:
+            write_metrics(metrics_path)
+            print('[INFO] Metrics written to %s.' % metrics_path)
+        if trace_path is not None:
+            write_trace(trace_path)
+            print('[INFO] Trace written to %s.' % trace_path)
+    finally:
+        disable_instrumentation()
+
+def __load_local_geodata(gazetteer_path: Optional[str],
+                         offline_geocoder_path: Optional[str],
+                         reverse_geocoder_path: Optional[str]) -> None:
+    if gazetteer_path is not None:
+        load_gazetteer(gazetteer_path)
+    if offline_geocoder_path is not None:
+        load_offline_geocoder(offline_geocoder_path)
+    if reverse_geocoder_path is not None:
+        load_reverse_geocoder(reverse_geocoder_path)
+
+def __new_browser_pool(chromedriver: str,
+                       num_browsers: int,
+                       fetch_backend: str,
+                       cache_folder: Optional[str],
+                       lean_browser: bool = False,
+                       headless_browser: bool = False) -> BrowserPool:
+    if fetch_backend not in ('http', 'selenium'):
+        raise ValueError("`fetch_backend` must be 'http' or 'selenium', got %s." % fetch_backend)
+    if cache_folder is not None:
+        browser_profile_folder = os.path.join(cache_folder, 'browser_profiles')
+    else:
+        browser_profile_folder = None
+
+    def worker_driver(worker_idx: int):
+        return new_driver(
+            chromedriver,
+            user_data_dir=None if browser_profile_folder is None else os.path.join(browser_profile_folder, 'worker_%d' % worker_idx),
+            lean=lean_browser,
+            headless=headless_browser)
+
+    if fetch_backend == 'http':
+        # The browser of each session is only launched once that session needs it.
+        return BrowserPool(num_browsers,
+                           driver_factory=lambda worker_idx: EscalatingFetcher(lambda: worker_driver(worker_idx)))
+    return BrowserPool(num_browsers, driver_factory=worker_driver)
+
+def __open_stores(cache_folder: Optional[str],
+                  profile_store_path: Optional[str],
+                  profile_ttl_days: Optional[float],
+                  geocode_cache_path: Optional[str]) -> Tuple[AuthorProfileStore, GeocodeCache, CitationSnapshotStore]:
+    if profile_store_path is None and cache_folder is not None:
+        profile_store_path = os.path.join(cache_folder, 'author_profiles.sqlite3')
+    profile_store = AuthorProfileStore(profile_store_path or ':memory:', ttl_days=profile_ttl_days)
+    if geocode_cache_path is None and cache_folder is not None:
+        geocode_cache_path = os.path.join(cache_folder, 'geocode_cache.sqlite3')
+    geocode_cache = GeocodeCache(geocode_cache_path or ':memory:')
+    if cache_folder is not None:
+        snapshot_store = CitationSnapshotStore(os.path.join(cache_folder, 'citation_snapshots.sqlite3'))
+    else:
+        snapshot_store = CitationSnapshotStore(':memory:')
+    return profile_store, geocode_cache, snapshot_store
+
+def __save_stage_caches(output_folder: str,
+                        all_citing_author_paper_tuple_list: List[Tuple[str]],
+                        author_paper_affiliation_tuple_list: List[Tuple[str]]) -> None:
+    if len(all_citing_author_paper_tuple_list) > 0:
+        save_cache(all_citing_author_paper_tuple_list, os.path.join(output_folder, 'citing_author_papers.parquet'),
+                   'citing_author_papers')
+    if len(author_paper_affiliation_tuple_list) > 0:
+        save_cache(author_paper_affiliation_tuple_list, os.path.join(output_folder, 'author_paper_affiliations.parquet'),
+                   'author_paper_affiliations')
+    print('Saved to cache: %s.\n' % output_folder)
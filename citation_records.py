@@ -0,0 +1,358 @@
+'''
+Compact, deduplicated stores of the records the pipeline stages pass around, instead of lists of tuples.
+
+The same strings repeat across many records: a cited paper title in every citation of the paper, a citing paper title
+for each of its authors, an affiliation and its place for every citation of its authors. An `InternTable` gives every
+distinct value an integer code, and a `RecordStore` keeps its records as rows of these codes in one array, so that
+a record takes 4 bytes per field instead of a tuple object, its references and its own copies of the strings.
+
+Records are deduplicated on insert: one by one (`add`) through an open-addressing index of row numbers, also kept in
+arrays, or in batches (`extend`) by vectorized passes over the code rows. Neither needs the `list(set(...))` passes
+or a Python object per record. Batches are deduplicated together once there are as many new records as deduplicated
+ones, or when the store is next read, so that inserting record after record in batches (e.g. the citations of every
+publication) takes no index and few passes. Bulk operations drop the index, which is only rebuilt by the next `add`.
+'''
+import itertools
+import numpy as np
+import pandas as pd
+
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Fields of the records of Step 1 & 2 and of Step 3, as in `citation_artifacts.ARTIFACT_SCHEMAS`.
+CITING_AUTHOR_PAPER_FIELDS = ('citing author id', 'citing paper title', 'cited paper title')
+AUTHOR_PAPER_AFFILIATION_FIELDS = ('citing author name', 'citing paper title', 'cited paper title', 'affiliation')
+
+_EMPTY_SLOT = -1
+_MIN_INDEX_SIZE = 16
+
+
+class _CodeDict(dict):
+    '''
+    Value -> code, which gives the next code to a value it does not have yet, so that lookups stay in C.
+    '''
+
+    __slots__ = ('values',)
+
+    def __init__(self, values: List[Any]):
+        super().__init__()
+        self.values = values
+
+    def __missing__(self, value: Any) -> int:
+        code = self[value] = len(self.values)
+        self.values.append(value)
+        return code
+
+
+class InternTable(object):
+    '''
+    Distinct values (strings, or any hashable value) and their integer codes, in order of first appearance.
+    '''
+
+    __slots__ = ('_codes', 'values', '_ranks')
+
+    def __init__(self):
+        self.values = []
+        self._codes = _CodeDict(self.values)
+        self._ranks = None
+
+    def intern(self, value: Any) -> int:
+        return self._codes[value]
+
+    def intern_all(self, values: Iterable[Any]) -> Tuple[int, ...]:
+        return tuple(map(self._codes.__getitem__, values))
+
+    def code(self, value: Any) -> Optional[int]:
+        '''
+        Code of `value`, or None if it was never interned.
+        '''
+        return self._codes.get(value)
+
+    def ranks(self) -> np.ndarray:
+        '''
+        Rank of every code in the sorted order of the values, kept until new values are interned.
+        Values of different types (e.g. '' and a latitude) are not compared, unlike in a tuple sort.
+        '''
+        if self._ranks is None or len(self._ranks) != len(self.values):
+            values = self.values
+            # The codes of every type of values, each sorted by value, and the types by name.
+            type_codes = {}
+            for code, value in enumerate(values):
+                type_codes.setdefault(value.__class__.__name__, []).append(code)
+            self._ranks = np.empty(len(values), dtype=np.int32)
+            rank = 0
+            for type_name in sorted(type_codes):
+                codes = sorted(type_codes.pop(type_name), key=values.__getitem__)
+                self._ranks[codes] = np.arange(rank, rank + len(codes), dtype=np.int32)
+                rank += len(codes)
+        return self._ranks
+
+    def __getitem__(self, code: int) -> Any:
+        return self.values[code]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class RecordStore(object):
+    '''
+    Deduplicated records with the fields `fields`, in order of first insertion, with their values interned in `strings`.
+
+    It reads like the list of unique tuples it replaces: `len`, iteration, indexing and `in` work on tuples of values.
+    Pass the same `strings` to the stores of one run, so that they share their values and records are copied
+    between them as codes.
+    '''
+
+    __slots__ = ('fields', 'strings', '_width', '_codes', '_num_unique', '_hashes', '_index')
+
+    def __init__(self, fields: Sequence[str], strings: Optional[InternTable] = None, records: Iterable[Tuple] = ()):
+        self.fields = tuple(fields)
+        self._width = len(self.fields)
+        self.strings = strings if strings is not None else InternTable()
+        # The codes of all records, one row of `len(fields)` codes after the other.
+        self._codes = array('i')
+        # Number of rows up to which `_codes` is deduplicated. The rows after it were inserted by `extend` since.
+        self._num_unique = 0
+        # Hash of every row, and the row numbers by hash slot. Only kept while records are added one by one.
+        self._hashes, self._index = None, None
+        self.extend(records)
+
+    def add(self, record: Tuple) -> bool:
+        '''
+        Insert a record unless the store already has it. Returns whether it was inserted.
+        '''
+        codes = self.strings.intern_all(record)
+        if self._index is None:
+            self._flush()
+            self._build_index()
+        # `_find`, inlined: this runs once per record of a crawl.
+        index, hashes, all_codes, width = self._index, self._hashes, self._codes, self._width
+        record_hash = hash(codes)
+        mask = len(index) - 1
+        slot = record_hash & mask
+        row_codes = None
+        while True:
+            row = index[slot]
+            if row == _EMPTY_SLOT:
+                break
+            if hashes[row] == record_hash:
+                if row_codes is None:
+                    row_codes = array('i', codes)
+                if all_codes[row * width:(row + 1) * width] == row_codes:
+                    return False
+            slot = (slot + 1) & mask
+        index[slot] = len(hashes)
+        hashes.append(record_hash)
+        all_codes.extend(codes)
+        self._num_unique += 1
+        # Keep the index at most half full, so that probe sequences stay short.
+        if 2 * len(hashes) > mask:
+            self._build_index(2 * len(index))
+        return True
+
+    def extend(self, records: Iterable[Tuple]) -> None:
+        '''
+        Insert a batch of records, of which only the first of equal records (including those already in the store) is kept.
+        '''
+        self.compact()
+        if isinstance(records, RecordStore) and records.strings is self.strings and records.fields == self.fields:
+            # Same values table: copy the codes as they are.
+            self._codes.extend(records._codes)
+        else:
+            self._codes.extend(self.strings.intern_all(itertools.chain.from_iterable(records)))
+        # Deduplicating once the new rows are as many as the deduplicated ones makes every row take part in few passes.
+        if len(self._codes) > 2 * self._num_unique * self._width:
+            self._deduplicate()
+
+    def join(self, field: str, lookup: Dict[Any, Optional[Tuple]], fields: Sequence[str]) -> 'RecordStore':
+        '''
+        New store of every record followed by the values `lookup` gives for its `field`, which name the added `fields`.
+        Records whose `field` is not in `lookup` (or maps to None) are left out.
+        '''
+        joined = RecordStore(self.fields + tuple(fields), self.strings)
+        if len(self) == 0:
+            return joined
+        codes = self._matrix()
+        used_codes, key_rows = np.unique(codes[:, self.fields.index(field)], return_inverse=True)
+        found = np.zeros(len(used_codes), dtype=bool)
+        joined_codes = np.zeros((len(used_codes), len(fields)), dtype=np.int32)
+        for key_idx, code in enumerate(used_codes):
+            joined_values = lookup.get(self.strings[code])
+            if joined_values is not None:
+                found[key_idx] = True
+                joined_codes[key_idx] = self.strings.intern_all(joined_values)
+        mask = found[key_rows]
+        # The records are unique, so the joined ones are as well. They are written into the array of the joined store.
+        num_joined = int(mask.sum())
+        joined._codes = array('i', [0]) * (num_joined * joined._width)
+        joined_matrix = np.frombuffer(joined._codes, dtype=np.int32).reshape(-1, joined._width)
+        joined_matrix[:, :self._width] = codes[mask]
+        joined_matrix[:, self._width:] = joined_codes[key_rows[mask]]
+        joined._num_unique = num_joined
+        return joined
+
+    def sort(self) -> None:
+        '''
+        Reorder the records as `sorted` would order their tuples, by the ranks of their codes.
+        '''
+        if len(self) < 2:
+            return
+        # A view of `_codes`, which the sorted rows are written back to.
+        codes = self._matrix()
+        codes[:] = codes[_row_order(codes, len(self.strings), self.strings.ranks())]
+        self.compact()
+
+    def compact(self) -> None:
+        '''
+        Drop the index of `add`, e.g. once a stage is done adding records. The next `add` rebuilds it.
+        '''
+        self._hashes, self._index = None, None
+
+    def to_frame(self) -> pd.DataFrame:
+        '''
+        The records as a DataFrame with one column per field. Text fields are built as categoricals from the codes,
+        without decoding every row, and fields of numbers (e.g. latitude) as numbers.
+        '''
+        codes = self._matrix()
+        data = {}
+        for field_idx, field in enumerate(self.fields):
+            used_codes, rows = np.unique(codes[:, field_idx], return_inverse=True)
+            used_values = [self.strings[code] for code in used_codes]
+            if any(isinstance(value, (int, float)) for value in used_values):
+                data[field] = pd.to_numeric(pd.Series(np.array(used_values, dtype=object)[rows]), errors='coerce')
+                continue
+            # Missing values (None) are not categories. Their rows get the code -1.
+            missing = np.array([value is None for value in used_values], dtype=bool)
+            category_codes = np.cumsum(~missing) - 1
+            category_codes[missing] = -1
+            data[field] = pd.Categorical.from_codes(category_codes[rows],
+                                                    categories=[value for value in used_values if value is not None])
+        return pd.DataFrame(data, columns=list(self.fields))
+
+    def nbytes(self) -> int:
+        '''
+        Memory taken by the records and their index, without the values table.
+        '''
+        return sum(codes.itemsize * len(codes) for codes in (self._codes, self._hashes, self._index) if codes is not None)
+
+    def __len__(self) -> int:
+        self._flush()
+        return len(self._codes) // self._width
+
+    def __iter__(self) -> Iterator[Tuple]:
+        self._flush()
+        values = iter(map(self.strings.values.__getitem__, self._codes))
+        return zip(*[values] * self._width)
+
+    def __getitem__(self, row: int) -> Tuple:
+        self._flush()
+        width = self._width
+        return tuple(map(self.strings.values.__getitem__, self._codes[row * width:(row + 1) * width]))
+
+    def __contains__(self, record: Tuple) -> bool:
+        codes = tuple(map(self.strings.code, record))
+        if None in codes:
+            return False
+        if self._index is None:
+            self._flush()
+            self._build_index()
+        return self._find(codes, hash(codes))[1] != _EMPTY_SLOT
+
+    def __repr__(self) -> str:
+        return 'RecordStore(%s, %d records)' % (', '.join(self.fields), len(self))
+
+    def _matrix(self) -> np.ndarray:
+        self._flush()
+        return np.frombuffer(self._codes, dtype=np.int32).reshape(-1, self._width)
+
+    def _find(self, codes: Tuple[int, ...], record_hash: int) -> Tuple[int, int]:
+        '''
+        Slot of the record in the index, and its row (or `_EMPTY_SLOT` with the free slot where it would go).
+        '''
+        index, hashes, all_codes, width = self._index, self._hashes, self._codes, self._width
+        mask = len(index) - 1
+        slot = record_hash & mask
+        row_codes = None
+        while True:
+            row = index[slot]
+            if row == _EMPTY_SLOT:
+                return slot, row
+            if hashes[row] == record_hash:
+                if row_codes is None:
+                    row_codes = array('i', codes)
+                if all_codes[row * width:(row + 1) * width] == row_codes:
+                    return slot, row
+            slot = (slot + 1) & mask
+
+    def _build_index(self, size: Optional[int] = None) -> None:
+        if self._hashes is None:
+            rows = iter(self._codes)
+            self._hashes = array('q', map(hash, zip(*[rows] * self._width)))
+        if size is None:
+            size = _MIN_INDEX_SIZE
+            while size < 2 * len(self._hashes) + 1:
+                size *= 2
+        index = array('i', [_EMPTY_SLOT]) * size
+        mask = size - 1
+        for row, record_hash in enumerate(self._hashes):
+            slot = record_hash & mask
+            while index[slot] != _EMPTY_SLOT:
+                slot = (slot + 1) & mask
+            index[slot] = row
+        self._index = index
+
+    def _flush(self) -> None:
+        '''
+        Deduplicate the rows inserted by `extend` since the last time.
+        '''
+        if len(self._codes) > self._num_unique * self._width:
+            self._deduplicate()
+
+    def _deduplicate(self) -> None:
+        '''
+        Keep the first of every set of equal records.
+        '''
+        codes = np.frombuffer(self._codes, dtype=np.int32).reshape(-1, self._width)
+        first_rows = _first_rows(codes, len(self.strings))
+        num_unique = len(first_rows)
+        if num_unique < len(codes):
+            # The kept rows move up in place, and the rows after them are cut off once no view of the array is left.
+            codes[:num_unique] = codes[first_rows]
+        del codes
+        del self._codes[num_unique * self._width:]
+        self._num_unique = num_unique
+        self.compact()
+
+
+def _first_rows(codes: np.ndarray, num_values: int) -> np.ndarray:
+    '''
+    Row numbers of the first of every set of equal rows of `codes`, in order.
+    In the stable order of the rows, a row is the first of its set if it differs from the row before it.
+    '''
+    if len(codes) < 2:
+        return np.arange(len(codes))
+    order = _row_order(codes, num_values)
+    first = np.zeros(len(order), dtype=bool)
+    first[0] = True
+    for column in codes.T:
+        sorted_column = column[order]
+        first[1:] |= sorted_column[1:] != sorted_column[:-1]
+    return np.sort(order[first])
+
+def _row_order(codes: np.ndarray, num_values: int, ranks: Optional[np.ndarray] = None) -> np.ndarray:
+    '''
+    Stable order of the rows of `codes` by their codes (or the `ranks` of their codes), first column first.
+    The codes of as many columns as fit are packed into one 64-bit key, and the keys are sorted from the last one,
+    so that no copy of all rows is made.
+    '''
+    bits = max(1, (num_values - 1).bit_length())
+    columns_per_key = max(1, 63 // bits)
+    order = np.arange(len(codes))
+    for first_column in reversed(range(0, codes.shape[1], columns_per_key)):
+        keys = np.zeros(len(order), dtype=np.int64)
+        for column in range(first_column, min(first_column + columns_per_key, codes.shape[1])):
+            column_keys = codes[order, column] if ranks is None else ranks[codes[order, column]]
+            keys <<= bits
+            keys |= column_keys
+        order = order[np.argsort(keys, kind='stable')]
+    return order
@@ -0,0 +1,155 @@
+'''
+Step 5 on its own: the citation table on disk, the citation world map, the summaries and the stats.
+
+This module does not import the crawler (Selenium, the page parsers, the fetchers, the caches) nor the geocoders,
+and folium is only imported once a map is drawn, so that re-rendering the map of a previous run (e.g. after editing
+its csv file) starts in a fraction of a second. `render_citation_map` is its entry point.
+'''
+import os
+import pandas as pd
+import random
+
+from typing import List, Optional, Tuple
+
+from citation_artifacts import load_citation_table, save_citation_table
+from citation_table import CitationRows, affiliation_pins, citation_frame, citation_stats, cited_paper_summary, country_summary, \
+    institution_summary
+from instrumentation import span, timed
+
+PIN_COLORS = ['red', 'blue', 'green', 'purple', 'orange', 'darkred',
+              'lightred', 'beige', 'darkblue', 'darkgreen', 'cadetblue',
+              'darkpurple', 'pink', 'lightblue', 'lightgreen',
+              'gray', 'black', 'lightgray']
+# Maps with more pins than this are clustered by default.
+CLUSTER_MIN_PINS = 1000
+# Creates the marker of a row [lat, lon, color, popup] in the browser. Its popup is only built when it is opened.
+CLUSTER_MARKER_CALLBACK = '''function (row) {
+    var options = {};
+    if (row[2] !== null) {
+        options.icon = L.AwesomeMarkers.icon({icon: 'info-sign', prefix: 'glyphicon', markerColor: row[2]});
+    }
+    var marker = L.marker(new L.LatLng(row[0], row[1]), options);
+    marker.bindPopup(function () { return row[3]; });
+    return marker;
+}'''
+
+
+@timed('stage.export csv')
+def export_dict_to_csv(coordinates_and_info: CitationRows, csv_output_path: str) -> None:
+    '''
+    Step 5.1: Export csv file recording citation information.
+    The typed table is also saved as a Parquet artifact next to it (see `citation_table_path`), which is faster to read back.
+    '''
+    citation_df = citation_frame(coordinates_and_info)
+    citation_df.to_csv(csv_output_path, index=False)
+    save_citation_table(citation_df, citation_table_path(csv_output_path))
+    return
+
+def read_csv_to_dict(csv_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    '''
+    Step 5.1: Read csv file recording citation information.
+    Only relevant if `read_from_csv` is True.
+    The Parquet artifact next to the csv file is read instead if it exists and the csv file was not edited after it.
+    `columns`: Only read these columns.
+    '''
+    table_path = citation_table_path(csv_path)
+    if os.path.exists(table_path) and (not os.path.exists(csv_path) or os.path.getmtime(table_path) >= os.path.getmtime(csv_path)):
+        return load_citation_table(table_path, columns=columns)
+    return load_citation_table(csv_path, columns=columns)
+
+def citation_table_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+@timed('stage.export summaries')
+def export_citation_summaries(coordinates_and_info: CitationRows, output_folder: str) -> List[str]:
+    '''
+    Step 5.3: Export the number of citations, citing authors, etc. per country, per institution and per cited paper.
+    '''
+    citation_df = citation_frame(coordinates_and_info)
+    summary_paths = []
+    for file_name, summary in [('citations_by_country.csv', country_summary),
+                               ('citations_by_institution.csv', institution_summary),
+                               ('citations_by_cited_paper.csv', cited_paper_summary)]:
+        summary_path = os.path.join(output_folder, file_name)
+        summary(citation_df).to_csv(summary_path, index=False)
+        summary_paths.append(summary_path)
+    return summary_paths
+
+def create_map(coordinates_and_info: CitationRows, pin_colorful: bool = True, cluster_markers: Optional[bool] = None):
+    '''
+    Step 5.2: Create the Citation World Map.
+
+    For authors under the same affiliations, they will be displayed in the same pin.
+    `cluster_markers`: Embed all pins as one data array, from which the browser creates the markers, clusters them
+        and builds every popup only when it is opened. This keeps the HTML small for thousands of pins.
+        None means clustering only when there are more than `CLUSTER_MIN_PINS` pins.
+    '''
+    import folium
+    from folium.plugins import FastMarkerCluster
+
+    citation_map = folium.Map(location=[20, 0], zoom_start=2)
+
+    pins = []
+    for affiliation_name, lat, lon, author_names in affiliation_pins(citation_frame(coordinates_and_info)).itertuples(index=False):
+        color = random.choice(PIN_COLORS) if pin_colorful else None
+        pins.append((lat, lon, color, '%s (%s)' % (affiliation_name, author_names)))
+
+    if cluster_markers is None:
+        cluster_markers = len(pins) > CLUSTER_MIN_PINS
+    if cluster_markers:
+        # Rows of [lat, lon, color, popup], with the same popup HTML as `folium.Marker`.
+        FastMarkerCluster([[lat, lon, color, popup] for lat, lon, color, popup in pins],
+                          callback=CLUSTER_MARKER_CALLBACK).add_to(citation_map)
+    else:
+        for lat, lon, color, popup in pins:
+            icon = folium.Icon(color=color) if color is not None else None
+            folium.Marker([lat, lon], popup=popup, icon=icon).add_to(citation_map)
+    return citation_map
+
+def count_citation_stats(coordinates_and_info: CitationRows) -> Tuple[int, int, int]:
+    '''
+    Count the number of citing authors, affiliations and countries.
+    '''
+    return citation_stats(citation_frame(coordinates_and_info))
+
+def draw_and_summarize(coordinates_and_info: CitationRows,
+                       output_path: Optional[str],
+                       csv_output_path: str,
+                       pin_colorful: bool = True,
+                       cluster_markers: Optional[bool] = None) -> Tuple[int, int, int]:
+    '''
+    Step 5.2 & 5.3: Save the map to `output_path` (unless it is None), export the summaries next to `csv_output_path`
+    and print the number of citing authors, affiliations and countries, which are returned.
+    '''
+    citation_df = citation_frame(coordinates_and_info)
+
+    # NOTE: Step 5.2. Create the citation world map.
+    if output_path is not None:
+        with span('render.create map'):
+            citation_map = create_map(citation_df, pin_colorful=pin_colorful, cluster_markers=cluster_markers)
+        with span('render.save map'):
+            citation_map.save(output_path)
+        print('\nHTML map created and saved at %s.\n' % output_path)
+
+    # NOTE: Step 5.3. Export the citations per country, institution and cited paper.
+    summary_paths = export_citation_summaries(citation_df, os.path.dirname(os.path.abspath(csv_output_path)))
+    print('Citation summaries exported to %s.' % ', '.join(summary_paths))
+
+    num_authors, num_affiliations, num_countries = count_citation_stats(citation_df)
+    print('\nYou have been cited by %s researchers from %s affiliations and %s countries.\n' % (
+        num_authors, num_affiliations, num_countries))
+    return num_authors, num_affiliations, num_countries
+
+def render_citation_map(csv_path: str = 'citation_info.csv',
+                        output_path: Optional[str] = 'citation_map.html',
+                        pin_colorful: bool = True,
+                        cluster_markers: Optional[bool] = None) -> Tuple[int, int, int]:
+    '''
+    Draw the map and export the summaries of the citation table `csv_path` of a previous run, without launching
+    a browser or importing the crawler. Edits to the csv file are taken into account.
+    `output_path`: None only exports the summaries and counts the stats, without importing folium.
+    Returns the number of citing authors, affiliations and countries.
+    '''
+    citation_df = read_csv_to_dict(csv_path)
+    print('[INFO] Read %d citations from %s.' % (len(citation_df), csv_path))
+    return draw_and_summarize(citation_df, output_path, csv_path, pin_colorful=pin_colorful, cluster_markers=cluster_markers)
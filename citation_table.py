@@ -0,0 +1,124 @@
+'''
+Columnar table of the geocoded citations, and the statistics and aggregates computed from it.
+
+After geocoding, every citation is one row of `CITATION_COLUMNS`. The text columns are stored as categoricals
+(authors, affiliations and places repeat a lot) and the coordinates as floats, with NaN for a missing location,
+so that grouping, validity masks and unique counts run vectorized over the columns instead of looping over tuples.
+'''
+import numpy as np
+import pandas as pd
+
+from typing import List, Tuple, Union
+
+from citation_records import RecordStore
+from scholar_constants import NO_AUTHOR_FOUND_STR
+
+CITATION_COLUMNS = ['citing author name', 'citing paper title', 'cited paper title',
+                    'affiliation', 'latitude', 'longitude',
+                    'county', 'city', 'state', 'country']
+TEXT_COLUMNS = [column for column in CITATION_COLUMNS if column not in ('latitude', 'longitude')]
+# The columns needed to draw the map and to count the citation stats, e.g. to only read these from a stored table.
+MAP_COLUMNS = ['citing author name', 'affiliation', 'latitude', 'longitude']
+STATS_COLUMNS = ['citing author name', 'affiliation', 'country']
+
+CitationRows = Union[pd.DataFrame, RecordStore, List[Tuple]]
+
+
+def citation_frame(coordinates_and_info: CitationRows) -> pd.DataFrame:
+    '''
+    Typed citation table from a list of 10-tuples, a `RecordStore` of them, or a DataFrame with (some of) the `CITATION_COLUMNS`.
+    Coordinates that are missing or not numbers (e.g. '') become NaN.
+    '''
+    if isinstance(coordinates_and_info, pd.DataFrame):
+        citation_df = coordinates_and_info.reset_index(drop=True)
+    elif isinstance(coordinates_and_info, RecordStore):
+        citation_df = coordinates_and_info.to_frame()
+    else:
+        citation_df = pd.DataFrame(coordinates_and_info, columns=CITATION_COLUMNS)
+    for column in citation_df.columns:
+        if column in ('latitude', 'longitude'):
+            citation_df[column] = pd.to_numeric(citation_df[column], errors='coerce').astype('float64')
+        else:
+            citation_df[column] = citation_df[column].astype('category')
+    return citation_df
+
+def author_mask(citation_df: pd.DataFrame) -> np.ndarray:
+    '''
+    Rows with a citing author, i.e. not the placeholder of papers without any.
+    '''
+    return (citation_df['affiliation'] != NO_AUTHOR_FOUND_STR).to_numpy()
+
+def located_mask(citation_df: pd.DataFrame) -> np.ndarray:
+    return (citation_df['latitude'].notna() & citation_df['longitude'].notna()).to_numpy()
+
+def citation_stats(citation_df: pd.DataFrame) -> Tuple[int, int, int]:
+    '''
+    Number of distinct citing authors, affiliations and countries.
+    '''
+    cited_df = citation_df[author_mask(citation_df)]
+    return tuple(int(cited_df[column].nunique(dropna=False)) for column in ('citing author name', 'affiliation', 'country'))
+
+def affiliation_pins(citation_df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    One row per affiliation where all its citations are located, in order of first appearance:
+    'affiliation', 'latitude', 'longitude' (of its last citation) and 'authors' (the citing author names joined by ' & ').
+    '''
+    cited_df = citation_df[author_mask(citation_df)]
+    # Number the affiliations in order of first appearance. A missing affiliation is one of them, labelled by its NaN.
+    codes, affiliations = pd.factorize(cited_df['affiliation'], use_na_sentinel=False)
+    affiliations = np.asarray(affiliations, dtype=object)
+    num_affiliations = len(affiliations)
+    all_located = np.bincount(codes, weights=~located_mask(cited_df), minlength=num_affiliations) == 0
+
+    # The citations of every affiliation are contiguous and in their original order once stably sorted by affiliation.
+    order = np.argsort(codes, kind='stable')
+    group_sizes = np.bincount(codes, minlength=num_affiliations)
+    group_ends = np.cumsum(group_sizes)
+    group_starts = group_ends - group_sizes
+    last_rows = order[group_ends - 1]
+    author_codes, author_names = pd.factorize(cited_df['citing author name'], use_na_sentinel=False)
+    author_names = np.asarray(author_names, dtype=object)[author_codes[order]]
+    located_affiliations = np.flatnonzero(all_located)
+    return pd.DataFrame({'affiliation': affiliations[located_affiliations],
+                         'latitude': cited_df['latitude'].to_numpy()[last_rows[located_affiliations]],
+                         'longitude': cited_df['longitude'].to_numpy()[last_rows[located_affiliations]],
+                         'authors': [' & '.join(author_names[group_starts[i]:group_ends[i]]) for i in located_affiliations]})
+
+def country_summary(citation_df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Per country: number of citations, distinct citing authors, affiliations, citing papers and cited papers.
+    '''
+    return _summary(citation_df, ['country'],
+                    {'citing authors': 'citing author name', 'affiliations': 'affiliation',
+                     'citing papers': 'citing paper title', 'cited papers': 'cited paper title'})
+
+def institution_summary(citation_df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Per affiliation (with its place): number of citations, distinct citing authors, citing papers and cited papers.
+    '''
+    return _summary(citation_df, ['affiliation'],
+                    {'citing authors': 'citing author name', 'citing papers': 'citing paper title',
+                     'cited papers': 'cited paper title'},
+                    place_columns=['city', 'state', 'country', 'latitude', 'longitude'])
+
+def cited_paper_summary(citation_df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Per cited paper: number of citations, distinct citing papers, citing authors, affiliations and countries.
+    '''
+    return _summary(citation_df, ['cited paper title'],
+                    {'citing papers': 'citing paper title', 'citing authors': 'citing author name',
+                     'affiliations': 'affiliation', 'countries': 'country'})
+
+def _summary(citation_df: pd.DataFrame, keys: List[str], distinct_counts: dict, place_columns: List[str] = ()) -> pd.DataFrame:
+    '''
+    Number of citations and of distinct values of `distinct_counts` per group of `keys`,
+    with the `place_columns` of the first citation of each group.
+    '''
+    cited_df = citation_df[author_mask(citation_df)]
+    grouped = cited_df.groupby(keys, observed=True, dropna=False, sort=False)
+    summary = grouped.size().to_frame('citations')
+    if place_columns:
+        summary = summary.join(cited_df.drop_duplicates(keys).set_index(keys)[list(place_columns)])
+    for name, column in distinct_counts.items():
+        summary[name] = grouped[column].nunique()
+    return summary.sort_values('citations', ascending=False, kind='stable').reset_index()
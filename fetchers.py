@@ -0,0 +1,261 @@
+import requests
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from typing import Any, Callable, Optional
+
+from instrumentation import add_bytes, count, enabled as instrumentation_enabled, event, span
+from rate_control import pace, report_blocked, report_ok
+
+# User agent of the HTTP client until a browser session is available to copy it from.
+DEFAULT_USER_AGENT = ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36')
+# Markers of the pages Google Scholar serves instead of the requested page.
+CAPTCHA_MARKERS = ('CAPTCHA', 'not a robot', 'gs_captcha_f', 'unusual traffic')
+BLOCK_MARKERS = ('Access Denied',)
+BLOCK_STATUS_CODES = (403, 429, 503)
+
+# Only one browser session at a time may prompt the user to solve a CAPTCHA.
+captcha_lock = threading.Lock()
+# Whether to wait for the user to solve a CAPTCHA. If False, the blocked page is deferred and retried later instead.
+interactive_captcha = True
+# Whether the current `fetch_page` call of this thread ran into a CAPTCHA or block page, even if it was solved since.
+_fetch_state = threading.local()
+
+
+class BlockedPageError(Exception):
+    '''
+    Raised by `fetch_page` when Google Scholar answers with a CAPTCHA or block page instead of the requested page.
+    '''
+
+    def __init__(self, url: str):
+        super().__init__('Blocked on %s' % url)
+        self.url = url
+
+
+def wait_for_captcha(driver):
+    '''
+    Wait for user to solve CAPTCHA if present.
+    '''
+    if not interactive_captcha:
+        return
+    page_source = driver.page_source
+    if 'CAPTCHA' in page_source or 'not a robot' in page_source:
+        _fetch_state.blocked = True
+        event('captcha')
+        with captcha_lock, span('wait.captcha'):
+            print("\n" + "="*60)
+            print("CAPTCHA DETECTED! Please solve it in the browser.")
+            print("Press Enter here after you've solved it...")
+            print("="*60)
+            input()  # Wait for user to press Enter
+            time.sleep(1)
+    return
+
+def wait_until_ready(driver, ready_selector: str, timeout: float = 10) -> bool:
+    '''
+    Wait until an element matching the CSS selector `ready_selector` exists, or the page turns out to be a block page.
+    Returns False on timeout.
+    '''
+    try:
+        with span('wait.ready'):
+            WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+                lambda d: d.find_elements(By.CSS_SELECTOR, ready_selector) or looks_blocked(d.page_source))
+        return True
+    except TimeoutException:
+        event('wait.ready timeout')
+        return False
+
+def looks_blocked(page_source: str) -> bool:
+    '''
+    Whether a page is a CAPTCHA or block page rather than the requested content.
+    '''
+    return any(marker in page_source for marker in CAPTCHA_MARKERS + BLOCK_MARKERS)
+
+def page_kind(url: str) -> str:
+    '''
+    Type of a Google Scholar page from its URL, to break down the request metrics.
+    '''
+    if 'cites=' in url:
+        return 'citation page'
+    if 'view_op=list_works' in url:
+        return 'publication list'
+    if 'view_op=view_org' in url:
+        return 'organization page'
+    if 'user=' in url:
+        return 'author profile'
+    return 'other page'
+
+
+class PageFetcher(object):
+    '''
+    Interface of everything that can load a Google Scholar page and return its HTML.
+    `max_concurrency` is the number of pages a fetcher can load at the same time from different threads.
+    '''
+
+    max_concurrency = 1
+
+    def fetch(self, url: str, ready_selector: Optional[str] = None) -> str:
+        '''
+        Load `url` and return the page source.
+        A browser waits until an element matching the CSS selector `ready_selector` exists. Other fetchers ignore it.
+        '''
+        raise NotImplementedError
+
+    def close(self) -> None:
+        return
+
+    def quit(self) -> None:
+        '''
+        Same as `close`, so that a fetcher can stand in for a Selenium driver.
+        '''
+        self.close()
+
+
+class SeleniumFetcher(PageFetcher):
+    '''
+    Load pages in a Selenium browser session. The user can solve CAPTCHAs in its window.
+    '''
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def fetch(self, url: str, ready_selector: Optional[str] = None) -> str:
+        with span('browser.get'):
+            self.driver.get(url)
+        if ready_selector is not None:
+            wait_until_ready(self.driver, ready_selector)
+        wait_for_captcha(self.driver)
+        return self.driver.page_source
+
+    def close(self) -> None:
+        self.driver.quit()
+
+
+class HttpFetcher(PageFetcher):
+    '''
+    Load pages with a pooled, keep-alive HTTP client.
+    Cookies and user agent can be copied from a browser session, so that both are seen as the same client.
+    '''
+
+    def __init__(self, pool_maxsize: int = 4, timeout: float = 30):
+        self.max_concurrency = pool_maxsize
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'User-Agent': DEFAULT_USER_AGENT, 'Accept-Language': 'en-US,en;q=0.9'})
+        self.last_status_code = None
+
+    def fetch(self, url: str, ready_selector: Optional[str] = None) -> str:
+        response = self.get(url)
+        self.last_status_code = response.status_code
+        return response.text
+
+    def get(self, url: str) -> requests.Response:
+        with span('http.get'):
+            return self.session.get(url, timeout=self.timeout)
+
+    def copy_browser_session(self, driver) -> None:
+        '''
+        Use the cookies and the user agent of a browser session for the following requests.
+        '''
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        self.session.headers['User-Agent'] = driver.execute_script('return navigator.userAgent')
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class EscalatingFetcher(PageFetcher):
+    '''
+    Load pages over HTTP, and only escalate to a browser session when the response looks like a CAPTCHA or block page.
+
+    The browser is created by `driver_factory` the first time it is needed.
+    After every escalation, its cookies (e.g. from a solved CAPTCHA) are copied back to the HTTP client.
+    HTTP requests can run concurrently, while escalations take turns on the one browser.
+    '''
+
+    def __init__(self, driver_factory: Callable[[], Any], http_fetcher: Optional[HttpFetcher] = None):
+        self.driver_factory = driver_factory
+        self.http_fetcher = http_fetcher if http_fetcher is not None else HttpFetcher()
+        self.max_concurrency = self.http_fetcher.max_concurrency
+        self.num_http_pages, self.num_browser_pages = 0, 0
+        self._driver = None
+        self._lock = threading.Lock()
+
+    @property
+    def driver(self):
+        with self._lock:
+            if self._driver is None:
+                self._driver = self.driver_factory()
+            return self._driver
+
+    def fetch(self, url: str, ready_selector: Optional[str] = None) -> str:
+        try:
+            response = self.http_fetcher.get(url)
+            if not looks_blocked(response.text) and response.status_code not in BLOCK_STATUS_CODES:
+                with self._lock:
+                    self.num_http_pages += 1
+                return response.text
+            _fetch_state.blocked = True
+        except requests.RequestException as e:
+            print('[WARNING!] HTTP request to %s failed (%s). Loading it in the browser.' % (url, e))
+
+        count('requests.escalated to browser')
+        driver = self.driver
+        with self._lock:
+            page_source = SeleniumFetcher(driver).fetch(url, ready_selector=ready_selector)
+            self.num_browser_pages += 1
+            self.http_fetcher.copy_browser_session(driver)
+        return page_source
+
+    def close(self) -> None:
+        self.http_fetcher.close()
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+
+def max_concurrency(driver_or_fetcher) -> int:
+    '''
+    Number of pages that can be loaded at the same time with a `PageFetcher` or a plain Selenium driver.
+    '''
+    if isinstance(driver_or_fetcher, PageFetcher):
+        return driver_or_fetcher.max_concurrency
+    return 1
+
+def fetch_page(url: str, driver_or_fetcher, ready_selector: Optional[str] = None) -> str:
+    '''
+    Wait for the shared rate limit, then load `url` with a `PageFetcher` or a plain Selenium driver.
+    The outcome is reported to the rate controller, which slows down on block pages and speeds up on clean ones.
+    A page load that ran into a block page is reported once, even if the block page was then solved or escalated.
+    Raises `BlockedPageError` if the page is still a CAPTCHA or block page.
+    '''
+    kind = page_kind(url)
+    _fetch_state.blocked = False
+    with span('wait.pace'):
+        pace()  # Shared delay between requests to reduce risk of being blocked.
+    with span('fetch.' + kind, url=url):
+        if isinstance(driver_or_fetcher, PageFetcher):
+            page_source = driver_or_fetcher.fetch(url, ready_selector=ready_selector)
+        else:
+            page_source = SeleniumFetcher(driver_or_fetcher).fetch(url, ready_selector=ready_selector)
+    count('requests.' + kind)
+    if instrumentation_enabled():
+        add_bytes('fetched.' + kind, len(page_source.encode()))
+    still_blocked = looks_blocked(page_source)
+    if still_blocked or _fetch_state.blocked:
+        report_blocked()
+    else:
+        report_ok()
+    if still_blocked:
+        event('blocked', url=url)
+        raise BlockedPageError(url)
+    return page_source
@@ -0,0 +1,164 @@
+'''
+Matching of affiliation strings against a gazetteer of known institutions and invalid (blocklisted) terms.
+
+Both are found as substrings of the lowercased affiliation, in a single pass over the string with an Aho-Corasick automaton,
+so the time per affiliation does not grow with the size of the gazetteer.
+When several institutions match, the one listed first in the gazetteer wins.
+'''
+import csv
+import json
+import os
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (county, city, state, country, latitude, longitude), the same order as `KNOWN_AFFILIATION_DICT`.
+Location = Tuple[str, str, str, str, float, float]
+
+GAZETTEER_CSV_COLUMNS = ['name', 'county', 'city', 'state', 'country', 'latitude', 'longitude', 'kind']
+NO_MATCH = -1
+
+
+class AhoCorasick(object):
+    '''
+    Multi-pattern substring matcher.
+    Every node stores the smallest index of the patterns ending there (including through its failure links),
+    and whether any pattern in `flagged` ends there, so that a scan only needs one lookup per character.
+    '''
+
+    def __init__(self, patterns: List[str], flagged: Iterable[str] = ()):
+        flagged = set(flagged)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._best = [NO_MATCH]
+        self._flag = [False]
+
+        for pattern_idx, pattern in enumerate(list(patterns) + sorted(flagged - set(patterns))):
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._best.append(NO_MATCH)
+                    self._flag.append(False)
+                node = next_node
+            if pattern_idx < len(patterns) and self._best[node] == NO_MATCH:
+                self._best[node] = pattern_idx
+            if pattern in flagged:
+                self._flag[node] = True
+
+        # Breadth-first, so the failure target of a node is complete before the node itself.
+        self._fail = [0] * len(self._goto)
+        frontier = list(self._goto[0].values())
+        while frontier:
+            next_frontier = []
+            for node in frontier:
+                for char, child in self._goto[node].items():
+                    fail = self._fail[node]
+                    while fail and char not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    target = self._goto[fail].get(char, 0)
+                    self._fail[child] = target if target != child else 0
+                    target = self._fail[child]
+                    if self._best[target] != NO_MATCH and (self._best[child] == NO_MATCH or self._best[target] < self._best[child]):
+                        self._best[child] = self._best[target]
+                    self._flag[child] = self._flag[child] or self._flag[target]
+                    next_frontier.append(child)
+            frontier = next_frontier
+
+    def scan(self, text: str) -> Tuple[int, bool]:
+        '''
+        Returns the smallest index of the patterns found in `text` (or `NO_MATCH`), and whether a flagged pattern was found.
+        '''
+        goto, fail, best, flag = self._goto, self._fail, self._best, self._flag
+        node, best_idx, flagged = 0, NO_MATCH, False
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if best[node] != NO_MATCH and (best_idx == NO_MATCH or best[node] < best_idx):
+                best_idx = best[node]
+            flagged = flagged or flag[node]
+        return best_idx, flagged
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+class Gazetteer(object):
+    '''
+    Known institutions with their locations, and invalid terms that mark an affiliation as not worth geocoding.
+
+    Parameters
+    --------
+    institutions: Lowercase name or alias -> location, in order of priority.
+    invalid_terms: Lowercase terms of invalid affiliations.
+    '''
+
+    def __init__(self, institutions: Dict[str, Location], invalid_terms: Iterable[str] = ()):
+        self.institutions = dict(institutions)
+        self.invalid_terms = set(invalid_terms)
+        self._names = list(self.institutions)
+        self._automaton = AhoCorasick(self._names, flagged=self.invalid_terms)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Gazetteer':
+        '''
+        Load a gazetteer from a .csv or .json file.
+
+        CSV: columns `GAZETTEER_CSV_COLUMNS`. Rows of kind 'invalid' only need a name; other rows are institutions.
+        JSON: {"institutions": {name: [county, city, state, country, latitude, longitude], ...}, "invalid_terms": [...]}.
+        '''
+        institutions, invalid_terms = {}, set()
+        if os.path.splitext(path)[1].lower() == '.json':
+            with open(path, encoding='utf-8') as fd:
+                data = json.load(fd)
+            for name, location in data.get('institutions', {}).items():
+                county, city, state, country, latitude, longitude = location
+                institutions.setdefault(name.lower(), (county, city, state, country, float(latitude), float(longitude)))
+            invalid_terms.update(term.lower() for term in data.get('invalid_terms', []))
+        else:
+            with open(path, newline='', encoding='utf-8') as fd:
+                for row in csv.DictReader(fd):
+                    if (row.get('kind') or 'institution') == 'invalid':
+                        invalid_terms.add(row['name'].lower())
+                    else:
+                        institutions.setdefault(row['name'].lower(), (row['county'], row['city'], row['state'], row['country'],
+                                                                      float(row['latitude']), float(row['longitude'])))
+        return cls(institutions, invalid_terms)
+
+    def extend(self, other: 'Gazetteer') -> 'Gazetteer':
+        '''
+        A new gazetteer with the entries of `other` added after the entries of this one.
+        '''
+        institutions = dict(self.institutions)
+        for name, location in other.institutions.items():
+            institutions.setdefault(name, location)
+        return Gazetteer(institutions, self.invalid_terms | other.invalid_terms)
+
+    def match(self, affiliation_name: str) -> Tuple[bool, Optional[Location]]:
+        '''
+        Whether the affiliation contains an invalid term, and the location of the first known institution it contains.
+        '''
+        name_idx, invalid = self._automaton.scan(affiliation_name.lower())
+        return invalid, None if name_idx == NO_MATCH else self.institutions[self._names[name_idx]]
+
+    def lookup(self, affiliation_name: str) -> Optional[Location]:
+        return self.match(affiliation_name)[1]
+
+    def is_invalid(self, affiliation_name: str) -> bool:
+        return self.match(affiliation_name)[0]
+
+    def export_csv(self, path: str) -> None:
+        with open(path, 'w', newline='', encoding='utf-8') as fd:
+            writer = csv.writer(fd)
+            writer.writerow(GAZETTEER_CSV_COLUMNS)
+            for name, location in self.institutions.items():
+                writer.writerow([name, *location, 'institution'])
+            for term in sorted(self.invalid_terms):
+                writer.writerow([term, '', '', '', '', '', '', 'invalid'])
+
+    def __len__(self) -> int:
+        return len(self.institutions) + len(self.invalid_terms)
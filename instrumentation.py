@@ -0,0 +1,237 @@
+'''
+Instrumentation of a pipeline run: where the time goes (page loads, pacing, CAPTCHA pauses, parsing, geocoding, rendering),
+how many requests and bytes, how many CAPTCHA and block pages, and the hit ratios of the caches.
+
+Everything is recorded by `default_instrumentation`, which is disabled by default: every call then returns at once,
+and `span` returns one shared no-op context manager. `enable` turns it on, optionally also recording a timeline.
+The results are written as a JSON metrics summary (`write_metrics`) and as a Chrome trace (`write_trace`),
+which can be opened in chrome://tracing or https://ui.perfetto.dev.
+'''
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+from typing import Any, Callable, Dict, Optional
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Instrumentation(object):
+    '''
+    Thread-safe recorder of spans (named durations), counters, bytes, events and cache lookups.
+    With `record_trace`, every span and event is also kept as a Chrome trace event.
+    '''
+
+    def __init__(self, enabled: bool = False, record_trace: bool = False):
+        self.enabled = enabled
+        self.record_trace = record_trace
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._start_time = time.perf_counter()
+            self._stop_time = None
+            # Span name -> [count, total seconds, max seconds].
+            self._spans = {}
+            self._counters, self._bytes, self._events = {}, {}, {}
+            # Cache name -> [hits, misses].
+            self._caches = {}
+            self._trace_events = []
+            self._thread_names = {}
+
+    def enable(self, record_trace: bool = False) -> None:
+        '''
+        Start recording from scratch. With `record_trace`, also keep the timeline.
+        '''
+        self.reset()
+        self.record_trace = record_trace
+        self.enabled = True
+
+    def disable(self) -> None:
+        '''
+        Stop recording. What was recorded stays available until the next `enable`.
+        '''
+        self.enabled = False
+        with self._lock:
+            self._stop_time = time.perf_counter()
+
+    def span(self, name: str, **args):
+        '''
+        Context manager recording the duration of its block under `name`. `args` only go to the trace.
+        '''
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_bytes(self, name: str, num_bytes: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._bytes[name] = self._bytes.get(name, 0) + num_bytes
+
+    def event(self, name: str, **args) -> None:
+        '''
+        Record that something happened, e.g. a CAPTCHA page. Shown as an instant in the trace.
+        '''
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            self._events[name] = self._events.get(name, 0) + 1
+            if self.record_trace:
+                self._trace_events.append(dict(self._trace_event(name, now), ph='i', s='t', args=args))
+
+    def cache_lookup(self, name: str, hit: bool) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            lookups = self._caches.setdefault(name, [0, 0])
+            lookups[0 if hit else 1] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        '''
+        Machine-readable summary of everything recorded since the last `reset`.
+        '''
+        with self._lock:
+            return {
+                'wall_seconds': (self._stop_time or time.perf_counter()) - self._start_time,
+                'spans': {name: {'count': num_calls,
+                                 'total_seconds': total,
+                                 'mean_seconds': total / num_calls,
+                                 'max_seconds': longest}
+                          for name, (num_calls, total, longest) in sorted(self._spans.items())},
+                'counters': dict(sorted(self._counters.items())),
+                'bytes': dict(sorted(self._bytes.items())),
+                'events': dict(sorted(self._events.items())),
+                'caches': {name: {'hits': hits, 'misses': misses,
+                                  'hit_ratio': hits / (hits + misses) if hits + misses > 0 else None}
+                           for name, (hits, misses) in sorted(self._caches.items())},
+            }
+
+    def trace(self) -> Dict[str, Any]:
+        '''
+        The recorded timeline in the Chrome trace event format, with one row per thread.
+        '''
+        with self._lock:
+            thread_names = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                            for tid, name in self._thread_names.items()]
+            return {'traceEvents': thread_names + list(self._trace_events), 'displayTimeUnit': 'ms'}
+
+    def _record_span(self, name: str, start: float, end: float, args: Dict[str, Any]) -> None:
+        duration = end - start
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                self._spans[name] = [1, duration, duration]
+            else:
+                stats[0] += 1
+                stats[1] += duration
+                stats[2] = max(stats[2], duration)
+            if self.record_trace:
+                self._trace_events.append(dict(self._trace_event(name, start), ph='X', dur=duration * 1e6, args=args))
+
+    def _trace_event(self, name: str, timestamp: float) -> Dict[str, Any]:
+        thread = threading.current_thread()
+        self._thread_names.setdefault(thread.ident, thread.name)
+        return {'name': name, 'cat': name.split('.')[0], 'pid': os.getpid(), 'tid': thread.ident,
+                'ts': (timestamp - self._start_time) * 1e6}
+
+
+class _Span(object):
+
+    def __init__(self, instrumentation: Instrumentation, name: str, args: Dict[str, Any]):
+        self.instrumentation, self.name, self.args = instrumentation, name, args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.instrumentation._record_span(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+default_instrumentation = Instrumentation()
+
+
+def enable(record_trace: bool = False) -> None:
+    default_instrumentation.enable(record_trace=record_trace)
+
+def disable() -> None:
+    default_instrumentation.disable()
+
+def enabled() -> bool:
+    return default_instrumentation.enabled
+
+def span(name: str, **args):
+    if not default_instrumentation.enabled:
+        return _NULL_SPAN
+    return default_instrumentation.span(name, **args)
+
+def count(name: str, value: int = 1) -> None:
+    default_instrumentation.count(name, value)
+
+def add_bytes(name: str, num_bytes: int) -> None:
+    default_instrumentation.add_bytes(name, num_bytes)
+
+def event(name: str, **args) -> None:
+    default_instrumentation.event(name, **args)
+
+def cache_lookup(name: str, hit: bool) -> None:
+    default_instrumentation.cache_lookup(name, hit)
+
+def timed(name: str) -> Callable:
+    '''
+    Decorator recording every call of a function as a span named `name`.
+    '''
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not default_instrumentation.enabled:
+                return function(*args, **kwargs)
+            with default_instrumentation.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def metrics_summary() -> Dict[str, Any]:
+    return default_instrumentation.summary()
+
+def write_metrics(metrics_path: str) -> None:
+    _write_json(metrics_summary(), metrics_path, indent=1)
+
+def write_trace(trace_path: str) -> None:
+    _write_json(default_instrumentation.trace(), trace_path)
+
+def print_metrics(top: Optional[int] = 10) -> None:
+    '''
+    Print the spans taking the most total time, the events and the cache hit ratios.
+    '''
+    summary = metrics_summary()
+    spans = sorted(summary['spans'].items(), key=lambda item: -item[1]['total_seconds'])[:top]
+    print('[INFO] Time per stage over %.1fs of wall time (spans overlap across threads):' % summary['wall_seconds'])
+    for name, stats in spans:
+        print('    %-28s %8.2fs in %6d calls (mean %.3fs, max %.3fs)' % (
+            name, stats['total_seconds'], stats['count'], stats['mean_seconds'], stats['max_seconds']))
+    for name, num_bytes in summary['bytes'].items():
+        print('    %-28s %8.1fMB' % (name, num_bytes / 1e6))
+    for name, num_events in summary['events'].items():
+        print('    %-28s %8d' % (name, num_events))
+    for name, stats in summary['caches'].items():
+        if stats['hit_ratio'] is not None:
+            print('    %-28s %7.1f%% hits of %d lookups' % (name, 100 * stats['hit_ratio'], stats['hits'] + stats['misses']))
+
+def _write_json(data: Dict[str, Any], path: str, indent: Optional[int] = None) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as fd:
+        json.dump(data, fd, indent=indent)
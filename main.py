@@ -6,6 +6,7 @@ if __name__ == '__main__':
     generate_citation_map_selenium(scholar_id=scholar_id, chromedriver="chromedriver-mac-arm64/chromedriver")
 
     # generate_citation_map_selenium(scholar_id, parse_csv=True)
+    # render_citation_map('cache/%s/citation_info.csv' % scholar_id, 'cache/%s/citation_map.html' % scholar_id)
     # generate_citation_map(scholar_id,
     #                       output_path='citation_map.html',
     #                       csv_output_path='citation_info.csv',
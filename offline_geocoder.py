@@ -0,0 +1,214 @@
+'''
+Geocoding of affiliations from a local data file of institutions and places, without any network request.
+
+Names are looked up in an in-memory index, first by their normalized form (case, accents, punctuation and '&' ignored),
+then by fuzzy matching against the names sharing a distinctive word with the query (not 'university', 'of', ...).
+Query words that are not indexed (e.g. misspelled) are replaced by the closest indexed words, found by their rarest trigrams.
+Supported files: a CSV with the columns `OFFLINE_GEOCODER_CSV_COLUMNS`, or a ROR (Research Organization Registry) JSON dump.
+'''
+import csv
+import difflib
+import json
+import re
+import unicodedata
+
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# (latitude, longitude, county, city, state, country), the same as `geocode_affiliation`.
+GeoInfo = Tuple[float, float, str, str, str, str]
+
+OFFLINE_GEOCODER_CSV_COLUMNS = ['name', 'aliases', 'latitude', 'longitude', 'county', 'city', 'state', 'country']
+# Separator of the aliases in the CSV column.
+ALIAS_SEPARATOR = '|'
+NON_WORD_PATTERN = re.compile(r'[^\w]+')
+
+
+def normalize_institution_name(name: str) -> str:
+    '''
+    Casefold, strip accents, spell out '&', drop punctuation and a leading 'the'.
+    '''
+    name = ''.join(char for char in unicodedata.normalize('NFKD', name) if not unicodedata.combining(char))
+    tokens = NON_WORD_PATTERN.sub(' ', name.casefold().replace('&', ' and ')).split()
+    if tokens and tokens[0] == 'the':
+        tokens = tokens[1:]
+    return ' '.join(tokens)
+
+
+class OfflineGeocoder(object):
+    '''
+    In-memory index from institution names and aliases to their locations.
+
+    Parameters
+    --------
+    min_similarity: Smallest `difflib` similarity ratio (0 - 1) between normalized names for a fuzzy match.
+    min_word_similarity: Smallest similarity ratio between the distinctive words of the query and of its fuzzy match,
+        and between an unknown query word and the indexed word it is replaced by.
+    common_word_fraction: Words in more than this fraction of the names (and in more than 10 names) are not distinctive.
+    max_candidates: Number of names per distinctive word that are compared in a fuzzy match.
+    '''
+
+    def __init__(self,
+                 min_similarity: float = 0.9,
+                 min_word_similarity: float = 0.8,
+                 common_word_fraction: float = 0.01,
+                 max_candidates: int = 200):
+        self.min_similarity = min_similarity
+        self.min_word_similarity = min_word_similarity
+        self.common_word_fraction = common_word_fraction
+        self.max_candidates = max_candidates
+        self.num_exact, self.num_fuzzy, self.num_misses = 0, 0, 0
+        self._geo_infos: List[GeoInfo] = []
+        self._names: List[str] = []
+        self._name_index: Dict[str, int] = {}
+        self._token_index: Dict[str, List[int]] = {}
+        self._trigram_index: Dict[str, List[str]] = {}
+
+    def add(self, names: List[str], geo_info: GeoInfo) -> None:
+        '''
+        Add one institution under all its names. A name already in the index keeps its first location.
+        '''
+        geo_info_idx = len(self._geo_infos)
+        self._geo_infos.append(geo_info)
+        for name in names:
+            normalized_name = normalize_institution_name(name)
+            if not normalized_name or normalized_name in self._name_index:
+                continue
+            self._name_index[normalized_name] = geo_info_idx
+            name_idx = len(self._names)
+            self._names.append(normalized_name)
+            for token in set(normalized_name.split()):
+                if token not in self._token_index:
+                    self._token_index[token] = []
+                    for trigram in _trigrams(token):
+                        self._trigram_index.setdefault(trigram, []).append(token)
+                self._token_index[token].append(name_idx)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'OfflineGeocoder':
+        '''
+        Build the index from a .csv file, or from a ROR .json dump.
+        '''
+        geocoder = cls(**kwargs)
+        if path.lower().endswith('.json'):
+            with open(path, encoding='utf-8') as fd:
+                for organization in json.load(fd):
+                    record = _ror_record(organization)
+                    if record is not None:
+                        geocoder.add(*record)
+        else:
+            with open(path, newline='', encoding='utf-8') as fd:
+                for row in csv.DictReader(fd):
+                    aliases = [alias for alias in (row.get('aliases') or '').split(ALIAS_SEPARATOR) if alias.strip()]
+                    geocoder.add([row['name']] + aliases,
+                                 (float(row['latitude']), float(row['longitude']),
+                                  row.get('county') or None, row.get('city') or None, row.get('state') or None, row.get('country') or None))
+        print('[INFO] Offline geocoder: indexed %d names of %d institutions from %s.' % (len(geocoder._names), len(geocoder._geo_infos), path))
+        return geocoder
+
+    def geocode(self, affiliation_name: str) -> Optional[GeoInfo]:
+        '''
+        Returns (latitude, longitude, county, city, state, country), or None if the affiliation is not in the index.
+        '''
+        normalized_name = normalize_institution_name(affiliation_name)
+        geo_info_idx = self._name_index.get(normalized_name)
+        if geo_info_idx is not None:
+            self.num_exact += 1
+            return self._geo_infos[geo_info_idx]
+        geo_info_idx = self._fuzzy_match(normalized_name)
+        if geo_info_idx is not None:
+            self.num_fuzzy += 1
+            return self._geo_infos[geo_info_idx]
+        self.num_misses += 1
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {'exact': self.num_exact, 'fuzzy': self.num_fuzzy, 'misses': self.num_misses, 'names': len(self._names)}
+
+    def _fuzzy_match(self, normalized_name: str) -> Optional[int]:
+        max_common_names = max(10, self.common_word_fraction * len(self._names))
+        distinctive_tokens, candidates = [], set()
+        for token in normalized_name.split():
+            matched_tokens = [token] if token in self._token_index else self._closest_tokens(token)
+            if not matched_tokens or len(self._token_index[matched_tokens[0]]) <= max_common_names:
+                distinctive_tokens.append(token)
+            for matched_token in matched_tokens:
+                if len(self._token_index[matched_token]) <= max_common_names:
+                    candidates.update(self._token_index[matched_token][:self.max_candidates])
+        # Names only sharing words like 'university' with the query are not candidates.
+        if not candidates:
+            return None
+
+        name_matcher = difflib.SequenceMatcher(autojunk=False)
+        name_matcher.set_seq2(normalized_name)
+        word_matcher = difflib.SequenceMatcher(autojunk=False)
+        word_matcher.set_seq2(' '.join(distinctive_tokens))
+        best_ratio, best_name_idx = self.min_similarity, None
+        for name_idx in sorted(candidates):
+            name_matcher.set_seq1(self._names[name_idx])
+            if name_matcher.real_quick_ratio() < best_ratio or name_matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = name_matcher.ratio()
+            if ratio < best_ratio or (ratio == best_ratio and best_name_idx is not None):
+                continue
+            # The whole names are similar. Their distinctive words must be similar too, so that
+            # e.g. 'university of kalorben' is not matched to 'university of kalorbu'.
+            word_matcher.set_seq1(' '.join(token for token in self._names[name_idx].split()
+                                           if len(self._token_index[token]) <= max_common_names))
+            if word_matcher.ratio() >= self.min_word_similarity:
+                best_ratio, best_name_idx = ratio, name_idx
+        return None if best_name_idx is None else self._name_index[self._names[best_name_idx]]
+
+    def _closest_tokens(self, token: str, max_tokens: int = 2, num_trigrams: int = 4) -> List[str]:
+        '''
+        The indexed words most similar to an unknown word, among the ones sharing its rarest trigrams.
+        '''
+        postings = sorted((self._trigram_index[trigram] for trigram in _trigrams(token) if trigram in self._trigram_index), key=len)
+        trigram_counts = Counter()
+        for posting in postings[:num_trigrams]:
+            trigram_counts.update(candidate for candidate in posting if abs(len(candidate) - len(token)) <= 2)
+        matcher = difflib.SequenceMatcher(autojunk=False)
+        matcher.set_seq2(token)
+        scored = []
+        for candidate, _ in trigram_counts.most_common(10):
+            matcher.set_seq1(candidate)
+            ratio = matcher.ratio()
+            if ratio >= self.min_word_similarity:
+                scored.append((ratio, candidate))
+        return [candidate for _, candidate in sorted(scored, reverse=True)[:max_tokens]]
+
+    def __len__(self) -> int:
+        return len(self._geo_infos)
+
+
+def _trigrams(token: str) -> List[str]:
+    padded = ' %s ' % token
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def _ror_record(organization: dict) -> Optional[Tuple[List[str], GeoInfo]]:
+    '''
+    Names and location of one organization of a ROR dump, in either the v1 or the v2 schema.
+    Acronyms are left out, since short acronyms are ambiguous.
+    '''
+    if 'names' in organization:
+        # Schema v2.
+        names = [name['value'] for name in organization['names'] if 'acronym' not in name.get('types', [])]
+        locations = organization.get('locations') or []
+        if not locations:
+            return None
+        details = locations[0].get('geonames_details', {})
+        if details.get('lat') is None or details.get('lng') is None:
+            return None
+        return names, (details['lat'], details['lng'], None, details.get('name'),
+                       details.get('country_subdivision_name'), details.get('country_name'))
+
+    # Schema v1.
+    names = [organization['name']] + organization.get('aliases', []) + [label['label'] for label in organization.get('labels', [])]
+    addresses = organization.get('addresses') or []
+    if not addresses or addresses[0].get('lat') is None or addresses[0].get('lng') is None:
+        return None
+    address = addresses[0]
+    geonames_city = address.get('geonames_city') or {}
+    county = (geonames_city.get('geonames_admin2') or {}).get('name')
+    return names, (address['lat'], address['lng'], county, address.get('city'), address.get('state'),
+                   (organization.get('country') or {}).get('country_name'))
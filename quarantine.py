@@ -0,0 +1,144 @@
+'''
+Deferred retries of the crawl units (publication lists, publications and author profiles) that hit a CAPTCHA or block page.
+
+Instead of stalling the run until someone solves the CAPTCHA, a blocked unit is set aside for a cooldown while the crawler
+goes on with the other units, and is retried once its cooldown is over. The cooldown doubles with every blocked attempt,
+and after `max_attempts` blocked attempts the unit is given up and listed as pending in the completion report.
+Pending units are not recorded in the crawl journal, so a later run with `resume=True` only crawls them.
+'''
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from instrumentation import count
+
+
+class CrawlQuarantine(object):
+    '''
+    Thread-safe queue of blocked crawl units waiting for their retry, and record of the units that were given up.
+    A unit is identified by its kind ('publication_list', 'publication' or 'author_profile') and a key
+    (Scholar ID, cites_id or author ID), and carries the payload needed to run it again.
+    '''
+
+    def __init__(self, cooldown_seconds: float = 120.0, max_attempts: int = 4):
+        self.cooldown_seconds = cooldown_seconds
+        self.max_attempts = max_attempts
+        self.num_deferred, self.num_recovered = 0, 0
+        # Heap of (retry time, order, kind, key, payload).
+        self._waiting = []
+        self._order = itertools.count()
+        # (kind, key) -> number of blocked attempts so far.
+        self._attempts = {}
+        # (kind, key) -> the given up unit, as listed in the report.
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def defer(self, kind: str, key: str, payload: Any, url: Optional[str] = None, schedule: bool = True) -> Optional[float]:
+        '''
+        Set aside a unit whose page `url` was blocked, until its cooldown is over.
+        Returns the cooldown in seconds, or None if the unit was given up.
+        With `schedule=False`, the caller retries the unit itself after the cooldown instead of taking it from `pop_ready`.
+        '''
+        with self._lock:
+            num_attempts = self._attempts.get((kind, key), 0) + 1
+            self._attempts[(kind, key)] = num_attempts
+            self.num_deferred += 1
+            if num_attempts >= self.max_attempts:
+                self._pending[(kind, key)] = {'kind': kind, 'key': key, 'url': url, 'attempts': num_attempts}
+                cooldown = None
+            else:
+                cooldown = self.cooldown_seconds * 2 ** (num_attempts - 1)
+                if schedule:
+                    heapq.heappush(self._waiting, (time.monotonic() + cooldown, next(self._order), kind, key, payload))
+        if cooldown is None:
+            count('quarantine.given up')
+            print('[WARNING!] Still blocked on %s %s after %d attempts. Giving up on it for this run.' % (kind, key, num_attempts))
+        else:
+            count('quarantine.deferred')
+            print('[WARNING!] Blocked on %s %s. Retrying it in %.0fs, going on with the others meanwhile.' % (kind, key, cooldown))
+        return cooldown
+
+    def record_success(self, kind: str, key: str) -> None:
+        '''
+        Record that a unit completed, which counts as recovered if it was blocked before.
+        '''
+        with self._lock:
+            if (kind, key) in self._attempts:
+                self.num_recovered += 1
+                count('quarantine.recovered')
+
+    def pop_ready(self, kinds: Optional[Iterable[str]] = None) -> List[Tuple[str, str, Any]]:
+        '''
+        Take the (kind, key, payload) of every waiting unit (of `kinds`) whose cooldown is over.
+        '''
+        now = time.monotonic()
+        with self._lock:
+            ready = [unit for unit in self._waiting if unit[0] <= now and (kinds is None or unit[2] in kinds)]
+            if ready:
+                self._waiting = [unit for unit in self._waiting if not (unit[0] <= now and (kinds is None or unit[2] in kinds))]
+                heapq.heapify(self._waiting)
+        return [(kind, key, payload) for _, _, kind, key, payload in sorted(ready)]
+
+    def seconds_until_ready(self, kinds: Optional[Iterable[str]] = None) -> Optional[float]:
+        '''
+        Seconds until the next waiting unit (of `kinds`) can be retried, or None if none is waiting.
+        '''
+        with self._lock:
+            retry_times = [unit[0] for unit in self._waiting if kinds is None or unit[2] in kinds]
+        return None if not retry_times else max(0.0, min(retry_times) - time.monotonic())
+
+    def num_waiting(self, kinds: Optional[Iterable[str]] = None) -> int:
+        with self._lock:
+            return sum(1 for unit in self._waiting if kinds is None or unit[2] in kinds)
+
+    def run(self, kind: str, key: str, function: Callable[[], Any]) -> Any:
+        '''
+        Run a unit that nothing else can go on without (e.g. a publication list), waiting out the cooldowns in between.
+        Returns None if it was given up.
+        '''
+        from fetchers import BlockedPageError
+
+        while True:
+            try:
+                result = function()
+            except BlockedPageError as e:
+                cooldown = self.defer(kind, key, None, url=e.url, schedule=False)
+                if cooldown is None:
+                    return None
+                time.sleep(cooldown)
+                continue
+            self.record_success(kind, key)
+            return result
+
+    def pending(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._pending.values())
+
+    def report(self) -> Dict[str, Any]:
+        '''
+        Completion report: number of blocked attempts, units recovered by a retry, and the units still pending.
+        '''
+        with self._lock:
+            return {'deferred': self.num_deferred, 'recovered': self.num_recovered,
+                    'pending': list(self._pending.values())}
+
+    def print_report(self) -> None:
+        report = self.report()
+        if report['deferred'] == 0:
+            return
+        print('[INFO] Blocked pages: %d units deferred, %d recovered by a retry, %d still pending.' % (
+            report['deferred'], report['recovered'], len(report['pending'])))
+        for unit in report['pending']:
+            print('    pending %s %s (%s)' % (unit['kind'], unit['key'], unit['url']))
+        if report['pending']:
+            print('[INFO] Run again with resume=True to only crawl the pending units.')
+
+    def write_report(self, report_path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as fd:
+            json.dump(self.report(), fd, indent=1)
@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+
+from typing import Dict
+
+
+class AdaptiveRateController(object):
+    '''
+    Central pacing of requests to Google Scholar, shared by every browser session and HTTP client.
+
+    Requests are paced by a token bucket refilled at `rate` requests per second, plus a random jitter.
+    The rate starts fast, and adapts to how Google Scholar responds:
+    - When a CAPTCHA or block page is reported, the rate is multiplied by `backoff_factor`,
+      the bucket is emptied and no request is sent for `cooldown_seconds`.
+    - After `speedup_after` clean responses in a row, the rate is multiplied by `speedup_factor`.
+    The rate always stays within [`min_rate`, `max_rate`].
+    '''
+
+    def __init__(self,
+                 rate: float = 1.0,
+                 min_rate: float = 1 / 30,
+                 max_rate: float = 2.0,
+                 burst: float = 2.0,
+                 jitter: float = 0.5,
+                 backoff_factor: float = 0.5,
+                 speedup_factor: float = 1.25,
+                 speedup_after: int = 20,
+                 cooldown_seconds: float = 30.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.jitter = jitter
+        self.backoff_factor = backoff_factor
+        self.speedup_factor = speedup_factor
+        self.speedup_after = speedup_after
+        self.cooldown_seconds = cooldown_seconds
+        self.num_requests, self.num_blocked = 0, 0
+        self._tokens = burst
+        self._last_refill_time = time.monotonic()
+        self._cooldown_until = 0.0
+        self._clean_streak = 0
+        self._first_request_time = None
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        '''
+        Block until the caller is allowed to send its next request.
+        '''
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill_time) * self.rate)
+            self._last_refill_time = now
+            # Reserve a token. A negative balance makes the following callers wait longer.
+            self._tokens -= 1
+            delay = max(0.0, -self._tokens / self.rate, self._cooldown_until - now)
+            delay += random.uniform(0, self.jitter / self.rate)
+            self.num_requests += 1
+            if self._first_request_time is None:
+                self._first_request_time = now
+        time.sleep(delay)
+
+    def report_blocked(self) -> None:
+        '''
+        Slow down after a CAPTCHA or block page.
+        '''
+        with self._lock:
+            self.num_blocked += 1
+            self._clean_streak = 0
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            self._tokens = min(self._tokens, 0.0)
+            self._cooldown_until = time.monotonic() + self.cooldown_seconds
+        print('[WARNING!] Blocked by Google Scholar. Slowing down to %.2f requests per second.' % self.rate)
+
+    def report_ok(self) -> None:
+        '''
+        Speed back up after a stretch of clean responses.
+        '''
+        with self._lock:
+            self._clean_streak += 1
+            if self._clean_streak >= self.speedup_after:
+                self._clean_streak = 0
+                self.rate = min(self.max_rate, self.rate * self.speedup_factor)
+
+    def stats(self) -> Dict[str, float]:
+        '''
+        Number of requests and blocks, the current rate and the effective request rate since the first request.
+        '''
+        with self._lock:
+            elapsed = 0.0 if self._first_request_time is None else time.monotonic() - self._first_request_time
+            return {'requests': self.num_requests,
+                    'blocked': self.num_blocked,
+                    'rate': self.rate,
+                    'effective_rate': self.num_requests / elapsed if elapsed > 0 else 0.0}
+
+
+default_rate_controller = AdaptiveRateController()
+
+
+def pace() -> None:
+    '''
+    Wait for the next request slot of the shared rate controller.
+    '''
+    default_rate_controller.wait()
+
+def report_blocked() -> None:
+    default_rate_controller.report_blocked()
+
+def report_ok() -> None:
+    default_rate_controller.report_ok()
+
+def print_rate_stats() -> None:
+    stats = default_rate_controller.stats()
+    print('[INFO] Requests: %d sent, %d blocked, effective rate %.2f requests per second (current limit %.2f).' % (
+        stats['requests'], stats['blocked'], stats['effective_rate'], stats['rate']))
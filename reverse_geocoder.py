@@ -0,0 +1,140 @@
+'''
+Offline reverse geocoding: (county, city, state, country) of the place nearest to a coordinate, from a local places file.
+
+Places are bucketed in a grid of `cell_degrees` cells. The nearest place is searched in the cells of the bounding box
+of a search radius around the query, and the radius is doubled until a place is found,
+so a lookup only looks at the places near the coordinate.
+Supported files: a CSV with the columns `REVERSE_GEOCODER_CSV_COLUMNS`, or a GeoNames `cities*.txt` dump.
+For GeoNames, the state and county names are read from `admin1CodesASCII.txt` and `admin2Codes.txt` next to it, if present.
+'''
+import csv
+import math
+import os
+import pycountry
+
+from typing import Dict, List, Optional, Tuple
+
+# (county, city, state, country), the administrative fields of `geocode_affiliation`.
+AdminFields = Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]
+
+REVERSE_GEOCODER_CSV_COLUMNS = ['latitude', 'longitude', 'county', 'city', 'state', 'country']
+EARTH_RADIUS_KM = 6371.0
+
+
+class OfflineReverseGeocoder(object):
+    '''
+    Grid index of places with their administrative fields.
+
+    Parameters
+    --------
+    max_distance_km: Coordinates farther than this from every place are not reverse geocoded.
+    cell_degrees: Size of the grid cells.
+    '''
+
+    def __init__(self, max_distance_km: float = 50, cell_degrees: float = 1.0):
+        self.max_distance_km = max_distance_km
+        self.cell_degrees = cell_degrees
+        self._places: List[Tuple[float, float, AdminFields]] = []
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+
+    def add(self, latitude: float, longitude: float, admin_fields: AdminFields) -> None:
+        self._grid.setdefault(self._cell(latitude, longitude), []).append(len(self._places))
+        self._places.append((latitude, longitude, admin_fields))
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'OfflineReverseGeocoder':
+        reverse_geocoder = cls(**kwargs)
+        if path.lower().endswith('.txt'):
+            for latitude, longitude, admin_fields in _geonames_places(path):
+                reverse_geocoder.add(latitude, longitude, admin_fields)
+        else:
+            with open(path, newline='', encoding='utf-8') as fd:
+                for row in csv.DictReader(fd):
+                    reverse_geocoder.add(float(row['latitude']), float(row['longitude']),
+                                         (row.get('county') or None, row.get('city') or None,
+                                          row.get('state') or None, row.get('country') or None))
+        print('[INFO] Offline reverse geocoder: indexed %d places from %s.' % (len(reverse_geocoder), path))
+        return reverse_geocoder
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[AdminFields]:
+        '''
+        Returns (county, city, state, country) of the nearest place, or None if there is none within `max_distance_km`.
+        '''
+        place_idx = self.nearest(latitude, longitude)
+        return None if place_idx is None else self._places[place_idx][2]
+
+    def nearest(self, latitude: float, longitude: float) -> Optional[int]:
+        '''
+        Index of the nearest place within `max_distance_km`, or None.
+        '''
+        radius_km = min(self.max_distance_km, math.radians(self.cell_degrees) * EARTH_RADIUS_KM)
+        while True:
+            place_idx = self._nearest_within(latitude, longitude, radius_km)
+            # Any place closer than the one found is within the radius too, so it is the nearest overall.
+            if place_idx is not None or radius_km >= self.max_distance_km:
+                return place_idx
+            radius_km = min(self.max_distance_km, 2 * radius_km)
+
+    def _nearest_within(self, latitude: float, longitude: float, radius_km: float) -> Optional[int]:
+        # Bounding box of the circle of `radius_km`. It spans all longitudes if the circle covers a pole.
+        radius_degrees = math.degrees(radius_km / EARTH_RADIUS_KM)
+        min_row = math.floor((latitude - radius_degrees) / self.cell_degrees)
+        max_row = math.floor((latitude + radius_degrees) / self.cell_degrees)
+        num_cols = round(360 / self.cell_degrees)
+        if abs(latitude) + radius_degrees >= 90:
+            cols = range(num_cols)
+        else:
+            longitude_degrees = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude)))))
+            min_col = math.floor((longitude % 360 - longitude_degrees) / self.cell_degrees)
+            max_col = math.floor((longitude % 360 + longitude_degrees) / self.cell_degrees)
+            cols = range(num_cols) if max_col - min_col + 1 >= num_cols else [col % num_cols for col in range(min_col, max_col + 1)]
+
+        best_distance, best_place_idx = radius_km, None
+        for row in range(min_row, max_row + 1):
+            for col in cols:
+                for place_idx in self._grid.get((row, col), ()):
+                    place_latitude, place_longitude, _ = self._places[place_idx]
+                    distance = haversine_km(latitude, longitude, place_latitude, place_longitude)
+                    if distance <= best_distance:
+                        best_distance, best_place_idx = distance, place_idx
+        return best_place_idx
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_degrees), math.floor((longitude % 360) / self.cell_degrees)
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+
+def haversine_km(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(longitude2 - longitude1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def _geonames_places(path: str):
+    '''
+    (latitude, longitude, (county, city, state, country)) of every place in a GeoNames dump.
+    '''
+    folder = os.path.dirname(path)
+    admin_names = {}
+    for file_name in ['admin1CodesASCII.txt', 'admin2Codes.txt']:
+        admin_path = os.path.join(folder, file_name)
+        if os.path.exists(admin_path):
+            with open(admin_path, encoding='utf-8') as fd:
+                for line in fd:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) >= 2:
+                        admin_names[fields[0]] = fields[1]
+    country_names = {country.alpha_2: country.name for country in pycountry.countries}
+
+    with open(path, encoding='utf-8') as fd:
+        for line in fd:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 12:
+                continue
+            # Columns: 1 name, 4 latitude, 5 longitude, 8 country code, 10 admin1 code, 11 admin2 code.
+            country_code, admin1_code, admin2_code = fields[8], fields[10], fields[11]
+            state = admin_names.get('%s.%s' % (country_code, admin1_code))
+            county = admin_names.get('%s.%s.%s' % (country_code, admin1_code, admin2_code)) if admin2_code else None
+            yield float(fields[4]), float(fields[5]), (county, fields[1], state, country_names.get(country_code, country_code))
@@ -1,10 +1,19 @@
-import random
-import time
-from bs4 import BeautifulSoup
-from typing import List
+import math
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from selenium import webdriver
 
-NO_AUTHOR_FOUND_STR = 'No_author_found'
+from citation_cache import CrawlJournal
+from fetchers import BlockedPageError, fetch_page, max_concurrency
+from scholar_parsers import NO_AUTHOR_FOUND_STR, parse_citation_page, parse_num_results, parse_organization_name
+
+# Root of every Google Scholar URL. Can be pointed to a local fixture server for testing.
+SCHOLAR_BASE_URL = 'https://scholar.google.com'
+# Number of results requested per Google Scholar citation result page (`num=`). Google Scholar serves at most 20.
+CITATION_RESULTS_PER_PAGE = 20
+# Google Scholar does not serve results beyond the first 1000 of a query.
+MAX_CITATION_RESULTS = 1000
 
 # Observation: the Nominatim package is very bad at getting the geolocation of companies (geolocation of universities are fine).
 # Temporary solution: hard code the geolocations of the companies.
@@ -20,6 +29,13 @@ KNOWN_AFFILIATION_DICT = {
     'oracle': ('Travis', 'Austin', 'Texas', 'USA', 30.242913, -97.721641)
 }
 
+# Affiliations containing any of these terms describe a field or a role rather than an institution, and are not geocoded.
+INVALID_AFFILIATION_TERMS = {
+    NO_AUTHOR_FOUND_STR.lower(),
+    'computer', 'computer science', 'electrical', 'engineering', 'researcher',
+    'scholar', 'inc.', 'school', 'department', 'student', 'candidate', 'professor', 'faculty', 'associate'
+}
+
 global_driver = None
 
 # def get_driver():
@@ -30,115 +46,83 @@ global_driver = None
 #         print("[INFO] KEEP THE POP-UP BROWSER OPEN until the CitationMap program is complete.")
 #     return global_driver
 
-def wait_for_captcha(driver):
-    '''
-    Wait for user to solve CAPTCHA if present.
-    '''
-    page_source = driver.page_source
-    if 'CAPTCHA' in page_source or 'not a robot' in page_source:
-        print("\n" + "="*60)
-        print("CAPTCHA DETECTED! Please solve it in the browser.")
-        print("Press Enter here after you've solved it...")
-        print("="*60)
-        input()  # Wait for user to press Enter
-        time.sleep(1)
-    return
-
-def get_html_per_citation_page(soup) -> List[str]:
-    '''
-    Utility to query each page containing results for
-    cited work.
-    Parameters
-    --------
-    soup: Beautiful Soup object pointing to current page.
-    '''
-    citing_authors_and_citing_papers = []
-
-    for result in soup.find_all('div', class_='gs_ri'):
-        title_tag = result.find('h3', class_='gs_rt')
-        if title_tag:
-            paper_parsed = False
-            author_links = result.find_all('a', href=True)
-            title_text = title_tag.get_text()
-            title = title_text.replace('[HTML]', '').replace('[PDF]', '')
-            for link in author_links:
-                if 'user=' in link['href']:
-                    author_id = link['href'].split('user=')[1].split('&')[0]
-                    citing_authors_and_citing_papers.append((author_id, title))
-                    paper_parsed = True
-            if not paper_parsed:
-                print("[WARNING!] Could not find author links for ", title)
-                citing_authors_and_citing_papers.append((NO_AUTHOR_FOUND_STR, title))
-        else:
-            continue
-    return citing_authors_and_citing_papers
-
-
-def get_citing_author_ids_and_citing_papers(paper_url: str, driver) -> List[str]:
+def get_citing_author_ids_and_citing_papers(paper_url: str, driver, max_pages: Optional[int] = None,
+                                            journal: Optional[CrawlJournal] = None) -> List[str]:
     '''
     Find the (Google Scholar IDs of authors, titles of papers) who cite a given paper on Google Scholar.
 
+    The first result page gives the total number of results, from which the `start=` offsets of all other pages follow.
+    These pages are then loaded concurrently, as far as `driver` allows, under the shared rate limit.
+
     Parameters
     --------
     paper_url: URL of the paper BEING cited.
+    max_pages: Maximum number of result pages to visit. None means all pages.
+    journal: If given, every finished result page is recorded in it, and pages already recorded are not loaded again.
+
+    Raises `BlockedPageError` if any result page is blocked. With a journal, a retry only loads the pages not recorded yet.
     '''
     citing_authors_and_citing_papers = []
 
-    # driver = get_driver()
-    time.sleep(random.uniform(1, 5))  # Random delay to reduce risk of being blocked.
-
-    # Search the url of all citing papers.
-    driver.get(paper_url)
-    wait_for_captcha(driver)
-
-    # Get the HTML data.
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-
-    # Check for common indicators of blocking
-    if 'Access Denied' in soup.text or 'Forbidden' in soup.text:
-        print('[WARNING!] Access denied or forbidden when searching searching %s.' % paper_url)
-        return []
-
-    # Loop through the citation results and find citing authors and papers.
-    current_page_number = 1
-    citing_authors_and_citing_papers += get_html_per_citation_page(soup)
-
-    # Find the page navigation.
-    navigation_buttons = soup.find_all('a', class_='gs_nma')
-    for navigation in navigation_buttons:
-        page_number_str = navigation.text
-        if page_number_str and page_number_str.isnumeric() and int(page_number_str) == current_page_number + 1:
-            # Found the correct button for next page.
-            current_page_number += 1
-            next_url = 'https://scholar.google.com' + navigation['href']
-            time.sleep(random.uniform(1, 5))  # Random delay to reduce risk of being blocked.
-
-            driver.get(next_url)
-            wait_for_captcha(driver)
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            citing_authors_and_citing_papers += get_html_per_citation_page(soup)
-        else:
-            continue
+    first_page = get_citation_page(paper_url + '&num=%d' % CITATION_RESULTS_PER_PAGE, driver, journal=journal)
+    citing_authors_and_citing_papers += first_page['results']
+
+    num_results = first_page.get('num_results')
+    if num_results is not None:
+        num_pages = math.ceil(min(num_results, MAX_CITATION_RESULTS) / CITATION_RESULTS_PER_PAGE)
+        next_page_urls = [paper_url + '&start=%d&num=%d' % (page_idx * CITATION_RESULTS_PER_PAGE, CITATION_RESULTS_PER_PAGE)
+                          for page_idx in range(1, num_pages)]
+    else:
+        # No result count in the header. Follow the page navigation of the first page instead.
+        next_page_urls = first_page['next_page_urls']
+    if max_pages is not None:
+        next_page_urls = next_page_urls[:max(max_pages - 1, 0)]
+
+    num_workers = min(max_concurrency(driver), len(next_page_urls))
+    if num_workers > 1:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            next_pages = list(executor.map(lambda next_url: get_citation_page(next_url, driver, journal=journal), next_page_urls))
+    else:
+        next_pages = [get_citation_page(next_url, driver, journal=journal) for next_url in next_page_urls]
+    for next_page in next_pages:
+        citing_authors_and_citing_papers += next_page['results']
 
     return citing_authors_and_citing_papers
 
-def get_organization_name(organization_id: str) -> str:
+def get_citation_page(page_url: str, driver, journal: Optional[CrawlJournal] = None) -> dict:
     '''
-    Get the official name of the organization defined by the unique Google Scholar organization ID.
+    Load one page of citation results.
+    Returns {'results': [(author_id, title), ...], 'next_page_urls': [...], 'num_results': total number of results or None}.
+    Raises `BlockedPageError` if access was denied.
     '''
+    if journal is not None:
+        page = journal.get('citation_page', page_url)
+        if page is not None:
+            page['results'] = [tuple(result) for result in page['results']]
+            return page
 
-    driver = get_driver()
-    time.sleep(random.uniform(1, 5))  # Random delay to reduce risk of being blocked.
-
-    url = f'https://scholar.google.com/citations?view_op=view_org&org={organization_id}&hl=en'
+    # Search the url of all citing papers, and get the HTML data.
+    page_source = fetch_page(page_url, driver, ready_selector='#gs_res_ccl_mid')
 
-    time.sleep(random.uniform(1, 5))  # Random delay to reduce risk of being blocked.
-
-    driver.get(url)
-    wait_for_captcha(driver)
+    results, next_page_hrefs = parse_citation_page(page_source)
+    # Check for common indicators of blocking
+    if not results and 'Forbidden' in page_source:
+        print('[WARNING!] Access denied or forbidden when searching searching %s.' % page_url)
+        raise BlockedPageError(page_url)
+    page = {'results': results,
+            'next_page_urls': [SCHOLAR_BASE_URL + href for href in next_page_hrefs],
+            'num_results': parse_num_results(page_source)}
+    if journal is not None:
+        journal.record('citation_page', page_url, page)
+    return page
+
+def get_organization_name(organization_id: str, driver) -> str:
+    '''
+    Get the official name of the organization defined by the unique Google Scholar organization ID.
+    '''
+    url = f'{SCHOLAR_BASE_URL}/citations?view_op=view_org&org={organization_id}&hl=en'
 
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    tag = soup.find('h2', {'class': 'gsc_authors_header'})
-    if not tag:
+    organization_name = parse_organization_name(fetch_page(url, driver, ready_selector='h2.gsc_authors_header'))
+    if organization_name is None:
         raise Exception(f'When getting organization name, failed to parse {url}.')
-    return tag.text.replace('Learn more', '').strip()
+    return organization_name
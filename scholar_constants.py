@@ -0,0 +1,6 @@
+'''
+Constants shared by the crawler and by the modules that only read its output (e.g. `citation_table`).
+This module imports nothing, so that reading a citation table does not load the page parsers.
+'''
+# Marks a citing paper without any Google Scholar author, in place of the author ID, name and affiliation.
+NO_AUTHOR_FOUND_STR = 'No_author_found'
@@ -0,0 +1,198 @@
+'''
+Extraction of the few elements we need from Google Scholar pages.
+
+Every page type only needs a handful of elements (`div.gs_ri`, `tr.gsc_a_tr`, `#gsc_prf_in`, `.gsc_prf_il`),
+so instead of building a full BeautifulSoup tree of the whole page:
+1. The page is cut down to the subtree holding those elements, when its markers are found.
+2. The rest is parsed with lxml if it is installed, otherwise with BeautifulSoup restricted by a SoupStrainer.
+'''
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import List, Optional, Tuple
+
+from instrumentation import timed
+from scholar_constants import NO_AUTHOR_FOUND_STR
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+CITES_ID_PATTERN = re.compile(r'cites=([^&]+)')
+AUTHOR_ID_PATTERN = re.compile(r'user=([^&]*)')
+# "About 1,230 results (0.03 sec)", "12 results" or "1 result".
+NUM_RESULTS_PATTERN = re.compile(r'([\d,.]+) results?\b')
+
+
+@timed('parse.citation page')
+def parse_citation_page(page_source: str) -> Tuple[List[Tuple[str, str]], List[str]]:
+    '''
+    Parse one page of citation results.
+    Returns the (citing author ID, citing paper title) pairs, and the hrefs of the consecutive next pages (2, 3, ...).
+    '''
+    if HAS_LXML:
+        root = _lxml_root(page_source)
+        results = []
+        for result in root.xpath(_class_xpath('div', 'gs_ri')):
+            title_tags = result.xpath(_class_xpath('h3', 'gs_rt', relative=True))
+            if not title_tags:
+                continue
+            hrefs = [link.get('href') for link in result.xpath('.//a[@href]')]
+            results += _citing_pairs(title_tags[0].text_content(), hrefs)
+        navigation = [(link.text_content(), link.get('href')) for link in root.xpath(_class_xpath('a', 'gs_nma'))]
+    else:
+        soup = BeautifulSoup(page_source, 'html.parser', parse_only=SoupStrainer(['div', 'a'], class_=['gs_ri', 'gs_nma']))
+        results = []
+        for result in soup.find_all('div', class_='gs_ri'):
+            title_tag = result.find('h3', class_='gs_rt')
+            if not title_tag:
+                continue
+            hrefs = [link['href'] for link in result.find_all('a', href=True)]
+            results += _citing_pairs(title_tag.get_text(), hrefs)
+        navigation = [(link.text, link.get('href')) for link in soup.find_all('a', class_='gs_nma')]
+    return results, _next_page_hrefs(navigation)
+
+@timed('parse.num results')
+def parse_num_results(page_source: str) -> Optional[int]:
+    '''
+    Parse the total number of results from the header of a result page (`#gs_ab_md .gs_ab_mdw`),
+    or None if it is not found.
+    '''
+    page_source = _cut(page_source, '<div id="gs_ab_md"', '</div></div>')
+    if HAS_LXML:
+        texts = [tag.text_content() for tag in _lxml_root(page_source).xpath(_class_xpath('div', 'gs_ab_mdw'))]
+    else:
+        soup = BeautifulSoup(page_source, 'html.parser', parse_only=SoupStrainer('div', class_='gs_ab_mdw'))
+        texts = [tag.get_text() for tag in soup.find_all('div', class_='gs_ab_mdw')]
+    for text in texts:
+        m = NUM_RESULTS_PATTERN.search(text)
+        if m:
+            return int(re.sub(r'[^\d]', '', m.group(1)))
+    return None
+
+@timed('parse.publication list')
+def parse_publication_table(page_source: str) -> List[Tuple[Optional[str], str, int]]:
+    '''
+    Parse every row of the publication table of a profile page into (cites_id, paper title, number of citations).
+    The cites_id is None for papers that are not cited yet.
+    '''
+    page_source = _cut(page_source, '<table id="gsc_a_t"', '</table>')
+    rows = []
+    if HAS_LXML:
+        for row in _lxml_root(page_source).xpath(_class_xpath('tr', 'gsc_a_tr')):
+            title_el = row.xpath(_class_xpath('a', 'gsc_a_at', relative=True))
+            cites_el = row.xpath(_class_xpath('a', 'gsc_a_ac', relative=True))
+            if title_el and cites_el:
+                rows.append((_stripped_text(title_el[0]), cites_el[0].get('href', ''), _stripped_text(cites_el[0])))
+    else:
+        soup = BeautifulSoup(page_source, 'html.parser', parse_only=SoupStrainer('tr', class_='gsc_a_tr'))
+        for row in soup.select('tr.gsc_a_tr'):
+            title_el = row.select_one('a.gsc_a_at')
+            cites_el = row.select_one('a.gsc_a_ac')
+            if title_el and cites_el:
+                rows.append((title_el.get_text(strip=True), cites_el.get('href', ''), cites_el.get_text(strip=True)))
+
+    results = []
+    for title, href, count_text in rows:
+        m = CITES_ID_PATTERN.search(href)
+        # No cites_id when the paper is not cited yet (Cited by 0).
+        results.append((m.group(1) if m else None, title, int(count_text) if count_text.isdigit() else 0))
+    return results
+
+def parse_publication_rows(page_source: str) -> List[Tuple[str, str, int]]:
+    '''
+    Parse the publication table of a profile page into (cites_id, paper title, number of citations),
+    skipping rows without citations and repeated cites_ids.
+    '''
+    results = []
+    seen_cites_ids = set()
+    for cites_id, title, num_citations in parse_publication_table(page_source):
+        if cites_id is None or cites_id in seen_cites_ids:
+            continue
+        seen_cites_ids.add(cites_id)
+        results.append((cites_id, title, num_citations))
+    return results
+
+@timed('parse.author profile')
+def parse_author_profile(page_source: str) -> Tuple[str, str]:
+    '''
+    Parse (name, affiliation) from an author profile page.
+    The name is `NO_AUTHOR_FOUND_STR` and the affiliation is empty if they are not found.
+    '''
+    page_source = _cut(page_source, '<div id="gsc_prf_i"', '<div id="gsc_prf_int"')
+    if HAS_LXML:
+        root = _lxml_root(page_source)
+        name_el = root.xpath('//*[@id="gsc_prf_in"]')
+        aff_el = root.xpath(_class_xpath('*', 'gsc_prf_il'))
+        name = _stripped_text(name_el[0]) if name_el else NO_AUTHOR_FOUND_STR
+        affiliation = _stripped_text(aff_el[0]) if aff_el else ''
+    else:
+        # The page is already cut down to the profile header, which is small.
+        soup = BeautifulSoup(page_source, 'html.parser')
+        name_el = soup.select_one('#gsc_prf_in')
+        aff_el = soup.select_one('.gsc_prf_il')
+        name = name_el.get_text(strip=True) if name_el else NO_AUTHOR_FOUND_STR
+        affiliation = aff_el.get_text(strip=True) if aff_el else ''
+    return name, affiliation
+
+@timed('parse.organization page')
+def parse_organization_name(page_source: str) -> Optional[str]:
+    '''
+    Parse the organization name from the header of an organization page, or None if it is not found.
+    '''
+    if HAS_LXML:
+        tags = _lxml_root(page_source).xpath(_class_xpath('h2', 'gsc_authors_header'))
+        text = tags[0].text_content() if tags else None
+    else:
+        tag = BeautifulSoup(page_source, 'html.parser', parse_only=SoupStrainer('h2', class_='gsc_authors_header')).find('h2')
+        text = tag.text if tag else None
+    return None if text is None else text.replace('Learn more', '').strip()
+
+def _citing_pairs(title_text: str, hrefs: List[str]) -> List[Tuple[str, str]]:
+    title = title_text.replace('[HTML]', '').replace('[PDF]', '')
+    pairs = []
+    for href in hrefs:
+        if 'user=' in href:
+            pairs.append((AUTHOR_ID_PATTERN.search(href).group(1), title))
+    if not pairs:
+        print("[WARNING!] Could not find author links for ", title)
+        pairs.append((NO_AUTHOR_FOUND_STR, title))
+    return pairs
+
+def _next_page_hrefs(navigation: List[Tuple[str, str]]) -> List[str]:
+    next_page_hrefs = []
+    current_page_number = 1
+    for page_number_str, href in navigation:
+        if page_number_str and page_number_str.isnumeric() and int(page_number_str) == current_page_number + 1:
+            current_page_number += 1
+            next_page_hrefs.append(href)
+    return next_page_hrefs
+
+def _cut(page_source: str, start_marker: str, end_marker: str) -> str:
+    '''
+    The part of the page from `start_marker` to the end of `end_marker`, or the whole page if a marker is missing.
+    '''
+    start = page_source.find(start_marker)
+    if start < 0:
+        return page_source
+    end = page_source.find(end_marker, start)
+    if end < 0:
+        return page_source
+    return page_source[start:end + len(end_marker)]
+
+def _stripped_text(element) -> str:
+    '''
+    Same as BeautifulSoup's `get_text(strip=True)`: every text piece stripped, then joined without separator.
+    '''
+    return ''.join(text.strip() for text in element.itertext())
+
+def _lxml_root(page_source: str):
+    if not page_source.strip():
+        page_source = '<html></html>'
+    return lxml.html.fromstring(page_source)
+
+def _class_xpath(tag: str, class_name: str, relative: bool = False) -> str:
+    return '%s//%s[contains(concat(" ", normalize-space(@class), " "), " %s ")]' % (
+        '.' if relative else '', tag, class_name)
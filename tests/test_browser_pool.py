@@ -0,0 +1,135 @@
+'''
+`BrowserPool.map` with HTTP fetchers against a local server that serves the pages of `benchmarks/fixtures`.
+'''
+import functools
+import os
+import threading
+
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import citation_map_webdriver
+import rate_control
+import schoarly_support_new
+from browser_pool import BrowserPool
+from fetchers import BlockedPageError, HttpFetcher, fetch_page
+from quarantine import CrawlQuarantine
+
+FIXTURES_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+
+class ScholarFixtureHandler(SimpleHTTPRequestHandler):
+    '''
+    Serve the fixture of a Google Scholar URL (citation page, publication list or profile), or a fixture by its file name.
+    '''
+
+    def translate_path(self, path: str) -> str:
+        url = urlsplit(path)
+        query = parse_qs(url.query)
+        if url.path == '/scholar' and 'cites' in query:
+            path = '/citation_results.html'
+        elif url.path == '/citations':
+            path = '/publication_list.html' if query.get('view_op') == ['list_works'] else '/author_profile.html'
+        return super().translate_path(path)
+
+    def log_message(self, format, *args):
+        return
+
+
+@pytest.fixture
+def scholar_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(ScholarFixtureHandler, directory=FIXTURES_FOLDER))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def unpaced(monkeypatch):
+    monkeypatch.setattr(rate_control, 'default_rate_controller', rate_control.AdaptiveRateController(
+        rate=1e9, max_rate=1e9, min_rate=1e9, burst=1e9, jitter=0, cooldown_seconds=0))
+
+
+def http_fetcher(worker_idx: int) -> HttpFetcher:
+    fetcher = HttpFetcher()
+    # Do not send the requests to the local server through a proxy of the environment.
+    fetcher.session.trust_env = False
+    return fetcher
+
+
+def fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_FOLDER, name), encoding='utf-8') as fd:
+        return fd.read()
+
+
+def test_map_fetches_pages_in_order(scholar_server):
+    urls = ['%s/citations?hl=en&user=author%d' % (scholar_server, idx) for idx in range(5)] + \
+        ['%s/scholar?hl=en&cites=123' % scholar_server,
+         '%s/citations?hl=en&user=author0&view_op=list_works&cstart=0&pagesize=100' % scholar_server]
+    pool = BrowserPool(num_browsers=2, driver_factory=http_fetcher)
+    try:
+        pages = pool.map(lambda url, fetcher: fetch_page(url, fetcher), urls)
+    finally:
+        pool.quit()
+    assert pages == [fixture('author_profile.html')] * 5 + [fixture('citation_results.html'), fixture('publication_list.html')]
+
+
+def test_map_raises_blocked_page_without_quarantine(scholar_server):
+    pool = BrowserPool(num_browsers=2, driver_factory=http_fetcher)
+    try:
+        with pytest.raises(BlockedPageError):
+            pool.map(lambda url, fetcher: fetch_page(url, fetcher),
+                     ['%s/citations?hl=en&user=author0' % scholar_server, '%s/captcha.html' % scholar_server])
+    finally:
+        pool.quit()
+
+
+def test_map_gives_up_blocked_page_with_quarantine(scholar_server):
+    quarantine = CrawlQuarantine(cooldown_seconds=0.01, max_attempts=2)
+    captcha_url = '%s/captcha.html' % scholar_server
+    pool = BrowserPool(num_browsers=2, driver_factory=http_fetcher)
+    try:
+        pages = pool.map(lambda url, fetcher: fetch_page(url, fetcher),
+                         ['%s/citations?hl=en&user=author0' % scholar_server, captcha_url],
+                         quarantine=quarantine, unit_kind='page')
+    finally:
+        pool.quit()
+    assert pages == [fixture('author_profile.html'), None]
+    assert [(unit['kind'], unit['key']) for unit in quarantine.pending()] == [('page', captcha_url)]
+
+
+def test_map_without_items_starts_no_driver():
+    def driver_factory(worker_idx):
+        raise AssertionError('No driver should be started without items.')
+
+    assert BrowserPool(num_browsers=2, driver_factory=driver_factory).map(lambda item, driver: item, []) == []
+
+
+def test_map_starts_drivers_on_first_job(scholar_server):
+    started = []
+
+    def driver_factory(worker_idx):
+        started.append(worker_idx)
+        return http_fetcher(worker_idx)
+
+    pool = BrowserPool(num_browsers=2, driver_factory=driver_factory)
+    try:
+        pool.map(lambda url, fetcher: fetch_page(url, fetcher), ['%s/citations?hl=en&user=author0' % scholar_server])
+    finally:
+        pool.quit()
+    assert started == [0]
+
+
+def test_profile_is_fetched_from_scholar_base_url(scholar_server, monkeypatch):
+    monkeypatch.setattr(schoarly_support_new, 'SCHOLAR_BASE_URL', scholar_server)
+    fetcher = http_fetcher(0)
+    try:
+        name, affiliation = citation_map_webdriver.get_author_name_and_affiliation_selenium('author0', fetcher)
+    finally:
+        fetcher.close()
+    assert name == 'Ada Example'
+    assert affiliation == 'Associate Professor of Computer Science,Example University'
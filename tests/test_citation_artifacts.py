@@ -0,0 +1,39 @@
+'''
+Round trips of the stage artifacts of `citation_artifacts`.
+'''
+import math
+
+import pytest
+
+from citation_artifacts import load_artifact_tuples, save_artifact
+
+CITATION_ROWS = [('Author A', 'Citing paper 1', 'Cited paper', 'MIT', 42.36, -71.09, 'Middlesex', 'Cambridge', 'MA', 'USA'),
+                 ('Author B', 'Citing paper 2', 'Cited paper', 'Nowhere', '', '', None, None, None, None)]
+
+
+@pytest.mark.parametrize('kind, rows', [
+    ('citing_author_papers', [('id1', 'Citing paper 1', 'Cited paper'), ('id2', 'Citing paper 2', 'Cited paper')]),
+    ('author_paper_affiliations', [('Author A', 'Citing paper 1', 'Cited paper', 'MIT'),
+                                   ('Author B', 'Citing paper 2', 'Cited paper', None)]),
+])
+def test_text_artifact_round_trip(tmp_path, kind, rows):
+    path = str(tmp_path / ('%s.parquet' % kind))
+    save_artifact(rows, path, kind)
+    assert load_artifact_tuples(path, kind) == rows
+
+
+def test_citations_round_trip(tmp_path):
+    path = str(tmp_path / 'citations.parquet')
+    save_artifact(CITATION_ROWS, path, 'citations')
+    located, unlocated = load_artifact_tuples(path, 'citations')
+    assert located == CITATION_ROWS[0]
+    assert unlocated[:4] == CITATION_ROWS[1][:4] and unlocated[6:] == CITATION_ROWS[1][6:]
+    # A missing latitude or longitude comes back as a missing number.
+    assert all(value is None or math.isnan(value) for value in unlocated[4:6])
+
+
+def test_wrong_kind_is_rejected(tmp_path):
+    path = str(tmp_path / 'citations.parquet')
+    save_artifact(CITATION_ROWS, path, 'citations')
+    with pytest.raises(ValueError):
+        load_artifact_tuples(path, 'citing_author_papers')
@@ -0,0 +1,20 @@
+'''
+Map pins of `citation_table.affiliation_pins`.
+'''
+import pandas as pd
+
+from citation_table import CITATION_COLUMNS, affiliation_pins, citation_frame
+
+ROWS = [('Author A', 'Citing paper 1', 'Cited paper', None, 1.0, 2.0, '', 'Nowhere', '', 'Nowhereland'),
+        ('Author B', 'Citing paper 2', 'Cited paper', 'MIT', 42.36, -71.09, 'Middlesex', 'Cambridge', 'MA', 'USA'),
+        ('Author C', 'Citing paper 3', 'Cited paper', 'MIT', 42.36, -71.09, 'Middlesex', 'Cambridge', 'MA', 'USA')]
+
+
+def test_missing_affiliation_is_its_own_pin():
+    for citation_df in (citation_frame(ROWS),
+                        citation_frame(pd.DataFrame(ROWS, columns=CITATION_COLUMNS).astype({'affiliation': 'category'}))):
+        pins = affiliation_pins(citation_df)
+        assert pins['affiliation'].isna().tolist() == [True, False]
+        assert pins['affiliation'].tolist()[1] == 'MIT'
+        assert pins['authors'].tolist() == ['Author A', 'Author B & Author C']
+        assert pins[['latitude', 'longitude']].to_numpy().tolist() == [[1.0, 2.0], [42.36, -71.09]]
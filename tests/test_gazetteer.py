@@ -0,0 +1,126 @@
+'''
+`Gazetteer` matches the same institutions and invalid terms as the linear substring scans it replaces.
+'''
+import json
+
+import pytest
+
+from gazetteer import AhoCorasick, GAZETTEER_CSV_COLUMNS, NO_MATCH, Gazetteer
+
+
+def location(name: str, coordinate: float):
+    return (name + ' county', name + ' city', name + ' state', name + ' country', coordinate, coordinate)
+
+
+META, METAMATERIALS, LAB, AB, ABAB = (location('meta', 1.0), location('metamaterials', 2.0), location('lab', 3.0),
+                                      location('ab', 4.0), location('abab', 5.0))
+
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer({'meta': META, 'metamaterials lab': METAMATERIALS, 'lab': LAB, 'ab': AB, 'abab': ABAB},
+                     invalid_terms={'school', 'schools of'})
+
+
+def legacy_match(gazetteer, affiliation_name):
+    invalid = any(term in affiliation_name.lower() for term in gazetteer.invalid_terms)
+    for name, name_location in gazetteer.institutions.items():
+        if name in affiliation_name.lower():
+            return invalid, name_location
+    return invalid, None
+
+
+@pytest.mark.parametrize('affiliation_name, expected', [
+    # Overlapping names: every institution contained in the string matches, and the one listed first wins.
+    ('Metamaterials Lab, Example University', META),
+    ('The Lab of Meta', META),
+    ('Robotics Lab', LAB),
+    ('xababx', AB),
+    ('abab', AB),
+    ('bab', AB),
+    # A name found through the failure link of a longer, unfinished one.
+    ('metamaterials la', META),
+    ('no institution here', None),
+    ('', None),
+])
+def test_first_listed_institution_wins(gazetteer, affiliation_name, expected):
+    assert gazetteer.lookup(affiliation_name) == expected
+    assert gazetteer.match(affiliation_name) == legacy_match(gazetteer, affiliation_name)
+
+
+def test_listing_order_decides(gazetteer):
+    reordered = Gazetteer({'lab': LAB, 'meta': META}, gazetteer.invalid_terms)
+    assert reordered.lookup('The Lab of Meta') == LAB
+
+
+@pytest.mark.parametrize('affiliation_name, invalid', [
+    ('School of Computing', True),
+    ('Graduate Schools of Engineering', True),
+    ('SCHOOL', True),
+    ('Schoo', False),
+    ('Example University', False),
+])
+def test_invalid_terms(gazetteer, affiliation_name, invalid):
+    assert gazetteer.is_invalid(affiliation_name) == invalid
+
+
+def test_invalid_term_does_not_hide_institution(gazetteer):
+    assert gazetteer.match('School of Meta') == (True, META)
+
+
+def test_invalid_term_is_also_an_institution():
+    gazetteer = Gazetteer({'lab': LAB}, invalid_terms={'lab'})
+    assert gazetteer.match('Robotics Lab') == (True, LAB)
+
+
+@pytest.mark.parametrize('affiliation_name', ['Metaverse Inc.', 'Collaboration', 'Kebab House'])
+def test_names_match_inside_words(gazetteer, affiliation_name):
+    # Like the substring scans it replaces, a name matches regardless of word boundaries.
+    assert gazetteer.lookup(affiliation_name) is not None
+    assert gazetteer.match(affiliation_name) == legacy_match(gazetteer, affiliation_name)
+
+
+def test_non_ascii_affiliation(gazetteer):
+    assert gazetteer.match('Ümlaut Lab, Universität') == (False, LAB)
+
+
+def test_automaton_without_patterns():
+    assert AhoCorasick([]).scan('anything') == (NO_MATCH, False)
+    assert AhoCorasick(['', 'a']).scan('a') == (1, False)
+
+
+def test_csv_round_trip(gazetteer, tmp_path):
+    csv_path = str(tmp_path / 'gazetteer.csv')
+    gazetteer.export_csv(csv_path)
+    loaded = Gazetteer.from_file(csv_path)
+    assert loaded.institutions == gazetteer.institutions
+    assert list(loaded.institutions) == list(gazetteer.institutions)
+    assert loaded.invalid_terms == gazetteer.invalid_terms
+
+
+def test_csv_names_are_lowercased_and_first_row_wins(tmp_path):
+    csv_path = tmp_path / 'gazetteer.csv'
+    csv_path.write_text(','.join(GAZETTEER_CSV_COLUMNS) + '\n'
+                        'Meta,a,b,c,d,1,2,\n'
+                        'META,e,f,g,h,3,4,institution\n'
+                        'Workshop,,,,,,,invalid\n', encoding='utf-8')
+    loaded = Gazetteer.from_file(str(csv_path))
+    assert loaded.institutions == {'meta': ('a', 'b', 'c', 'd', 1.0, 2.0)}
+    assert loaded.invalid_terms == {'workshop'}
+    assert loaded.match('Meta Workshop') == (True, ('a', 'b', 'c', 'd', 1.0, 2.0))
+
+
+def test_json_file(tmp_path):
+    json_path = tmp_path / 'gazetteer.json'
+    json_path.write_text(json.dumps({'institutions': {'Meta': ['a', 'a', 'a', 'a', 1, 1]}, 'invalid_terms': ['Lab']}),
+                         encoding='utf-8')
+    loaded = Gazetteer.from_file(str(json_path))
+    assert loaded.match('the Lab of META') == (True, ('a', 'a', 'a', 'a', 1.0, 1.0))
+
+
+def test_extend_keeps_own_entries_first(gazetteer):
+    extended = gazetteer.extend(Gazetteer({'meta': LAB, 'new institute': location('new', 6.0)}, invalid_terms={'workshop'}))
+    assert extended.lookup('Meta') == META
+    assert extended.lookup('New Institute') == location('new', 6.0)
+    assert extended.is_invalid('Workshop on Meta')
+    assert len(extended) == len(gazetteer) + 2
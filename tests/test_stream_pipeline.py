@@ -0,0 +1,74 @@
+'''
+`stream_batch_citation_pipeline` on a synthetic lab served by the fake Scholar site of the benchmarks.
+'''
+import os
+import sys
+import threading
+
+import pytest
+
+import citation_map_webdriver
+import rate_control
+from browser_pool import BrowserPool
+from citation_cache import AuthorProfileStore, CitationSnapshotStore, GeocodeCache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from scholar_fixtures import StubGeolocator, synthetic_lab
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setenv('TQDM_DISABLE', '1')
+    monkeypatch.setattr(rate_control, 'default_rate_controller', rate_control.AdaptiveRateController(
+        rate=1e9, max_rate=1e9, min_rate=1e9, burst=1e9, jitter=0, cooldown_seconds=0))
+    monkeypatch.setattr(citation_map_webdriver, 'geolocator', StubGeolocator())
+
+
+def run_pipeline(scholar_ids, site, timeout: float = 30):
+    '''
+    Run the pipeline in a thread, so that a hang fails the test instead of blocking it. Returns its result or raises its error.
+    '''
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = citation_map_webdriver.stream_batch_citation_pipeline(
+                scholar_ids, BrowserPool.from_drivers([site]), AuthorProfileStore(), geocode_cache=GeocodeCache(),
+                snapshot_store=CitationSnapshotStore(), queue_size=4)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'The pipeline did not return within %ds.' % timeout
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+def test_pipeline_maps_every_scholar():
+    scholar_ids, site = synthetic_lab(3, 5)
+    results = run_pipeline(scholar_ids, site)
+    assert set(results) == set(scholar_ids)
+    assert all(len(coordinates_and_info) > 0 for _, _, coordinates_and_info in results.values())
+
+
+def test_geocoder_error_is_raised(monkeypatch):
+    def locate_affiliation(affiliation_name, geocode_cache=None):
+        raise RuntimeError('geocoder failed')
+
+    monkeypatch.setattr(citation_map_webdriver, 'locate_affiliation', locate_affiliation)
+    scholar_ids, site = synthetic_lab(20, 30)
+    with pytest.raises(RuntimeError, match='geocoder failed'):
+        run_pipeline(scholar_ids, site)
+
+
+def test_group_map_without_scholars_is_rejected(monkeypatch):
+    def new_browser_pool(*args, **kwargs):
+        raise AssertionError('No browser pool should be set up without scholars.')
+
+    monkeypatch.setattr(citation_map_webdriver, '__new_browser_pool', new_browser_pool)
+    with pytest.raises(ValueError, match='scholar_ids'):
+        citation_map_webdriver.generate_citation_maps_selenium([])